@@ -2,48 +2,1140 @@ import os
 import io
 import sys
 import json
+import ast
 import socket
+import stat
+import base64
+import struct
 import traceback
 import shutil
+import tempfile
+import time
+import uuid
+import hashlib
+import zlib
+import gc
+import difflib
+import fnmatch
+import importlib
+import heapq
+import tracemalloc
+import xml.etree.ElementTree as ET
 import unittest
+from collections import deque, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from qgis.core import *
 from qgis.gui import *
-from qgis.PyQt.QtCore import QObject, pyqtSignal, QTimer, Qt, QSize, QSettings
+from qgis.PyQt.QtCore import (QObject, pyqtSignal, QSocketNotifier, QTimer, Qt, QSize, QRect, QSettings, QDate,
+                              QDateTime, QTime, QByteArray, QBuffer, QIODevice, QCoreApplication, QProcess,
+                              QProcessEnvironment)
 from qgis.PyQt.QtWidgets import QAction, QDockWidget, QVBoxLayout, QLabel, QPushButton, QSpinBox, QWidget, QCheckBox
 from qgis.PyQt.QtGui import QIcon, QColor
-from qgis.utils import active_plugins, reloadPlugin, loadPlugin, startPlugin
+from qgis.utils import active_plugins, plugins, reloadPlugin, loadPlugin, startPlugin
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Wire framing modes. Every connection starts in FRAMING_JSON (a bare JSON
+# document whose end is found by parsing) and may switch to one of the
+# delimited modes with a "handshake" command.
+FRAMING_JSON = "json"
+FRAMING_LENGTH = "length"
+FRAMING_NDJSON = "ndjson"
+SUPPORTED_FRAMINGS = (FRAMING_LENGTH, FRAMING_NDJSON, FRAMING_JSON)
+PROTOCOL_VERSION = 1
+
+FRAME_HEADER = struct.Struct(">I")
+MAX_FRAME_SIZE = 1024 * 1024 * 1024  # 1 GiB
+
+# Compression of length-prefixed frames, negotiated in the handshake. The top
+# bit of a frame's size marks a payload compressed with the connection's codec;
+# only payloads of at least the threshold are compressed.
+COMPRESSED_FRAME = 0x80000000
+COMPRESS_THRESHOLD = 16 * 1024
+COMPRESSORS = {
+    "zlib": (lambda data: zlib.compress(data, 1), zlib.decompress),
+}
+if zstandard is not None:
+    COMPRESSORS["zstd"] = (zstandard.ZstdCompressor(level=3).compress, zstandard.ZstdDecompressor().decompress)
+SUPPORTED_COMPRESSIONS = tuple(name for name in ("zstd", "zlib") if name in COMPRESSORS)
+
+# Local clients that ask for it in the handshake receive responses of at least
+# this size as a temporary file; the message only carries {"handoff": {...}}
+HANDOFF_THRESHOLD = 1024 * 1024
+
+# Stop producing stream chunks for a connection while this much output is unsent
+STREAM_HIGH_WATER = 4 * 1024 * 1024
+
+# Web Mercator (EPSG:3857) half world width, for XYZ tile extents
+WEB_MERCATOR_HALF_WORLD = 20037508.342789244
+# Tiles returned inline (base64) when render_tiles has no output directory
+MAX_INLINE_TILES = 256
+# Image formats without an alpha channel, whose tiles are always rendered on an opaque background
+OPAQUE_IMAGE_FORMATS = ("JPG", "JPEG", "BMP", "PPM")
+
+# Providers that return features in ascending feature id order, so get_layer_features
+# pages need no ORDER BY (which other providers may only honour by sorting the whole layer).
+# Not "ogr": filters compiled to SQL, attribute indexes and database drivers return other orders.
+FID_ORDERED_PROVIDERS = ("memory", "delimitedtext")
+
+# Providers whose data sources can be opened from worker threads by add_layers
+THREADED_PROVIDERS = ("ogr", "gdal")
+# File extensions add_layers treats as rasters when no type is given
+RASTER_EXTENSIONS = (".tif", ".tiff", ".vrt", ".img", ".jp2", ".asc", ".png", ".jpg", ".jpeg", ".nc", ".dem")
+MAX_LOAD_WORKERS = 8
+
+# Compiled execute_code snippets kept for reuse
+MAX_CODE_CACHE_ENTRIES = 256
+# execute_code sessions unused for this many seconds are dropped
+SESSION_IDLE_TIMEOUT = 3600
+
+# Default time limit (seconds) for a request run in a worker process
+WORKER_TIMEOUT = 300
+# Stop respawning workers after this many consecutive start failures
+MAX_WORKER_START_FAILURES = 3
+
+# Files and folders install_plugin never copies in sync mode
+SYNC_IGNORED = ("__pycache__", ".git", ".hg", ".svn", ".idea", ".vscode", ".pytest_cache")
+# Changes that do not require reloading an installed plugin
+RELOAD_IGNORED_DIRS = ("test", "tests", "doc", "docs")
+RELOAD_IGNORED_EXTENSIONS = (".md", ".rst")
+
+# Per-test durations recorded by run_test, in the QGIS profile folder; used to balance shards
+TEST_DURATIONS_FILE = "qgis_mcp_test_durations.json"
+
+# Finished background jobs kept for job_status/job_result before the oldest are dropped
+MAX_FINISHED_JOBS = 100
+
+
+def encode_message(message, framing=FRAMING_JSON, compression=None, threshold=COMPRESS_THRESHOLD):
+    """Serialize a message for the given framing mode (and length-prefixed compression)"""
+    return frame_payload(json.dumps(message, separators=(',', ':')).encode('utf-8'), framing, compression, threshold)
+
+
+def frame_payload(payload, framing=FRAMING_JSON, compression=None, threshold=COMPRESS_THRESHOLD):
+    """Frame an already serialized message"""
+    if framing == FRAMING_LENGTH:
+        if compression and len(payload) >= threshold:
+            compressed = COMPRESSORS[compression][0](payload)
+            if len(compressed) < len(payload):
+                return FRAME_HEADER.pack(len(compressed) | COMPRESSED_FRAME) + compressed
+        return FRAME_HEADER.pack(len(payload)) + payload
+    if framing == FRAMING_NDJSON:
+        return payload + b'\n'
+    return payload
+
+
+class MessageDecoder:
+    """Incremental decoder splitting a byte stream into JSON messages.
+
+    In the delimited modes each received byte is inspected a bounded number
+    of times and every message is parsed exactly once, so a large message
+    arriving in many small chunks is decoded in linear time.
+    """
+
+    def __init__(self, framing=FRAMING_JSON):
+        self.framing = framing
+        self.compression = None  # codec of compressed length-prefixed frames
+        self.buffer = bytearray()
+        self._scan_pos = 0
+        self._json_decoder = json.JSONDecoder()
+
+    def feed(self, data):
+        """Append received bytes to the buffer"""
+        self.buffer += data
+
+    def set_framing(self, framing):
+        """Switch framing mode; bytes already buffered are kept"""
+        self.framing = framing
+        self._scan_pos = 0
+
+    def next_message(self):
+        """Return the next complete message, or None if more data is needed"""
+        if self.framing == FRAMING_LENGTH:
+            return self._next_length_prefixed()
+        if self.framing == FRAMING_NDJSON:
+            return self._next_line()
+        return self._next_bare_json()
+
+    def _next_length_prefixed(self):
+        if len(self.buffer) < FRAME_HEADER.size:
+            return None
+        (size,) = FRAME_HEADER.unpack_from(self.buffer)
+        compressed = bool(size & COMPRESSED_FRAME)
+        size &= ~COMPRESSED_FRAME
+        if size > MAX_FRAME_SIZE:
+            raise ValueError(f"Frame of {size} bytes exceeds the {MAX_FRAME_SIZE} byte limit")
+        end = FRAME_HEADER.size + size
+        if len(self.buffer) < end:
+            return None
+        payload = bytes(self.buffer[FRAME_HEADER.size:end])
+        del self.buffer[:end]
+        if compressed:
+            if self.compression is None:
+                raise ValueError("Compressed frame received but no compression was negotiated")
+            payload = COMPRESSORS[self.compression][1](payload)
+        return json.loads(payload.decode('utf-8'))
+
+    def _next_line(self):
+        while True:
+            newline = self.buffer.find(b'\n', self._scan_pos)
+            if newline < 0:
+                # Only scan the new bytes next time
+                self._scan_pos = len(self.buffer)
+                if self._scan_pos > MAX_FRAME_SIZE:
+                    raise ValueError(f"Line exceeds the {MAX_FRAME_SIZE} byte limit")
+                return None
+            line = bytes(self.buffer[:newline])
+            del self.buffer[:newline + 1]
+            self._scan_pos = 0
+            if line.strip():
+                return json.loads(line.decode('utf-8'))
+
+    def _next_bare_json(self):
+        # Legacy mode: the buffer is reparsed after every chunk. Only used for
+        # clients that never negotiate a framing (and for the handshake itself).
+        try:
+            text = self.buffer.decode('utf-8')
+        except UnicodeDecodeError:
+            return None  # A multi-byte character is split across chunks
+        stripped = text.lstrip()
+        if not stripped:
+            return None
+        try:
+            message, end = self._json_decoder.raw_decode(stripped)
+        except json.JSONDecodeError:
+            return None
+        consumed = len(text) - len(stripped) + end
+        del self.buffer[:len(text[:consumed].encode('utf-8'))]
+        return message
+
+
+class StreamingResult:
+    """Handler result that is sent to the client as a sequence of chunks.
+
+    `chunks` is a generator; every yielded value is sent as a "partial"
+    response and the generator's return value as the final "success" one.
+    """
+
+    def __init__(self, chunks):
+        self.chunks = chunks
+
+
+class Job:
+    """A background operation (processing algorithm, render, ...) tracked by id"""
+
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+
+    def __init__(self, kind, description):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.description = description
+        self.status = Job.RUNNING
+        self.progress = 0.0
+        self.result = None
+        self.error = None
+        self.started = time.time()
+        self.finished = None
+        # Objects that must stay alive while the job runs (task, context, ...)
+        self.handles = {}
+        self.cancel = None
+
+    def finish(self, status, result=None, error=None):
+        """Record the outcome and release the objects kept alive for the job"""
+        self.status = status
+        self.result = result
+        self.error = error
+        self.finished = time.time()
+        if status == Job.SUCCEEDED:
+            self.progress = 100.0
+        self.handles = {}
+        self.cancel = None
+
+    def to_dict(self):
+        """Status summary returned to clients"""
+        end = self.finished or time.time()
+        return {
+            "job_id": self.id,
+            "kind": self.kind,
+            "description": self.description,
+            "status": self.status,
+            "progress": self.progress,
+            "elapsed": round(end - self.started, 3)
+        }
+
+
+class RenderCache:
+    """LRU cache of encoded map images, bounded by their total size in bytes"""
+
+    def __init__(self, max_bytes=64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()  # key -> (image bytes, layer ids)
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """Return cached image bytes for key, or None"""
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return entry[0]
+
+    def put(self, key, data, layer_ids):
+        """Store image bytes, evicting least recently used entries over budget"""
+        if len(data) > self.max_bytes:
+            return
+        self.remove(key)
+        self.entries[key] = (data, frozenset(layer_ids))
+        self.size += len(data)
+        while self.size > self.max_bytes:
+            _, (evicted, _) = self.entries.popitem(last=False)
+            self.size -= len(evicted)
+
+    def remove(self, key):
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            self.size -= len(entry[0])
+
+    def invalidate_layer(self, layer_id):
+        """Drop every entry rendered with the given layer"""
+        for key in [key for key, (_, layer_ids) in self.entries.items() if layer_id in layer_ids]:
+            self.remove(key)
+
+    def clear(self):
+        self.entries.clear()
+        self.size = 0
+
+    def stats(self):
+        return {
+            "entries": len(self.entries),
+            "bytes": self.size,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses
+        }
+
+
+class CodeCache:
+    """LRU cache of compiled code objects keyed by a hash of their source"""
+
+    def __init__(self, max_entries=MAX_CODE_CACHE_ENTRIES):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()  # source hash -> code object
+        self.hits = 0
+        self.misses = 0
+
+    def compile(self, source):
+        """Return the code object for source, compiling it on a miss"""
+        key = hashlib.sha256(source.encode("utf-8")).hexdigest()
+        code = self.entries.get(key)
+        if code is not None:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return code
+        self.misses += 1
+        code = compile(source, "<string>", "exec")
+        self.entries[key] = code
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+        return code
+
+    def clear(self):
+        self.entries.clear()
+
+    def stats(self):
+        return {
+            "entries": len(self.entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses
+        }
+
+
+class ExecSession:
+    """A named execute_code namespace that persists between calls"""
+
+    def __init__(self, name, namespace):
+        self.name = name
+        self.namespace = namespace
+        self.created = time.time()
+        self.last_used = self.created
+        self.runs = 0
+
+    def to_dict(self):
+        return {
+            "session": self.name,
+            "created": self.created,
+            "last_used": self.last_used,
+            "runs": self.runs,
+            "names": sorted(name for name in self.namespace if not name.startswith("__"))
+        }
+
+
+class LayerIndex:
+    """Per-layer metadata for get_layers / get_project_info.
+
+    Entries are added and removed from QgsProject signals, so listing layers
+    does not walk the project or search the layer tree for every layer.
+    Feature counts are fetched from the provider at most once per data
+    change, and layer tree visibility is recomputed in one pass after the
+    tree changes.
+    """
+
+    def __init__(self, describe):
+        self.describe = describe  # layer -> dict of static metadata
+        self.entries = OrderedDict()  # layer id -> (layer, metadata)
+        self.feature_counts = {}  # layer id -> cached featureCount()
+        self.visibility = None  # layer id -> visible; None after tree changes
+
+    def add(self, layer):
+        self.entries[layer.id()] = (layer, self.describe(layer))
+        self.visibility = None
+
+    def remove(self, layer_id):
+        self.entries.pop(layer_id, None)
+        self.feature_counts.pop(layer_id, None)
+
+    def refresh(self, layer_id):
+        """Re-read a layer's metadata after it was renamed or its data changed"""
+        entry = self.entries.get(layer_id)
+        if entry is not None:
+            self.entries[layer_id] = (entry[0], self.describe(entry[0]))
+        self.feature_counts.pop(layer_id, None)
+
+    def invalidate_visibility(self, *args):
+        self.visibility = None
+
+    def clear(self):
+        self.entries.clear()
+        self.feature_counts.clear()
+        self.visibility = None
+
+    def is_visible(self, layer_id):
+        if self.visibility is None:
+            root = QgsProject.instance().layerTreeRoot()
+            self.visibility = {node.layerId(): node.isVisible() for node in root.findLayers()}
+        return self.visibility.get(layer_id, False)
+
+    def feature_count(self, layer_id):
+        if layer_id not in self.feature_counts:
+            self.feature_counts[layer_id] = self.entries[layer_id][0].featureCount()
+        return self.feature_counts[layer_id]
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __iter__(self):
+        return iter(self.entries.items())
+
+
+class AlgorithmIndex:
+    """Searchable index of the Processing registry for list_algorithms / describe_algorithm.
+
+    Algorithm summaries are read once per provider and parameter definitions
+    once per algorithm. A provider's entries are rebuilt after it is
+    invalidated (e.g. when scripts are installed) or added again.
+    """
+
+    def __init__(self, json_value):
+        self.json_value = json_value  # QVariant-ish value -> JSON value
+        self.providers = {}  # provider id -> OrderedDict(algorithm id -> summary)
+        self.details = {}  # algorithm id -> full description
+
+    def invalidate(self, provider_id=None, *args):
+        if provider_id is None:
+            self.providers.clear()
+            self.details.clear()
+            return
+        self.providers.pop(provider_id, None)
+        # Descriptions are also cached by describe() for providers never listed
+        for algorithm_id in [algorithm_id for algorithm_id, details in self.details.items()
+                             if details.get("provider") == provider_id]:
+            del self.details[algorithm_id]
+
+    def algorithms(self):
+        """All algorithm summaries, loading providers that are not indexed yet"""
+        registry = QgsApplication.processingRegistry()
+        provider_ids = set()
+        for provider in registry.providers():
+            provider_id = provider.id()
+            provider_ids.add(provider_id)
+            if provider_id not in self.providers:
+                self.providers[provider_id] = OrderedDict(
+                    (alg.id(), self._summary(alg, provider)) for alg in provider.algorithms()
+                )
+        for provider_id in set(self.providers) - provider_ids:
+            self.invalidate(provider_id)
+        for entries in self.providers.values():
+            yield from entries.values()
+
+    def _summary(self, alg, provider):
+        return {
+            "id": alg.id(),
+            "name": alg.displayName(),
+            "provider": provider.id(),
+            "provider_name": provider.name(),
+            "group": alg.group(),
+            "tags": list(alg.tags())
+        }
+
+    def search(self, query=None, provider=None):
+        """Summaries matching every word of `query` (in id, name, group or tags) and the provider"""
+        words = (query or "").lower().split()
+        for summary in self.algorithms():
+            if provider and summary["provider"] != provider:
+                continue
+            text = " ".join([summary["id"], summary["name"], summary["group"]] + summary["tags"]).lower()
+            if all(word in text for word in words):
+                yield summary
+
+    def suggestions(self, algorithm_id, count=5):
+        """Ids of indexed algorithms resembling an unknown id"""
+        ids = [summary["id"] for summary in self.algorithms()]
+        matches = difflib.get_close_matches(algorithm_id, ids, n=count, cutoff=0.6)
+        name = algorithm_id.split(":")[-1].lower()
+        matches += [other for other in ids if other.split(":")[-1].lower() == name]
+        return list(OrderedDict.fromkeys(matches))[:count]
+
+    def describe(self, algorithm_id):
+        """Full description of an algorithm: summary, help and parameter/output definitions"""
+        if algorithm_id in self.details:
+            return self.details[algorithm_id]
+        alg = QgsApplication.processingRegistry().algorithmById(algorithm_id)
+        if alg is None:
+            message = f"Algorithm not found: {algorithm_id}"
+            suggestions = self.suggestions(algorithm_id)
+            if suggestions:
+                message += f". Did you mean: {', '.join(suggestions)}?"
+            raise Exception(message)
+        provider = alg.provider()
+        details = self._summary(alg, provider) if provider is not None else {"id": alg.id(), "name": alg.displayName()}
+        details["help"] = alg.shortHelpString() or alg.shortDescription()
+        details["parameters"] = [self._parameter(param) for param in alg.parameterDefinitions()]
+        details["outputs"] = [
+            {"name": output.name(), "type": output.type(), "description": output.description()}
+            for output in alg.outputDefinitions()
+        ]
+        self.details[alg.id()] = details
+        return details
+
+    def _parameter(self, param):
+        flags = param.flags()
+        info = {
+            "name": param.name(),
+            "type": param.type(),
+            "description": param.description(),
+            "optional": bool(flags & QgsProcessingParameterDefinition.FlagOptional),
+            "advanced": bool(flags & QgsProcessingParameterDefinition.FlagAdvanced),
+            "destination": param.isDestination(),
+            "default": self.json_value(param.defaultValue())
+        }
+        if hasattr(param, "options"):
+            info["options"] = list(param.options())  # enum choices, indexed from 0
+            if hasattr(param, "allowMultiple"):
+                info["multiple"] = param.allowMultiple()
+        return info
+
+    def validate(self, algorithm_id, parameters):
+        """Problems with a parameter dict that processing.run would only report after starting"""
+        details = self.describe(algorithm_id)
+        known = {param["name"]: param for param in details["parameters"]}
+        problems = []
+        for name in parameters:
+            if name not in known:
+                close = difflib.get_close_matches(name, list(known), n=1)
+                problems.append(f"Unknown parameter {name}" + (f" (did you mean {close[0]}?)" if close else ""))
+        for name, param in known.items():
+            if (name not in parameters and not param["optional"] and not param["destination"]
+                    and param["default"] is None):
+                problems.append(f"Missing required parameter {name} ({param['type']}: {param['description']})")
+        return problems
+
+
+def iter_tests(suite):
+    """Yield the individual test cases of a nested unittest suite"""
+    for test in suite:
+        if isinstance(test, unittest.TestSuite):
+            yield from iter_tests(test)
+        else:
+            yield test
+
+
+def test_module_file(test):
+    """Source file of the module defining a test case, or None"""
+    module = sys.modules.get(type(test).__module__)
+    path = getattr(module, "__file__", None)
+    return os.path.abspath(path) if path else None
+
+
+def imported_files(path, roots):
+    """
+    Existing Python files imported by the source file at path.
+
+    Relative imports are resolved against the file's package and absolute
+    ones against each of roots. Importing a submodule also counts the
+    __init__.py of every package on the way.
+    """
+    try:
+        with open(path, "rb") as f:
+            tree = ast.parse(f.read(), path)
+    except (OSError, SyntaxError, ValueError):
+        return set()
+    candidates = []  # (base directory, dotted module name)
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            candidates.extend((root, alias.name) for alias in node.names for root in roots)
+        elif isinstance(node, ast.ImportFrom):
+            if node.level:
+                base = os.path.dirname(path)
+                for _ in range(node.level - 1):
+                    base = os.path.dirname(base)
+                bases = [base]
+            else:
+                bases = roots
+            module = node.module or ""
+            for base in bases:
+                if module:
+                    candidates.append((base, module))
+                # "from package import name" may import a submodule
+                candidates.extend((base, f"{module}.{alias.name}".lstrip(".")) for alias in node.names)
+    files = set()
+    for base, name in candidates:
+        parts = name.split(".")
+        for depth in range(1, len(parts) + 1):
+            stem = os.path.join(base, *parts[:depth])
+            for candidate in (stem + ".py", os.path.join(stem, "__init__.py")):
+                if os.path.isfile(candidate):
+                    files.add(os.path.abspath(candidate))
+    return files
+
+
+def source_dependencies(path, source_dir):
+    """The file at path plus every file under source_dir it imports, directly or indirectly"""
+    source_dir = os.path.abspath(source_dir)
+    seen = set()
+    stack = [os.path.abspath(path)]
+    while stack:
+        current = stack.pop()
+        if current in seen:
+            continue
+        seen.add(current)
+        roots = [os.path.dirname(current), source_dir, os.path.dirname(source_dir)]
+        for imported in imported_files(current, roots):
+            if imported.startswith(source_dir + os.sep) and imported not in seen:
+                stack.append(imported)
+    return seen
+
+
+def balance_shards(test_ids, durations, shards):
+    """
+    Split test ids into at most `shards` groups of similar total duration.
+
+    Longest tests are placed first, each on the currently lightest shard.
+    Tests without a recorded duration count as the average recorded one.
+    Within a shard the original order is kept, so tests of a class stay
+    together.
+    """
+    known = [durations[test_id] for test_id in test_ids if test_id in durations]
+    default = sum(known) / len(known) if known else 1.0
+    bins = [(0.0, index, []) for index in range(min(shards, len(test_ids)))]
+    for test_id in sorted(test_ids, key=lambda test_id: durations.get(test_id, default), reverse=True):
+        total, index, ids = heapq.heappop(bins)
+        ids.append(test_id)
+        heapq.heappush(bins, (total + durations.get(test_id, default), index, ids))
+    order = {test_id: position for position, test_id in enumerate(test_ids)}
+    return [sorted(ids, key=order.get) for _, _, ids in sorted(bins, key=lambda entry: entry[1])]
+
+
+class TimedTestResult(unittest.TextTestResult):
+    """
+    TextTestResult that profiles every test.
+
+    Records wall and CPU time, the time spent in setUp and tearDown, the
+    outcome and, when `trace_memory` is set (tracemalloc must be running),
+    the peak of Python memory allocated during the test.
+    """
+
+    trace_memory = False
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.durations = {}  # test id -> wall seconds
+        self.timings = []  # one entry per test, in run order
+        self._current = None
+
+    def startTest(self, test):
+        self._current = {"id": test.id(), "status": "passed", "setup": 0.0, "teardown": 0.0}
+        for name, key in (("setUp", "setup"), ("tearDown", "teardown")):
+            method = getattr(test, name, None)
+            if method is not None:
+                setattr(test, name, self._timed(method, key))
+        if self.trace_memory:
+            tracemalloc.reset_peak()
+            self._memory_start = tracemalloc.get_traced_memory()[0]
+        self._started = time.perf_counter()
+        self._cpu_started = time.process_time()
+        super().startTest(test)
+
+    def _timed(self, method, key):
+        current = self._current
+
+        def timed(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                current[key] += time.perf_counter() - started
+        return timed
+
+    def stopTest(self, test):
+        super().stopTest(test)
+        current = self._current
+        if current is None:
+            return  # Skipped before startTest (Python 3.12+)
+        wall = time.perf_counter() - self._started
+        current["wall"] = round(wall, 6)
+        current["cpu"] = round(time.process_time() - self._cpu_started, 6)
+        current["setup"] = round(current["setup"], 6)
+        current["teardown"] = round(current["teardown"], 6)
+        if self.trace_memory:
+            current["memory_peak"] = max(0, tracemalloc.get_traced_memory()[1] - self._memory_start)
+        for name in ("setUp", "tearDown"):
+            vars(test).pop(name, None)
+        self.durations[test.id()] = wall
+        self.timings.append(current)
+        self._current = None
+
+    def _set_status(self, test, status):
+        # Class and module fixture errors are reported outside of any test
+        if self._current is not None and self._current["id"] == test.id():
+            self._current["status"] = status
+
+    def addFailure(self, test, err):
+        super().addFailure(test, err)
+        self._set_status(test, "failed")
+
+    def addError(self, test, err):
+        super().addError(test, err)
+        self._set_status(test, "error")
+
+    def addSkip(self, test, reason):
+        super().addSkip(test, reason)
+        if self._current is None:
+            self.timings.append({"id": test.id(), "status": "skipped", "setup": 0.0, "teardown": 0.0, "wall": 0.0,
+                                 "cpu": 0.0})
+        self._set_status(test, "skipped")
+
+    def addExpectedFailure(self, test, err):
+        super().addExpectedFailure(test, err)
+        self._set_status(test, "expected_failure")
+
+    def addUnexpectedSuccess(self, test):
+        super().addUnexpectedSuccess(test)
+        self._set_status(test, "unexpected_success")
+
+    def addSubTest(self, test, subtest, err):
+        super().addSubTest(test, subtest, err)
+        if err is not None:
+            self._set_status(test, "failed" if issubclass(err[0], test.failureException) else "error")
+
+
+def write_junit_xml(path, result, name="run_test"):
+    """Write a run_test result as a JUnit XML report"""
+    messages = {}
+    for failure in result["failures"]:
+        messages.setdefault(failure.get("id"), []).append(failure["message"])
+    timings = result.get("timings", [])
+    suite = ET.Element("testsuite", {
+        "name": name,
+        "tests": str(result["total"]),
+        "failures": str(result["failed"]),
+        "errors": str(result["errors"]),
+        "skipped": str(sum(1 for timing in timings if timing["status"] == "skipped")),
+        "time": f"{sum(timing['wall'] for timing in timings):.6f}"
+    })
+
+    def add_case(test_id, seconds, status):
+        if test_id.endswith(")") and " (" in test_id:
+            # Fixture errors are reported as e.g. "setUpClass (module.Class)"
+            test_name, _, classname = test_id[:-1].partition(" (")
+        else:
+            classname, _, test_name = test_id.rpartition(".")
+        case = ET.SubElement(suite, "testcase", {"classname": classname, "name": test_name, "time": f"{seconds:.6f}"})
+        if status in ("failed", "error"):
+            message = "\n".join(messages.get(test_id, []))
+            lines = message.strip().splitlines()
+            element = ET.SubElement(case, "failure" if status == "failed" else "error",
+                                    {"message": lines[-1] if lines else status})
+            element.text = message
+        elif status == "skipped":
+            ET.SubElement(case, "skipped")
+
+    timed_ids = set()
+    for timing in timings:
+        timed_ids.add(timing["id"])
+        add_case(timing["id"], timing["wall"], timing["status"])
+    # Errors outside of a test (class fixtures, crashed shards)
+    for failure in result["failures"]:
+        if failure.get("id") not in timed_ids:
+            timed_ids.add(failure.get("id"))
+            add_case(failure.get("id") or failure["test"], 0.0, "failed" if failure["type"] == "failure" else "error")
+
+    root = ET.Element("testsuites")
+    root.append(suite)
+    ET.ElementTree(root).write(path, encoding="utf-8", xml_declaration=True)
+
+
+def worker_python():
+    """Python interpreter used to launch worker processes"""
+    configured = QSettings().value("QGIS_MCP/worker_python", "", type=str)
+    if configured:
+        return configured
+    if os.path.basename(sys.executable).lower().startswith("python"):
+        return sys.executable
+    # QGIS embeds Python in its own executable on Windows and macOS
+    for candidate in (os.path.join(sys.exec_prefix, "python.exe"), os.path.join(sys.exec_prefix, "bin", "python3")):
+        if os.path.exists(candidate):
+            return candidate
+    return shutil.which("python3") or shutil.which("python") or sys.executable
+
+
+class WorkerProcess:
+    """A headless QGIS process serving execute_code / run_test requests"""
+
+    STARTING = "starting"
+    IDLE = "idle"
+    BUSY = "busy"
+    STOPPING = "stopping"
+
+    def __init__(self, index):
+        self.index = index
+        self.process = None
+        self.decoder = MessageDecoder(FRAMING_LENGTH)
+        self.state = WorkerProcess.STARTING
+        self.task = None
+        self.timer = None
+        self.pid = None
+        self.tasks_run = 0
+        self.stderr_tail = b""
+
+    def to_dict(self):
+        return {
+            "index": self.index,
+            "pid": self.pid,
+            "state": self.state,
+            "tasks_run": self.tasks_run,
+            "job_id": self.task["job"].id if self.task else None
+        }
+
+
+class WorkerPool:
+    """Pool of pre-started QGIS worker processes.
+
+    Each worker is this module run with `--worker`: it initializes a headless
+    QgsApplication once and then executes requests sent as length-prefixed
+    JSON over its stdin, answering on stdout. Requests run as jobs; a worker
+    that exceeds the time limit or dies (e.g. on hitting its memory limit) is
+    killed, its job fails and a fresh worker takes its place. Requests of an
+    execute_code session always go to the same worker, which holds the
+    session's namespace.
+    """
+
+    def __init__(self, size=2, timeout=WORKER_TIMEOUT, memory_mb=0):
+        self.size = size
+        self.timeout = timeout
+        self.memory_mb = memory_mb
+        self.workers = {}  # index -> WorkerProcess
+        self.pending = deque()  # tasks waiting for a worker
+        self.session_workers = {}  # execute_code session -> worker index
+        self.running = False
+        self.start_failures = 0
+
+    def start(self):
+        """Start the worker processes, if not running yet"""
+        if self.running:
+            return
+        if self.size < 1:
+            raise Exception("Worker pool is disabled (size 0)")
+        self.running = True
+        self.start_failures = 0
+        for index in range(self.size):
+            if self.running:
+                self._spawn(index)
+
+    def stop(self):
+        """Kill all workers and cancel queued and running tasks"""
+        self.running = False
+        while self.pending:
+            self._finish(self.pending.popleft(), Job.CANCELLED, error="Worker pool stopped")
+        for worker in list(self.workers.values()):
+            if worker.task:
+                self._finish(worker.task, Job.CANCELLED, error="Worker pool stopped")
+                worker.task = None
+            self._kill(worker)
+            worker.process.waitForFinished(1000)
+        self.workers.clear()
+        self.session_workers.clear()
+
+    def submit(self, job, command, params, session=None, timeout=None, on_finish=None):
+        """
+        Queue a request for the next free worker.
+
+        The outcome is recorded on job; on_finish, if given, is then called
+        with the job.
+        """
+        self.start()
+        task = {
+            "job": job,
+            "request": {"type": command, "params": params},
+            "session": session,
+            "timeout": timeout or self.timeout,
+            "on_finish": on_finish
+        }
+        job.cancel = lambda task=task: self._cancel(task)
+        self.pending.append(task)
+        self._dispatch()
+
+    def stats(self):
+        return {
+            "running": self.running,
+            "size": self.size,
+            "timeout": self.timeout,
+            "memory_mb": self.memory_mb,
+            "queued": len(self.pending),
+            "workers": [worker.to_dict() for worker in self.workers.values()]
+        }
+
+    def _finish(self, task, status, result=None, error=None):
+        task["job"].finish(status, result=result, error=error)
+        if task["on_finish"]:
+            task["on_finish"](task["job"])
+
+    def _spawn(self, index):
+        worker = WorkerProcess(index)
+        process = QProcess()
+        env = QProcessEnvironment.systemEnvironment()
+        env.insert("QT_QPA_PLATFORM", "offscreen")
+        env.insert("PYTHONPATH", os.pathsep.join(path for path in sys.path if path))
+        process.setProcessEnvironment(env)
+        process.readyReadStandardOutput.connect(lambda worker=worker: self._on_output(worker))
+        process.readyReadStandardError.connect(lambda worker=worker: self._on_stderr(worker))
+        process.finished.connect(lambda code, status, worker=worker: self._on_exit(worker, code))
+        process.errorOccurred.connect(lambda error, worker=worker: self._on_error(worker, error))
+        worker.process = process
+        worker.timer = QTimer()
+        worker.timer.setSingleShot(True)
+        worker.timer.timeout.connect(lambda worker=worker: self._on_timeout(worker))
+        self.workers[index] = worker
+
+        args = [os.path.abspath(__file__), "--worker"]
+        if self.memory_mb:
+            args += ["--memory-mb", str(self.memory_mb)]
+        process.start(worker_python(), args)
+
+    def _kill(self, worker):
+        worker.timer.stop()
+        worker.state = WorkerProcess.STOPPING
+        if worker.process.state() != QProcess.NotRunning:
+            worker.process.kill()
+
+    def _dispatch(self):
+        for task in list(self.pending):
+            worker = self._worker_for(task)
+            if worker is None:
+                continue
+            self.pending.remove(task)
+            if task["session"] is not None:
+                self.session_workers[task["session"]] = worker.index
+            worker.state = WorkerProcess.BUSY
+            worker.task = task
+            worker.timer.start(int(task["timeout"] * 1000))
+            worker.process.write(encode_message(task["request"], FRAMING_LENGTH))
+
+    def _worker_for(self, task):
+        """Idle worker that may run task, or None"""
+        if task["session"] in self.session_workers:
+            worker = self.workers.get(self.session_workers[task["session"]])
+            return worker if worker and worker.state == WorkerProcess.IDLE else None
+        idle = [worker for worker in self.workers.values() if worker.state == WorkerProcess.IDLE]
+        return min(idle, key=lambda worker: worker.tasks_run) if idle else None
+
+    def _cancel(self, task):
+        if task in self.pending:
+            self.pending.remove(task)
+            self._finish(task, Job.CANCELLED, error="Cancelled")
+            return
+        for worker in self.workers.values():
+            if worker.task is task:
+                worker.task = None
+                self._finish(task, Job.CANCELLED, error="Cancelled")
+                self._kill(worker)
+
+    def _on_output(self, worker):
+        if worker.state == WorkerProcess.STOPPING:
+            return
+        worker.decoder.feed(bytes(worker.process.readAllStandardOutput()))
+        while True:
+            try:
+                message = worker.decoder.next_message()
+            except ValueError as e:
+                QgsMessageLog.logMessage(f"Worker {worker.index} sent an invalid message: {e}", "QGIS MCP", Qgis.Warning)
+                self._kill(worker)
+                return
+            if message is None:
+                break
+            if message.get("status") == "ready":
+                worker.pid = message.get("pid")
+                self.start_failures = 0
+            elif worker.task:
+                worker.timer.stop()
+                task = worker.task
+                worker.task = None
+                worker.tasks_run += 1
+                if message.get("status") == "success":
+                    self._finish(task, Job.SUCCEEDED, result=message.get("result"))
+                else:
+                    self._finish(task, Job.FAILED, error=message.get("message", "Unknown error"))
+            worker.state = WorkerProcess.IDLE
+        self._dispatch()
+
+    def _on_stderr(self, worker):
+        # Keep the end of stderr to explain crashes
+        worker.stderr_tail = (worker.stderr_tail + bytes(worker.process.readAllStandardError()))[-4096:]
+
+    def _on_timeout(self, worker):
+        task = worker.task
+        if task is None:
+            return
+        worker.task = None
+        self._finish(task, Job.FAILED, error=f"Timed out after {task['timeout']} seconds")
+        self._kill(worker)
+
+    def _on_error(self, worker, error):
+        # A process that never started does not emit finished
+        if error == QProcess.FailedToStart:
+            self._on_exit(worker, None)
+
+    def _on_exit(self, worker, code):
+        if self.workers.get(worker.index) is not worker:
+            return
+        worker.timer.stop()
+        del self.workers[worker.index]
+        for session in [name for name, index in self.session_workers.items() if index == worker.index]:
+            del self.session_workers[session]
+        stderr = worker.stderr_tail.decode("utf-8", "replace").strip() or worker.process.errorString()
+        if worker.task:
+            message = f"Worker process exited with code {code}"
+            if self.memory_mb:
+                message += f" (memory limit {self.memory_mb} MB)"
+            self._finish(worker.task, Job.FAILED, error=message, result={"stderr": stderr})
+            worker.task = None
+        if worker.state == WorkerProcess.STARTING:
+            self.start_failures += 1
+            QgsMessageLog.logMessage(f"Worker process failed to start ({worker_python()}): {stderr}", "QGIS MCP",
+                                     Qgis.Warning)
+        if not self.running:
+            return
+        if self.start_failures >= MAX_WORKER_START_FAILURES:
+            while self.pending:
+                self._finish(self.pending.popleft(), Job.FAILED, error=f"Worker processes failed to start: {stderr}")
+            self.stop()
+            return
+        self._spawn(worker.index)
+
+
+class ClientConnection:
+    """State of one connected client: buffers, notifiers and queued commands"""
+
+    def __init__(self, sock, address, local=False):
+        self.socket = sock
+        self.address = address
+        self.local = local  # Unix socket or loopback peer, able to read our temporary files
+        self.decoder = MessageDecoder()
+        self.compression_threshold = COMPRESS_THRESHOLD
+        self.handoff = False  # Large responses are written to files (negotiated in the handshake)
+        self.handoff_files = set()  # Handoff files not yet deleted by the client
+        self.outgoing = bytearray()
+        self.pending = deque()
+        self.stream = None  # (request id, chunk generator) of a response being streamed
+        self.read_notifier = None
+        self.write_notifier = None
+        self.scheduled = False
+        # Set while a queued handshake may change how the following bytes are framed
+        self.decoding_paused = False
+        # Set once the client shut down its sending side; closed after the last response is sent
+        self.eof = False
+        self.closed = False
+
 
 class QgisMCPServer(QObject):
     """Server class to handle socket connections and execute QGIS commands"""
     
-    def __init__(self, host='localhost', port=9876, iface=None):
+    def __init__(self, host='localhost', port=9876, iface=None, max_connections=16, max_queue_depth=32,
+                 render_cache_bytes=64 * 1024 * 1024, worker_count=2, worker_timeout=WORKER_TIMEOUT,
+                 worker_memory_mb=0, prewarm_workers=False, unix_socket=None):
         super().__init__()
         self.host = host
         self.port = port
+        self.unix_socket = unix_socket  # Path of an additional AF_UNIX listening socket
         self.iface = iface
+        self.max_connections = max_connections
+        self.max_queue_depth = max_queue_depth
         self.running = False
         self.socket = None
-        self.client = None
-        self.buffer = b''
-        self.timer = None
+        self.accept_notifier = None
+        self.unix_listener = None
+        self.unix_notifier = None
+        self.handoff_dir = None
+        self.connections = {}  # socket fileno -> ClientConnection
+        self.ready = deque()  # connections with queued commands, served round-robin
+        self.dispatch_scheduled = False
+        self.jobs = {}  # job id -> Job
+        self.render_cache = RenderCache(render_cache_bytes)
+        self.layer_revisions = {}  # layer id -> counter bumped on style/data changes
+        self.project_connections = []  # (signal, slot) pairs connected while running
+        self.layer_connections = {}  # layer id -> [(signal, slot), ...]
+        self.layer_index = LayerIndex(self._describe_layer)
+        self.code_cache = CodeCache()
+        self.algorithm_index = AlgorithmIndex(self._json_value)
+        self.sessions = {}  # session name -> ExecSession
+        self.test_state = {}  # incremental run_test key -> {"hashes": {...}, "failed": set of test ids}
+        self.file_hashes = {}  # path -> ((mtime_ns, size), sha256)
+        self.plugin_snapshots = {}  # symlinked plugin name -> {relative path: sha256}
+        self.module_hashes = {}  # plugin module name -> sha256 of its source when last (re)loaded
+        self.worker_pool = WorkerPool(worker_count, worker_timeout, worker_memory_mb)
+        self.prewarm_workers = prewarm_workers
     
     def start(self):
         """Start the server"""
         self.running = True
+        self.watch_project()
         self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
         
         try:
             self.socket.bind((self.host, self.port))
-            self.socket.listen(1)
+            self.socket.listen(self.max_connections)
             self.socket.setblocking(False)
             
-            # Create a timer to process server operations
-            self.timer = QTimer()
-            self.timer.timeout.connect(self.process_server)
-            self.timer.start(100)  # 100ms interval
+            # Wake up only when a connection is waiting instead of polling
+            self.accept_notifier = QSocketNotifier(self.socket.fileno(), QSocketNotifier.Read)
+            self.accept_notifier.activated.connect(lambda *args: self.accept_connections(self.socket))
             
             QgsMessageLog.logMessage(f"QGIS MCP server started on {self.host}:{self.port}", "QGIS MCP")
+            if self.unix_socket:
+                self.listen_unix()
+            if self.prewarm_workers and self.worker_pool.size:
+                self.worker_pool.start()
             return True
         except Exception as e:
             QgsMessageLog.logMessage(f"Failed to start server: {str(e)}", "QGIS MCP", Qgis.Critical)
@@ -54,82 +1146,492 @@ class QgisMCPServer(QObject):
         """Stop the server"""
         self.running = False
         
-        if self.timer:
-            self.timer.stop()
-            self.timer = None
+        for job in self.jobs.values():
+            if job.status == Job.RUNNING and job.cancel:
+                job.cancel()
+        
+        self.worker_pool.stop()
+        self.unwatch_project()
+        for notifier in (self.accept_notifier, self.unix_notifier):
+            if notifier:
+                notifier.setEnabled(False)
+        self.accept_notifier = None
+        self.unix_notifier = None
+        for conn in list(self.connections.values()):
+            self.close_connection(conn)
+        self.ready.clear()
             
         if self.socket:
             self.socket.close()
-        if self.client:
-            self.client.close()
+        if self.unix_listener:
+            self.unix_listener.close()
+            try:
+                os.unlink(self.unix_socket)
+            except OSError:
+                pass
+        if self.handoff_dir:
+            shutil.rmtree(self.handoff_dir, ignore_errors=True)
             
         self.socket = None
-        self.client = None
+        self.unix_listener = None
+        self.handoff_dir = None
         QgsMessageLog.logMessage("QGIS MCP server stopped", "QGIS MCP")
     
-    def process_server(self):
-        """Process server operations (called by timer)"""
-        if not self.running:
+    def listen_unix(self):
+        """Also accept connections on the Unix domain socket at self.unix_socket"""
+        if not hasattr(socket, "AF_UNIX"):
+            QgsMessageLog.logMessage("Unix domain sockets are not supported on this platform", "QGIS MCP", Qgis.Warning)
+            return
+        try:
+            if os.path.lexists(self.unix_socket):
+                if not self._stale_unix_socket(self.unix_socket):
+                    raise OSError(f"{self.unix_socket} exists and is not a stale socket")
+                os.unlink(self.unix_socket)  # Left over from a previous run
+            self.unix_listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self.unix_listener.bind(self.unix_socket)
+            os.chmod(self.unix_socket, 0o600)
+            self.unix_listener.listen(self.max_connections)
+            self.unix_listener.setblocking(False)
+            self.unix_notifier = QSocketNotifier(self.unix_listener.fileno(), QSocketNotifier.Read)
+            self.unix_notifier.activated.connect(lambda *args: self.accept_connections(self.unix_listener))
+            QgsMessageLog.logMessage(f"QGIS MCP server listening on {self.unix_socket}", "QGIS MCP")
+        except OSError as e:
+            QgsMessageLog.logMessage(f"Failed to listen on {self.unix_socket}: {str(e)}", "QGIS MCP", Qgis.Warning)
+            if self.unix_listener:
+                self.unix_listener.close()
+                self.unix_listener = None
+    
+    def _stale_unix_socket(self, path):
+        """Whether path is a Unix socket nobody listens on any more"""
+        if not stat.S_ISSOCK(os.lstat(path).st_mode):
+            return False
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(path)
+        except ConnectionRefusedError:
+            return True
+        finally:
+            probe.close()
+        return False  # Another server (e.g. a second QGIS) is listening
+    
+    def watch_project(self):
+        """Track project and layer changes that invalidate cached state"""
+        project = QgsProject.instance()
+        root = project.layerTreeRoot()
+        registry = QgsApplication.processingRegistry()
+        for signal, slot in (
+            (registry.providerAdded, self.algorithm_index.invalidate),
+            (registry.providerRemoved, self.algorithm_index.invalidate),
+            (project.layersAdded, self.on_layers_added),
+            (project.layersRemoved, self.on_layers_removed),
+            (project.cleared, self.on_project_reset),
+            (project.readProject, self.on_project_reset),
+            (project.crsChanged, self.on_project_reset),
+            (root.visibilityChanged, self.layer_index.invalidate_visibility),
+            (root.addedChildren, self.layer_index.invalidate_visibility),
+            (root.removedChildren, self.layer_index.invalidate_visibility),
+        ):
+            signal.connect(slot)
+            self.project_connections.append((signal, slot))
+        self.layer_index.clear()
+        self.on_layers_added(list(project.mapLayers().values()))
+    
+    def unwatch_project(self):
+        """Disconnect everything connected by watch_project"""
+        connections = list(self.project_connections)
+        for layer_connections in self.layer_connections.values():
+            connections.extend(layer_connections)
+        for signal, slot in connections:
+            try:
+                signal.disconnect(slot)
+            except (TypeError, RuntimeError):
+                pass  # Already disconnected or the object is gone
+        self.project_connections = []
+        self.layer_connections = {}
+        self.layer_index.clear()
+    
+    def on_layers_added(self, layers):
+        """Watch new layers for changes that affect their rendering"""
+        for layer in layers:
+            layer_id = layer.id()
+            if layer_id in self.layer_connections:
+                continue
+            self.layer_index.add(layer)
+            slot = lambda *args, layer_id=layer_id: self.on_layer_changed(layer_id)
+            connections = []
+            for name in ("repaintRequested", "styleChanged", "dataChanged", "rendererChanged", "nameChanged"):
+                signal = getattr(layer, name, None)
+                if signal is not None:
+                    signal.connect(slot)
+                    connections.append((signal, slot))
+            self.layer_connections[layer_id] = connections
+    
+    def on_layers_removed(self, layer_ids):
+        """Forget removed layers"""
+        for layer_id in layer_ids:
+            # The layer is deleted with its connections, nothing to disconnect
+            self.layer_connections.pop(layer_id, None)
+            self.layer_revisions.pop(layer_id, None)
+            self.layer_index.remove(layer_id)
+            self.render_cache.invalidate_layer(layer_id)
+    
+    def on_layer_changed(self, layer_id):
+        """A layer's name, style or data changed"""
+        self.layer_revisions[layer_id] = self.layer_revisions.get(layer_id, 0) + 1
+        self.layer_index.refresh(layer_id)
+        self.render_cache.invalidate_layer(layer_id)
+    
+    def on_project_reset(self, *args):
+        """The project was cleared, reloaded or reprojected"""
+        self.render_cache.clear()
+        self.layer_index.invalidate_visibility()
+    
+    def accept_connections(self, listener):
+        """Accept all waiting connections (called when a listening socket is readable)"""
+        while self.running and listener.fileno() >= 0:
+            try:
+                client, address = listener.accept()
+            except BlockingIOError:
+                return  # No more connections waiting
+            except Exception as e:
+                QgsMessageLog.logMessage(f"Error accepting connection: {str(e)}", "QGIS MCP", Qgis.Warning)
+                return
+            
+            if len(self.connections) >= self.max_connections:
+                QgsMessageLog.logMessage(f"Rejected client {address}: connection limit reached", "QGIS MCP", Qgis.Warning)
+                try:
+                    client.sendall(encode_message({
+                        "status": "error",
+                        "message": f"Too many connections (limit is {self.max_connections})"
+                    }))
+                except OSError:
+                    pass
+                client.close()
+                continue
+            
+            client.setblocking(False)
+            if client.family == socket.AF_INET or client.family == socket.AF_INET6:
+                local = address[0] in ("127.0.0.1", "::1", "::ffff:127.0.0.1")
+            else:
+                local = True  # Unix domain socket
+            conn = ClientConnection(client, address or self.unix_socket, local)
+            conn.read_notifier = QSocketNotifier(client.fileno(), QSocketNotifier.Read)
+            conn.read_notifier.activated.connect(lambda *args, conn=conn: self.read_connection(conn))
+            conn.write_notifier = QSocketNotifier(client.fileno(), QSocketNotifier.Write)
+            conn.write_notifier.activated.connect(lambda *args, conn=conn: self.flush_connection(conn))
+            conn.write_notifier.setEnabled(False)
+            self.connections[client.fileno()] = conn
+            QgsMessageLog.logMessage(f"Connected to client: {address} ({len(self.connections)} open)", "QGIS MCP")
+    
+    def close_connection(self, conn):
+        """Close a client connection and drop its queued commands"""
+        if conn.closed:
+            return
+        conn.closed = True
+        for notifier in (conn.read_notifier, conn.write_notifier):
+            if notifier:
+                notifier.setEnabled(False)
+        conn.read_notifier = None
+        conn.write_notifier = None
+        conn.pending.clear()
+        if conn.stream:
+            conn.stream[1].close()
+            conn.stream = None
+        for path in conn.handoff_files:
+            try:
+                os.remove(path)
+            except OSError:
+                pass  # Already read and deleted by the client
+        conn.handoff_files.clear()
+        
+        self.connections.pop(conn.socket.fileno(), None)
+        conn.socket.close()
+    
+    def read_connection(self, conn):
+        """Drain all readable data from a client and queue complete messages"""
+        if conn.closed:
             return
             
         try:
-            # Accept new connections
-            if not self.client and self.socket:
+            while True:
                 try:
-                    self.client, address = self.socket.accept()
-                    self.client.setblocking(False)
-                    QgsMessageLog.logMessage(f"Connected to client: {address}", "QGIS MCP")
+                    data = conn.socket.recv(65536)
                 except BlockingIOError:
-                    pass  # No connection waiting
-                except Exception as e:
-                    QgsMessageLog.logMessage(f"Error accepting connection: {str(e)}", "QGIS MCP", Qgis.Warning)
+                    break  # Socket drained
+                if not data:
+                    # Connection closed by client, maybe only for sending: still answer what it sent
+                    QgsMessageLog.logMessage(f"Client disconnected: {conn.address}", "QGIS MCP")
+                    conn.eof = True
+                    break
+                conn.decoder.feed(data)
+            self.queue_messages(conn)
+        except Exception as e:
+            QgsMessageLog.logMessage(f"Error receiving data: {str(e)}", "QGIS MCP", Qgis.Warning)
+            self.close_connection(conn)
+    
+    def queue_messages(self, conn):
+        """Move complete messages from the decoder to the connection's queue"""
+        try:
+            while not conn.decoding_paused and len(conn.pending) < self.max_queue_depth:
+                command = conn.decoder.next_message()
+                if command is None:
+                    break  # Incomplete data, keep in buffer
+                conn.pending.append(command)
+                if isinstance(command, dict) and command.get("type") == "handshake":
+                    conn.decoding_paused = True
+        except Exception as e:
+            QgsMessageLog.logMessage(f"Malformed message from {conn.address}: {str(e)}", "QGIS MCP", Qgis.Warning)
+            self.close_connection(conn)
+            return
+        
+        # Stop reading from clients that are too far ahead; TCP pushes back on them
+        conn.read_notifier.setEnabled(not conn.eof and len(conn.pending) < self.max_queue_depth)
+        self.schedule_connection(conn)
+        self.close_if_finished(conn)
+    
+    def close_if_finished(self, conn):
+        """Close a connection the client has shut down once every command it sent is answered and sent.
+
+        Called after queue_messages drained the decoder, so nothing is left
+        to decode unless a handshake paused decoding.
+        """
+        if (conn.eof and not conn.closed and not conn.decoding_paused and not conn.pending and not conn.stream
+                and not conn.outgoing):
+            # The client reads its last handoff files after we close; they go with handoff_dir on stop
+            conn.handoff_files.clear()
+            self.close_connection(conn)
+    
+    def schedule_connection(self, conn):
+        """Put a connection in the ready queue if it has work the dispatcher can do now"""
+        if conn.closed or conn.scheduled:
+            return
+        if conn.stream:
+            # Streams wait for the client to read what was already sent
+            has_work = len(conn.outgoing) < STREAM_HIGH_WATER
+        else:
+            has_work = bool(conn.pending)
+        if has_work:
+            conn.scheduled = True
+            self.ready.append(conn)
+            self.schedule_dispatch()
+    
+    def schedule_dispatch(self):
+        """Run dispatch_next on the next event loop iteration"""
+        if not self.dispatch_scheduled:
+            self.dispatch_scheduled = True
+            QTimer.singleShot(0, self.dispatch_next)
+    
+    def dispatch_next(self):
+        """Execute one queued command (or stream chunk) from the next ready connection.
+
+        Connections take turns, one command each, and control returns to the
+        event loop between commands so socket I/O keeps flowing.
+        """
+        self.dispatch_scheduled = False
+        try:
+            while self.ready:
+                conn = self.ready.popleft()
+                conn.scheduled = False
+                if conn.closed:
+                    continue
                 
-            # Process existing connection
-            if self.client:
+                command = None
                 try:
-                    # Try to receive data
-                    try:
-                        data = self.client.recv(8192)
-                        if data:
-                            self.buffer += data
-                            # Try to process complete messages
-                            try:
-                                # Attempt to parse the buffer as JSON
-                                command = json.loads(self.buffer.decode('utf-8'))
-                                # If successful, clear the buffer and process command
-                                self.buffer = b''
-                                response = self.execute_command(command)
-                                response_json = json.dumps(response)
-                                if self.client:
-                                    self.client.sendall(response_json.encode('utf-8'))
-                            except json.JSONDecodeError:
-                                # Incomplete data, keep in buffer
-                                pass
-                        else:
-                            # Connection closed by client
-                            QgsMessageLog.logMessage("Client disconnected", "QGIS MCP")
-                            self.client.close()
-                            self.client = None
-                            self.buffer = b''
-                    except BlockingIOError:
-                        pass  # No data available
-                    except Exception as e:
-                        QgsMessageLog.logMessage(f"Error receiving data: {str(e)}", "QGIS MCP", Qgis.Warning)
-                        self.client.close()
-                        self.client = None
-                        self.buffer = b''
-                        
+                    if conn.stream:
+                        self.send_stream_chunk(conn)
+                    elif conn.pending:
+                        command = conn.pending.popleft()
+                        self.handle_message(conn, command)
+                    else:
+                        continue
                 except Exception as e:
-                    QgsMessageLog.logMessage(f"Error with client: {str(e)}", "QGIS MCP", Qgis.Warning)
-                    if self.client:
-                        self.client.close()
-                        self.client = None
-                    self.buffer = b''
-                    
+                    # Commands catch their own errors; this is a bug in framing or encoding
+                    QgsMessageLog.logMessage(f"Error dispatching a command from {conn.address}: {str(e)}", "QGIS MCP",
+                                             Qgis.Critical)
+                    self.send_dispatch_error(conn, command, e)
+                if not conn.closed:
+                    self.queue_messages(conn)
+                break
+        finally:
+            # Other connections must not stall behind one that failed
+            if self.ready:
+                self.schedule_dispatch()
+    
+    def send_dispatch_error(self, conn, command, error):
+        """Answer a command (or stream) that failed outside its handler; close the connection if even that fails"""
+        request_id = command.get("id") if isinstance(command, dict) else None
+        if conn.stream:
+            request_id = conn.stream[0]
+            conn.stream[1].close()
+            conn.stream = None
+        if isinstance(command, dict) and command.get("type") == "handshake":
+            conn.decoding_paused = False  # The framing did not change
+        response = {"status": "error", "message": f"Internal error: {str(error)}"}
+        if request_id is not None:
+            response["id"] = request_id
+        try:
+            self.send_to_connection(conn, encode_message(response, conn.decoder.framing))
+        except Exception:
+            self.close_connection(conn)
+    
+    def send_to_connection(self, conn, data):
+        """Queue data for a client and send as much as the socket accepts"""
+        if conn.closed:
+            return
+        conn.outgoing += data
+        self.flush_connection(conn)
+    
+    def flush_connection(self, conn):
+        """Write queued data until the socket would block"""
+        if conn.closed:
+            return
+            
+        try:
+            while conn.outgoing:
+                try:
+                    sent = conn.socket.send(conn.outgoing)
+                except BlockingIOError:
+                    break
+                del conn.outgoing[:sent]
+        except Exception as e:
+            QgsMessageLog.logMessage(f"Error sending data: {str(e)}", "QGIS MCP", Qgis.Warning)
+            self.close_connection(conn)
+            return
+            
+        # Only ask for write readiness while data is pending
+        conn.write_notifier.setEnabled(bool(conn.outgoing))
+        if conn.stream:
+            self.schedule_connection(conn)
+        elif conn.eof and not conn.outgoing:
+            self.queue_messages(conn)  # Closes the connection if nothing is left to answer
+
+    def handle_message(self, conn, command):
+        """Execute a decoded message and send the response in the connection's framing"""
+        if not isinstance(command, dict):
+            response = {"status": "error", "message": "Commands must be JSON objects"}
+            self.send_to_connection(conn, self.encode_response(conn, response))
+            return
+            
+        if command.get("type") == "handshake":
+            # Reply in the old framing, then switch for all following messages
+            params = command.get("params", {})
+            if isinstance(params, dict):
+                response = self.handshake(**dict(params, local=conn.local))
+            else:
+                response = {"status": "error", "message": "Handshake params must be a JSON object"}
+            if "id" in command:
+                response["id"] = command["id"]
+            self.send_to_connection(conn, encode_message(response, conn.decoder.framing))
+            if response["status"] == "success":
+                conn.decoder.set_framing(response["result"]["framing"])
+                conn.decoder.compression = response["result"].get("compression")
+                conn.compression_threshold = response["result"].get("compress_threshold", COMPRESS_THRESHOLD)
+                conn.handoff = response["result"]["handoff"]
+            conn.decoding_paused = False
+            return
+
+        # execute_command echoes the request id so pipelining clients can match responses
+        response = self.execute_command(command)
+        if isinstance(response.get("result"), StreamingResult):
+            chunks = response["result"].chunks
+            if conn.decoder.framing == FRAMING_JSON:
+                chunks.close()
+                response = {"status": "error", "message": "Streaming requires a framed connection (see handshake)"}
+                if "id" in command:
+                    response["id"] = command["id"]
+            else:
+                # Chunks are sent by dispatch_next as the client keeps up
+                conn.stream = (command.get("id"), chunks)
+                return
+        self.send_to_connection(conn, self.encode_response(conn, response))
+    
+    def encode_response(self, conn, response):
+        """Serialize a response in the connection's framing and compression, or hand it off as a file"""
+        if conn.handoff:
+            payload = json.dumps(response, separators=(',', ':')).encode('utf-8')
+            if len(payload) >= HANDOFF_THRESHOLD:
+                return encode_message({"handoff": self.write_handoff(conn, payload)}, conn.decoder.framing)
+            return frame_payload(payload, conn.decoder.framing, conn.decoder.compression, conn.compression_threshold)
+        return encode_message(response, conn.decoder.framing, conn.decoder.compression, conn.compression_threshold)
+    
+    def write_handoff(self, conn, payload):
+        """Write a serialized response to a temporary file the client reads and deletes"""
+        if self.handoff_dir is None:
+            self.handoff_dir = tempfile.mkdtemp(prefix="qgis_mcp_")
+        path = os.path.join(self.handoff_dir, f"{uuid.uuid4().hex}.json")
+        with open(path, "wb") as f:
+            f.write(payload)
+        conn.handoff_files.add(path)
+        return {"path": path, "size": len(payload)}
+    
+    def send_stream_chunk(self, conn):
+        """Send the next chunk of the connection's streamed response"""
+        request_id, chunks = conn.stream
+        try:
+            response = {"status": "partial", "result": next(chunks)}
+        except StopIteration as finished:
+            conn.stream = None
+            response = {"status": "success", "result": finished.value}
         except Exception as e:
-            QgsMessageLog.logMessage(f"Server error: {str(e)}", "QGIS MCP", Qgis.Critical)
+            conn.stream = None
+            QgsMessageLog.logMessage(f"Error while streaming: {str(e)}", "QGIS MCP", Qgis.Critical)
+            response = {"status": "error", "message": str(e)}
+        if request_id is not None:
+            response["id"] = request_id
+        self.send_to_connection(conn, self.encode_response(conn, response))
+
+    def handshake(self, framing=FRAMING_JSON, compression=None, compress_threshold=COMPRESS_THRESHOLD,
+                  handoff=False, local=False, **kwargs):
+        """
+        Negotiate the framing mode used by this connection.
+
+        `compression` lists the codecs the client accepts, in order of
+        preference; the first one the plugin supports is used for frames of at
+        least `compress_threshold` bytes, in both directions. Compression
+        requires length framing.
+
+        `handoff` asks for responses of at least HANDOFF_THRESHOLD bytes to be
+        written to a temporary file instead of the socket; only granted to
+        `local` connections (Unix socket or loopback).
+        """
+        if framing not in SUPPORTED_FRAMINGS:
+            return {
+                "status": "error",
+                "message": f"Unsupported framing: {framing}. Supported: {', '.join(SUPPORTED_FRAMINGS)}"
+            }
+        if isinstance(compression, str):
+            compression = [compression]
+        if compression is not None and not isinstance(compression, list):
+            return {"status": "error", "message": "compression must be a codec name or a list of them"}
+        try:
+            compress_threshold = max(0, int(compress_threshold))
+        except (TypeError, ValueError):
+            return {"status": "error", "message": f"compress_threshold must be an integer, got {compress_threshold!r}"}
+        codec = None
+        if framing == FRAMING_LENGTH:
+            codec = next((name for name in compression or () if name in SUPPORTED_COMPRESSIONS), None)
+        return {
+            "status": "success",
+            "result": {
+                "protocol_version": PROTOCOL_VERSION,
+                "framing": framing,
+                "framings": list(SUPPORTED_FRAMINGS),
+                "compression": codec,
+                "compressions": list(SUPPORTED_COMPRESSIONS),
+                "compress_threshold": compress_threshold,
+                "handoff": bool(handoff and local),
+                "handoff_threshold": HANDOFF_THRESHOLD
+            }
+        }
 
     def execute_command(self, command):
+        """Execute a command, echoing its request id in the response"""
+        response = self._execute_command(command)
+        if isinstance(command, dict) and "id" in command:
+            response["id"] = command["id"]
+        return response
+
+    def _execute_command(self, command):
         """Execute a command"""
         try:
             cmd_type = command.get("type")
@@ -141,21 +1643,38 @@ class QgisMCPServer(QObject):
                 "load_project": self.load_project,
                 "get_project_info": self.get_project_info,
                 "execute_code": self.execute_code,
+                "list_sessions": self.list_sessions,
+                "reset_session": self.reset_session,
+                "close_session": self.close_session,
+                "collect_sessions": self.collect_sessions,
+                "start_workers": self.start_workers,
+                "worker_status": self.worker_status,
                 "add_vector_layer": self.add_vector_layer,
                 "add_raster_layer": self.add_raster_layer,
+                "add_layers": self.add_layers,
                 "get_layers": self.get_layers,
                 "remove_layer": self.remove_layer,
                 "zoom_to_layer": self.zoom_to_layer,
                 "get_layer_features": self.get_layer_features,
                 "execute_processing": self.execute_processing,
+                "list_algorithms": self.list_algorithms,
+                "describe_algorithm": self.describe_algorithm,
                 "save_project": self.save_project,
                 "render_map": self.render_map,
+                "render_tiles": self.render_tiles,
                 "create_new_project": self.create_new_project,
                 "run_test": self.run_test,
+                "list_tests": self.list_tests,
                 "install_plugin": self.install_plugin,
                 "reload_plugin": self.reload_plugin,
                 "install_processing_script": self.install_processing_script,
                 "list_processing_scripts": self.list_processing_scripts,
+                "batch": self.batch,
+                "job_status": self.job_status,
+                "job_result": self.job_result,
+                "cancel_job": self.cancel_job,
+                "list_jobs": self.list_jobs,
+                "clear_render_cache": self.clear_render_cache,
             }
             
             handler = handlers.get(cmd_type)
@@ -182,6 +1701,36 @@ class QgisMCPServer(QObject):
         """Simple ping command"""
         return {"pong": True}
     
+    def batch(self, commands, stop_on_error=False, **kwargs):
+        """Execute a list of commands in one request and return one response per command"""
+        if not isinstance(commands, list):
+            raise Exception("'commands' must be a list of {\"type\": ..., \"params\": {...}} objects")
+        
+        results = []
+        for index, command in enumerate(commands):
+            if not isinstance(command, dict):
+                response = {"status": "error", "message": "Commands must be JSON objects"}
+            elif command.get("type") in ("batch", "handshake"):
+                response = {"status": "error", "message": f"Command type not allowed in a batch: {command.get('type')}"}
+            else:
+                response = self.execute_command(command)
+                if isinstance(response.get("result"), StreamingResult):
+                    response["result"].chunks.close()
+                    response = {"status": "error", "message": "Streaming is not supported inside a batch"}
+            response["index"] = index
+            results.append(response)
+            
+            if stop_on_error and response["status"] != "success":
+                break
+        
+        succeeded = sum(1 for response in results if response["status"] == "success")
+        return {
+            "results": results,
+            "succeeded": succeeded,
+            "failed": len(results) - succeeded,
+            "skipped": len(commands) - len(results)
+        }
+    
     def get_qgis_info(self, **kwargs):
         """Get basic QGIS information"""
         return {
@@ -198,27 +1747,39 @@ class QgisMCPServer(QObject):
         info = {
             "filename": project.fileName(),
             "title": project.title(),
-            "layer_count": len(project.mapLayers()),
+            "layer_count": len(self.layer_index),
             "crs": project.crs().authid(),
             "layers": []
         }
         
-        # Add basic layer information (limit to 10 layers for performance)
-        layers = list(project.mapLayers().values())
-        for i, layer in enumerate(layers):
-            if i >= 10:  # Limit to 10 layers
-                break
-                
-            layer_info = {
-                "id": layer.id(),
-                "name": layer.name(),
-                "type": self._get_layer_type(layer),
-                "visible": layer.isValid() and project.layerTreeRoot().findLayer(layer.id()).isVisible()
-            }
-            info["layers"].append(layer_info)
+        # Add basic layer information
+        for layer_id, (layer, metadata) in self.layer_index:
+            info["layers"].append({
+                "id": layer_id,
+                "name": metadata["name"],
+                "type": metadata["type"],
+                "visible": self.layer_index.is_visible(layer_id)
+            })
         
         return info
     
+    def _describe_layer(self, layer):
+        """Static layer metadata kept in the layer index"""
+        metadata = {
+            "name": layer.name(),
+            "type": self._get_layer_type(layer)
+        }
+        
+        # Add type-specific information
+        if layer.type() == QgsMapLayer.VectorLayer:
+            metadata["geometry_type"] = layer.geometryType()
+        elif layer.type() == QgsMapLayer.RasterLayer:
+            metadata.update({
+                "width": layer.width(),
+                "height": layer.height()
+            })
+        return metadata
+    
     def _get_layer_type(self, layer):
         """Helper to get layer type as string"""
         if layer.type() == QgsMapLayer.VectorLayer:
@@ -228,8 +1789,46 @@ class QgisMCPServer(QObject):
         else:
             return str(layer.type())
     
-    def execute_code(self, code, **kwargs):
-        """Execute arbitrary PyQGIS code"""
+    def _code_namespace(self):
+        """Fresh globals for execute_code"""
+        return {
+            "qgis": Qgis,
+            "QgsProject": QgsProject,
+            "iface": self.iface,
+            "QgsApplication": QgsApplication,
+            "QgsVectorLayer": QgsVectorLayer,
+            "QgsRasterLayer": QgsRasterLayer,
+            "QgsCoordinateReferenceSystem": QgsCoordinateReferenceSystem
+        }
+    
+    def execute_code(self, code, session=None, isolated=False, timeout=None, **kwargs):
+        """
+        Execute arbitrary PyQGIS code.
+
+        Without `session` the code runs in a fresh namespace. With a session
+        name, variables, imports and functions defined by earlier calls in
+        that session are still available. Compiled code is cached by source
+        hash, so re-running the same snippet skips compilation.
+
+        With `isolated=True` the code runs in a worker process instead of
+        the QGIS main thread and a job id is returned; `timeout` overrides
+        the pool's time limit.
+        """
+        if isolated:
+            params = {"code": code}
+            if session is not None:
+                params["session"] = session
+            return self._start_worker_job("execute_code", params, session=session, timeout=timeout)
+        if session is not None:
+            self.collect_sessions()
+            exec_session = self.sessions.get(session)
+            if exec_session is None:
+                exec_session = self.sessions[session] = ExecSession(session, self._code_namespace())
+            exec_session.last_used = time.time()
+            exec_session.runs += 1
+            namespace = exec_session.namespace
+        else:
+            namespace = self._code_namespace()
 
         # Capture stdout and stderr
         stdout_capture = io.StringIO()
@@ -244,25 +1843,14 @@ class QgisMCPServer(QObject):
             sys.stdout = stdout_capture
             sys.stderr = stderr_capture
             
-            # Create a local namespace for execution
-            namespace = {
-                "qgis": Qgis,
-                "QgsProject": QgsProject,
-                "iface": self.iface,
-                "QgsApplication": QgsApplication,
-                "QgsVectorLayer": QgsVectorLayer,
-                "QgsRasterLayer": QgsRasterLayer,
-                "QgsCoordinateReferenceSystem": QgsCoordinateReferenceSystem
-            }
-            
             # Execute the code
-            exec(code, namespace)
+            exec(self.code_cache.compile(code), namespace)
             
             # Restore stdout and stderr
             sys.stdout = original_stdout
             sys.stderr = original_stderr
             
-            return {
+            result = {
                 "executed": True,
                 "stdout": stdout_capture.getvalue(),
                 "stderr": stderr_capture.getvalue()
@@ -275,21 +1863,268 @@ class QgisMCPServer(QObject):
             sys.stdout = original_stdout
             sys.stderr = original_stderr
             
-            return {
+            result = {
                 "executed": False,
                 "error": str(e),
                 "traceback": error_traceback,
                 "stdout": stdout_capture.getvalue(),
                 "stderr": stderr_capture.getvalue()
             }
+        if session is not None:
+            result["session"] = session
+        return result
+    
+    def list_sessions(self, **kwargs):
+        """List execute_code sessions and the compiled code cache statistics"""
+        return {
+            "sessions": [exec_session.to_dict() for exec_session in self.sessions.values()],
+            "code_cache": self.code_cache.stats()
+        }
+    
+    def reset_session(self, session, **kwargs):
+        """Clear a session's namespace, keeping the session itself"""
+        exec_session = self.sessions.get(session)
+        if exec_session is None:
+            raise Exception(f"Session not found: {session}")
+        exec_session.namespace = self._code_namespace()
+        gc.collect()
+        return exec_session.to_dict()
+    
+    def close_session(self, session, **kwargs):
+        """Drop a session and everything defined in it"""
+        if self.sessions.pop(session, None) is None:
+            raise Exception(f"Session not found: {session}")
+        gc.collect()
+        return {"closed": session}
+    
+    def collect_sessions(self, max_idle=SESSION_IDLE_TIMEOUT, **kwargs):
+        """Drop sessions that have not been used for max_idle seconds"""
+        cutoff = time.time() - max_idle
+        idle = [name for name, exec_session in self.sessions.items() if exec_session.last_used < cutoff]
+        for name in idle:
+            del self.sessions[name]
+        if idle:
+            gc.collect()
+        return {"closed": idle}
     
-    def run_test(self, code=None, path=None, **kwargs):
+    def _load_tests(self, code=None, path=None, source_dir=None):
+        """Build the unittest suite for run_test from a source string or a test file"""
+        loader = unittest.TestLoader()
+        suite = unittest.TestSuite()
+
+        if path:
+            if not os.path.exists(path):
+                raise Exception(f"Test file not found: {path}")
+            # Load tests from file, or from every test*.py file of a directory
+            if os.path.isdir(path):
+                directory = path
+                filename = "test*.py"
+            else:
+                directory = os.path.dirname(path)
+                filename = os.path.basename(path)
+            # Drop the plugin and test modules imported by an earlier run so edits are picked up. Only
+            # done for a plugin folder (or source_dir): a bare folder may hold unrelated shared modules.
+            package_dir = source_dir or self._plugin_dir(path)
+            if package_dir:
+                package_dir = os.path.abspath(package_dir) + os.sep
+                test_dir = os.path.abspath(directory) + os.sep
+                for name, module in list(sys.modules.items()):
+                    module_file = getattr(module, "__file__", None)
+                    if not module_file or name == __name__:
+                        continue
+                    module_file = os.path.abspath(module_file)
+                    is_test = module_file.startswith(test_dir) and fnmatch.fnmatch(os.path.basename(module_file),
+                                                                                  filename)
+                    if is_test or module_file.startswith(package_dir):
+                        del sys.modules[name]
+            # Import tests inside a package (e.g. plugin/tests/) as part of it, so relative imports work
+            top_level_dir = directory
+            while os.path.isfile(os.path.join(top_level_dir, "__init__.py")):
+                top_level_dir = os.path.dirname(top_level_dir)
+            added_top_level = top_level_dir not in sys.path
+            sys.path.insert(0, directory) # Add directory to path to allow imports
+            try:
+                loaded_tests = loader.discover(start_dir=directory, pattern=filename, top_level_dir=top_level_dir)
+                suite.addTests(loaded_tests)
+            finally:
+                sys.path.remove(directory)
+                if added_top_level and top_level_dir in sys.path:
+                    sys.path.remove(top_level_dir)  # Added by discover
+
+        elif code:
+            # Load tests from code string
+            # Create a temporary module
+            import types
+            module_name = "temp_test_module"
+            module = types.ModuleType(module_name)
+            # Populate module with code
+            exec(code, module.__dict__)
+            # Load tests from module
+            loaded_tests = loader.loadTestsFromModule(module)
+            suite.addTests(loaded_tests)
+
+        return suite
+
+    def list_tests(self, code=None, path=None, source_dir=None, **kwargs):
+        """List the ids of the tests run_test would run, and the file defining each"""
+        if not code and not path:
+            raise Exception("Must provide either 'code' or 'path' for list_tests")
+        tests = list(iter_tests(self._load_tests(code, path, source_dir)))
+        return {
+            "tests": [test.id() for test in tests],
+            "files": {test.id(): test_module_file(test) for test in tests}
+        }
+
+    def _plugin_dir(self, path):
+        """The plugin folder (with metadata.txt) containing a test path, or None"""
+        candidate = os.path.abspath(path if os.path.isdir(path) else os.path.dirname(path))
+        for _ in range(3):
+            if os.path.isfile(os.path.join(candidate, "metadata.txt")):
+                return candidate
+            candidate = os.path.dirname(candidate)
+        return None
+
+    def _default_source_dir(self, path):
+        """The plugin folder containing a test path, else the tests' own folder"""
+        return self._plugin_dir(path) or os.path.abspath(path if os.path.isdir(path) else os.path.dirname(path))
+
+    def _hash_sources(self, source_dir, extra_files):
+        """SHA-256 of every .py file under source_dir and of extra_files, reusing hashes of unchanged files"""
+        paths = set(path for path in extra_files if path)
+        for directory, dirnames, filenames in os.walk(source_dir):
+            dirnames[:] = [name for name in dirnames if name != "__pycache__" and not name.startswith(".")]
+            paths.update(os.path.join(directory, name) for name in filenames if name.endswith(".py"))
+        hashes = {}
+        for path in paths:
+            try:
+                hashes[path] = self._file_hash(path)
+            except OSError:
+                continue
+        return hashes
+
+    def _select_tests(self, test_ids, test_files, path, source_dir, changed_only, failed_first):
+        """
+        Pick and order tests for an incremental run.
+
+        With changed_only, a test runs if its module or a file under
+        source_dir that it imports (transitively) changed since the last
+        incremental run of the same path, or if it failed last time.
+        With failed_first, previously failing tests are moved to the front.
+        """
+        source_dir = os.path.abspath(source_dir or self._default_source_dir(path))
+        key = f"{os.path.abspath(path)}|{source_dir}"
+        state = self.test_state.get(key)
+        hashes = self._hash_sources(source_dir, test_files.values())
+        if state is None:
+            changed = set(hashes)
+            failed = set()
+        else:
+            changed = {file for file in set(hashes) | set(state["hashes"]) if hashes.get(file) != state["hashes"].get(file)}
+            failed = state["failed"]
+
+        dependencies = {}  # test module file -> files it depends on
+        selected = []
+        for test_id in test_ids:
+            file = test_files.get(test_id)
+            if not changed_only or state is None or test_id in failed or file is None:
+                selected.append(test_id)
+                continue
+            if file not in dependencies:
+                dependencies[file] = source_dependencies(file, source_dir)
+            if dependencies[file] & changed:
+                selected.append(test_id)
+        if failed_first:
+            selected.sort(key=lambda test_id: test_id not in failed)
+        return {
+            "key": key,
+            "hashes": hashes,
+            "tests": selected,
+            "source_dir": source_dir,
+            "changed_files": sorted(changed) if state is not None else [],
+            "previously_failed": sorted(failed),
+            "skipped": len(test_ids) - len(selected)
+        }
+
+    def _update_test_state(self, selection, ran_ids, result):
+        """Remember file hashes and failing tests after an incremental run"""
+        state = self.test_state.setdefault(selection["key"], {"hashes": {}, "failed": set()})
+        state["hashes"] = selection["hashes"]
+        failed_ids = {failure.get("id") for failure in result["failures"]}
+        state["failed"] = (state["failed"] - set(ran_ids)) | failed_ids
+        result["selection"] = {
+            "source_dir": selection["source_dir"],
+            "changed_files": selection["changed_files"],
+            "previously_failed": selection["previously_failed"],
+            "selected": len(selection["tests"]),
+            "skipped": selection["skipped"]
+        }
+
+    def _test_durations_path(self):
+        return os.path.join(QgsApplication.qgisSettingsDirPath(), TEST_DURATIONS_FILE)
+
+    def _load_test_durations(self):
+        """Per-test durations recorded by earlier runs"""
+        try:
+            with open(self._test_durations_path()) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _record_test_durations(self, durations):
+        if not durations:
+            return
+        recorded = self._load_test_durations()
+        recorded.update((test_id, round(seconds, 6)) for test_id, seconds in durations.items())
+        try:
+            with open(self._test_durations_path(), "w") as f:
+                json.dump(recorded, f)
+        except OSError as e:
+            QgsMessageLog.logMessage(f"Could not save test durations: {e}", "QGIS MCP", Qgis.Warning)
+
+    def run_test(self, code=None, path=None, test_ids=None, shards=None, isolated=False, timeout=None,
+                 slowest=10, trace_memory=False, junit_xml=None, json_report=None, changed_only=False,
+                 failed_first=False, source_dir=None, record_durations=True, **kwargs):
         """
         Run tests using unittest.
         Can provide either 'code' containing a test suite, or 'path' to a python test file.
+        `test_ids` restricts the run to the given test ids (see list_tests).
+        With `isolated=True` the suite runs in a worker process as a job.
+        With `shards=N` the tests are split into N groups balanced by their
+        recorded durations and run in parallel in worker processes; the job
+        result merges the groups into a single report.
+
+        The result has per-test `timings` (wall, CPU, setUp and tearDown
+        seconds; peak Python memory in bytes with `trace_memory=True`) and
+        the `slowest` tests. `junit_xml` and `json_report` are paths to
+        write JUnit XML and JSON reports to.
+
+        `path` may also be a directory, whose test*.py files are run. For
+        edit-test loops, `changed_only` runs only the tests whose module or
+        imported files under `source_dir` (by default the plugin folder
+        containing `path`) changed since the previous incremental run, plus
+        the tests that failed then; `failed_first` runs those failures first.
         """
         if not code and not path:
             raise Exception("Must provide either 'code' or 'path' for run_test")
+        report = {"slowest": slowest, "junit_xml": junit_xml, "json_report": json_report}
+        incremental = None
+        if changed_only or failed_first:
+            if not path:
+                raise Exception("changed_only and failed_first need a test 'path'")
+            incremental = {"changed_only": changed_only, "failed_first": failed_first, "source_dir": source_dir}
+            if isolated and not shards:
+                shards = 1  # Tests are listed and selected before the run, as for sharded runs
+        if shards:
+            return self._start_sharded_test_job(code, path, test_ids, shards, timeout, trace_memory, report,
+                                                incremental, source_dir)
+        if isolated:
+            params = {"code": code, "path": path, "trace_memory": trace_memory}
+            if source_dir:
+                params["source_dir"] = source_dir
+            if test_ids is not None:
+                params["test_ids"] = test_ids
+            return self._start_worker_job("run_test", params, timeout=timeout,
+                                          on_finish=lambda job: self._on_test_job_finished(job, report))
 
         # Capture stdout/stderr
         stdout_capture = io.StringIO()
@@ -301,63 +2136,70 @@ class QgisMCPServer(QObject):
             sys.stdout = stdout_capture
             sys.stderr = stderr_capture
 
-            loader = unittest.TestLoader()
-            suite = unittest.TestSuite()
-
-            if path:
-                if not os.path.exists(path):
-                    raise Exception(f"Test file not found: {path}")
-                # Load tests from file
-                directory = os.path.dirname(path)
-                filename = os.path.basename(path)
-                sys.path.insert(0, directory) # Add directory to path to allow imports
-                try:
-                    loaded_tests = loader.discover(start_dir=directory, pattern=filename)
-                    suite.addTests(loaded_tests)
-                finally:
-                    sys.path.remove(directory)
-
-            elif code:
-                # Load tests from code string
-                # Create a temporary module
-                import types
-                module_name = "temp_test_module"
-                module = types.ModuleType(module_name)
-                # Populate module with code
-                exec(code, module.__dict__)
-                # Load tests from module
-                loaded_tests = loader.loadTestsFromModule(module)
-                suite.addTests(loaded_tests)
+            tests = list(iter_tests(self._load_tests(code, path, source_dir)))
+            if test_ids is not None:
+                # Keep the order of test_ids (e.g. failing tests first)
+                by_id = {test.id(): test for test in tests}
+                tests = [by_id[test_id] for test_id in test_ids if test_id in by_id]
+            selection = None
+            if incremental:
+                selection = self._select_tests([test.id() for test in tests],
+                                               {test.id(): test_module_file(test) for test in tests}, path,
+                                               incremental["source_dir"], incremental["changed_only"],
+                                               incremental["failed_first"])
+                by_id = {test.id(): test for test in tests}
+                tests = [by_id[test_id] for test_id in selection["tests"]]
+            suite = unittest.TestSuite(tests)
 
             # Run tests
-            runner = unittest.TextTestRunner(stream=stdout_capture, verbosity=2)
-            result = runner.run(suite)
+            result_class = type("TimedTestResult", (TimedTestResult,), {"trace_memory": trace_memory})
+            runner = unittest.TextTestRunner(stream=stdout_capture, verbosity=2, resultclass=result_class)
+            started_tracing = trace_memory and not tracemalloc.is_tracing()
+            if started_tracing:
+                tracemalloc.start()
+            try:
+                run_started = time.perf_counter()
+                result = runner.run(suite)
+                elapsed = time.perf_counter() - run_started
+            finally:
+                if started_tracing:
+                    tracemalloc.stop()
+            if record_durations:
+                self._record_test_durations(result.durations)
 
             # Construct structured result
             failures = []
             for case, msg in result.failures:
                 failures.append({
                     "test": str(case),
+                    "id": getattr(case, "test_case", case).id(),  # Subtests report their parent test
                     "message": msg,
                     "type": "failure"
                 })
             for case, msg in result.errors:
                 failures.append({
                     "test": str(case),
+                    "id": getattr(case, "test_case", case).id(),
                     "message": msg,
                     "type": "error"
                 })
 
-            return {
+            test_result = {
                 "executed": True,
                 "passed": result.testsRun - len(failures),
                 "failed": len(result.failures),
                 "errors": len(result.errors),
                 "total": result.testsRun,
                 "failures": failures,
+                "elapsed": round(elapsed, 6),
+                "durations": {test_id: round(seconds, 6) for test_id, seconds in result.durations.items()},
+                "timings": result.timings,
                 "stdout": stdout_capture.getvalue(),
                 "stderr": stderr_capture.getvalue()
             }
+            if selection:
+                self._update_test_state(selection, selection["tests"], test_result)
+            return self._finish_test_result(test_result, report)
 
         except Exception as e:
             sys.stdout = original_stdout
@@ -373,24 +2215,300 @@ class QgisMCPServer(QObject):
             sys.stdout = original_stdout
             sys.stderr = original_stderr
 
-    def reload_plugin(self, name, **kwargs):
-        """Reloads or Activates a plugin"""
+    def _finish_test_result(self, result, report):
+        """Add the slowest tests to a run_test result and write the requested reports"""
+        result["slowest"] = sorted(result["timings"], key=lambda timing: timing["wall"], reverse=True)[:report["slowest"]]
+        if report["junit_xml"]:
+            write_junit_xml(report["junit_xml"], result)
+        if report["json_report"]:
+            with open(report["json_report"], "w") as f:
+                json.dump(dict(result, created=time.time()), f, indent=2)
+        return result
+
+    def _on_test_job_finished(self, job, report):
+        if job.status == Job.SUCCEEDED and job.result.get("executed"):
+            self._record_test_durations(job.result["durations"])
+            try:
+                self._finish_test_result(job.result, report)
+            except Exception as e:
+                job.status = Job.FAILED
+                job.error = f"Could not write test reports: {e}"
+
+    def _start_sharded_test_job(self, code, path, test_ids, shards, timeout, trace_memory, report, incremental=None,
+                                source_dir=None):
+        """Discover the tests in a worker, then run balanced shards of them in parallel"""
+        job = self._add_job("test", f"run_test ({shards} shards)")
+        source = {"code": code, "path": path}
+        if source_dir:
+            source["source_dir"] = source_dir
+        listing = Job("worker", "list_tests")
+        shard_jobs = []
+        partition = []
+        selection = None
+
+        def cancel():
+            # Finish first, so the callbacks of the cancelled shards neither merge nor write reports
+            job.finish(Job.CANCELLED, error="Cancelled")
+            for subjob in [listing] + shard_jobs:
+                if subjob.status == Job.RUNNING and subjob.cancel:
+                    subjob.cancel()
+
+        def on_listed(listing):
+            if job.status != Job.RUNNING:
+                return
+            if listing.status != Job.SUCCEEDED:
+                job.finish(Job.FAILED, error=f"Test discovery failed: {listing.error}")
+                return
+            nonlocal selection
+            ids = listing.result["tests"]
+            if test_ids is not None:
+                listed = set(ids)
+                ids = [test_id for test_id in test_ids if test_id in listed]
+            if incremental:
+                selection = self._select_tests(ids, listing.result["files"], path, incremental["source_dir"],
+                                               incremental["changed_only"], incremental["failed_first"])
+                ids = selection["tests"]
+            partition.extend(balance_shards(ids, self._load_test_durations(), shards))
+            if not partition:
+                merged = self._merge_test_shards([], [])
+                if selection:
+                    self._update_test_state(selection, [], merged)
+                job.finish(Job.SUCCEEDED, result=self._finish_test_result(merged, report))
+                return
+            for index, shard_ids in enumerate(partition):
+                shard_job = Job("worker", f"run_test shard {index}")
+                shard_jobs.append(shard_job)
+                self.worker_pool.submit(shard_job, "run_test",
+                                        dict(source, test_ids=shard_ids, trace_memory=trace_memory),
+                                        timeout=timeout, on_finish=on_shard_finished)
+
+        def on_shard_finished(shard_job):
+            if job.status != Job.RUNNING:
+                return
+            done = sum(1 for shard in shard_jobs if shard.status != Job.RUNNING)
+            job.progress = 100.0 * done / len(partition)
+            if done == len(partition):
+                merged = self._merge_test_shards(shard_jobs, partition)
+                self._record_test_durations(merged["durations"])
+                if selection:
+                    self._update_test_state(selection, selection["tests"], merged)
+                try:
+                    job.finish(Job.SUCCEEDED, result=self._finish_test_result(merged, report))
+                except Exception as e:
+                    job.finish(Job.FAILED, result=merged, error=f"Could not write test reports: {e}")
+
+        job.cancel = cancel
+        self.worker_pool.submit(listing, "list_tests", source, timeout=timeout, on_finish=on_listed)
+        return job.to_dict()
+
+    def _merge_test_shards(self, shard_jobs, partition):
+        """Combine shard results into the run_test result shape"""
+        merged = {
+            "executed": True,
+            "passed": 0,
+            "failed": 0,
+            "errors": 0,
+            "total": 0,
+            "failures": [],
+            "elapsed": 0.0,
+            "durations": {},
+            "timings": [],
+            "shards": [],
+            "stdout": "",
+            "stderr": ""
+        }
+        for index, (shard_job, shard_ids) in enumerate(zip(shard_jobs, partition)):
+            result = shard_job.result or {}
+            merged["shards"].append({
+                "shard": index,
+                "tests": len(shard_ids),
+                "status": shard_job.status,
+                "elapsed": round(shard_job.finished - shard_job.started, 3)
+            })
+            if shard_job.status == Job.SUCCEEDED and result.get("executed"):
+                for key in ("passed", "failed", "errors", "total"):
+                    merged[key] += result[key]
+                merged["failures"].extend(result["failures"])
+                merged["durations"].update(result["durations"])
+                merged["timings"].extend(result["timings"])
+                merged["stdout"] += f"--- shard {index} ---\n" + result["stdout"]
+                merged["stderr"] += result["stderr"]
+            else:
+                # The whole shard counts as errored: it timed out, crashed or could not load
+                merged["errors"] += len(shard_ids)
+                merged["total"] += len(shard_ids)
+                message = shard_job.error or result.get("error") or "Shard failed"
+                merged["failures"].extend({"test": test_id, "id": test_id, "message": message, "type": "error"}
+                                          for test_id in shard_ids)
+        if shard_jobs:
+            # Shards run in parallel, so the run took as long as the slowest one
+            merged["elapsed"] = round(max(shard.finished for shard in shard_jobs) - min(shard.started for shard in shard_jobs), 6)
+        return merged
+
+    def reload_plugin(self, name, mode="full", keep_gui=False, **kwargs):
+        """
+        Reloads or Activates a plugin.
+
+        `mode="hot"` re-imports only the plugin modules whose files changed
+        since they were last loaded, plus the modules importing them, in
+        dependency order, and reports the time taken by each. The plugin
+        instance is then unloaded and a new one is created with initGui.
+        With `keep_gui=True` the running instance and its GUI are kept and
+        the instance is only switched to the reloaded class: signals
+        connected in initGui still call the old methods, and docks and
+        dialogs keep their old classes, so only code that looks methods up
+        on the instance when it runs is updated.
+        """
+        if mode not in ("full", "hot"):
+            return {"status": "error", "plugin": name, "message": f"Unknown reload mode: {mode}"}
+        if mode == "hot" and name in active_plugins:
+            return self._hot_reload_plugin(name, keep_gui)
         try:
             if name in active_plugins:
                 reloadPlugin(name)
-                return {"status": "reloaded", "plugin": name}
+                result = {"status": "reloaded", "plugin": name}
             else:
                 loadPlugin(name)
                 startPlugin(name)
-                return {"status": "activated", "plugin": name}
+                result = {"status": "activated", "plugin": name}
+            self._record_module_hashes(name)
+            return result
         except Exception as e:
             return {"status": "error", "plugin": name, "message": str(e), "traceback": traceback.format_exc()}
 
-    def install_plugin(self, path, **kwargs):
-        """Install a plugin from a directory path"""
+    def _plugin_modules(self, name):
+        """Loaded source modules of a plugin package, by module name"""
+        return {
+            module_name: module for module_name, module in list(sys.modules.items())
+            if (module_name == name or module_name.startswith(name + "."))
+            and (getattr(module, "__file__", None) or "").endswith(".py")
+        }
+
+    def _record_module_hashes(self, name):
+        """Remember the source hashes of a plugin's modules as loaded"""
+        for module_name, module in self._plugin_modules(name).items():
+            try:
+                self.module_hashes[module_name] = self._file_hash(os.path.abspath(module.__file__))
+            except OSError:
+                pass
+
+    def _module_changed(self, module_name, module):
+        """Whether a module's source file changed since it was loaded"""
+        path = os.path.abspath(module.__file__)
+        try:
+            recorded = self.module_hashes.get(module_name)
+            if recorded is not None:
+                return self._file_hash(path) != recorded
+            # Not loaded by us: compare with the source mtime and size stored in the bytecode cache
+            with open(module.__cached__, "rb") as f:
+                header = f.read(16)
+            if len(header) == 16 and int.from_bytes(header[4:8], "little") == 0:
+                mtime, size = struct.unpack("<II", header[8:16])
+                stat = os.stat(path)
+                return (mtime, size) != (int(stat.st_mtime) & 0xFFFFFFFF, stat.st_size & 0xFFFFFFFF)
+        except (OSError, TypeError, AttributeError):
+            pass
+        return True
+
+    def _hot_reload_plugin(self, name, keep_gui):
+        """Re-import the changed modules of an active plugin"""
+        started = time.perf_counter()
+        modules = self._plugin_modules(name)
+        files = {os.path.abspath(module.__file__): module_name for module_name, module in modules.items()}
+        package_root = os.path.dirname(os.path.dirname(os.path.abspath(modules[name].__file__))) if name in modules else None
+
+        # Plugin-internal import graph
+        imports = {}
+        for path, module_name in files.items():
+            roots = [os.path.dirname(path)] + ([package_root] if package_root else [])
+            imports[module_name] = {files[imported] for imported in imported_files(path, roots)
+                                    if imported in files and files[imported] != module_name}
+
+        changed = {module_name for module_name, module in modules.items() if self._module_changed(module_name, module)}
+        if not changed:
+            return {"status": "unchanged", "plugin": name, "modules": [],
+                    "seconds": round(time.perf_counter() - started, 6)}
+
+        # Modules importing a changed module hold references to its old objects
+        affected = set(changed)
+        pending = list(changed)
+        while pending:
+            module_name = pending.pop()
+            for importer, imported in imports.items():
+                if module_name in imported and importer not in affected:
+                    affected.add(importer)
+                    pending.append(importer)
+
+        # Dependencies before the modules importing them
+        order = []
+        visited = set()
+
+        def visit(module_name):
+            if module_name in visited:
+                return
+            visited.add(module_name)
+            for imported in sorted(imports[module_name] & affected):
+                visit(imported)
+            order.append(module_name)
+
+        for module_name in sorted(affected):
+            visit(module_name)
+
+        timings = []
+        for module_name in order:
+            module_started = time.perf_counter()
+            try:
+                importlib.reload(sys.modules[module_name])
+            except Exception as e:
+                return {"status": "error", "plugin": name, "module": module_name, "modules": timings,
+                        "message": str(e), "traceback": traceback.format_exc()}
+            timings.append({
+                "module": module_name,
+                "reason": "changed" if module_name in changed else "imports changed module",
+                "seconds": round(time.perf_counter() - module_started, 6)
+            })
+        self._record_module_hashes(name)
+
+        result = {"status": "hot_reloaded", "plugin": name, "modules": timings}
+        instance = plugins.get(name)
+        try:
+            if instance is not None and keep_gui:
+                # Keep the instance and its GUI; slots connected in initGui still hold the old functions
+                cls = type(instance)
+                new_cls = getattr(sys.modules.get(cls.__module__), cls.__name__, cls)
+                if new_cls is not cls:
+                    instance.__class__ = new_cls
+                    result["rebound"] = f"{cls.__module__}.{cls.__name__}"
+            elif instance is not None:
+                gui_started = time.perf_counter()
+                instance.unload()
+                new_instance = sys.modules[name].classFactory(self.iface)
+                plugins[name] = new_instance
+                new_instance.initGui()
+                result["gui_seconds"] = round(time.perf_counter() - gui_started, 6)
+        except Exception as e:
+            result.update({"status": "error", "message": str(e), "traceback": traceback.format_exc()})
+        result["seconds"] = round(time.perf_counter() - started, 6)
+        return result
+
+    def install_plugin(self, path, mode="copy", reload=None, reload_mode="full", **kwargs):
+        """
+        Install a plugin from a directory path.
+
+        `mode` is "copy" (replace the installed copy), "sync" (copy only new
+        and changed files, by size and SHA-256, and delete removed ones) or
+        "symlink" (link the installed plugin to the source directory). The
+        result lists the added, changed and removed files. With the default
+        `reload=None` the plugin is only reloaded in sync and symlink mode
+        when something other than tests or docs changed; pass True or False
+        to force it. `reload_mode` is passed to reload_plugin as `mode`.
+        """
         if not os.path.isdir(path):
             raise Exception(f"Plugin path is not a directory: {path}")
+        if mode not in ("copy", "sync", "symlink"):
+            raise Exception(f"Unknown install mode: {mode}")
 
+        path = os.path.abspath(path)
         plugin_name = os.path.basename(path)
         if not plugin_name: # Handle trailing slash
             plugin_name = os.path.basename(os.path.dirname(path))
@@ -400,21 +2518,135 @@ class QgisMCPServer(QObject):
 
         target_path = os.path.join(plugins_dir, plugin_name)
 
-        # Remove existing if present
-        if os.path.exists(target_path):
-            if os.path.islink(target_path):
-                os.unlink(target_path)
-            else:
-                shutil.rmtree(target_path)
+        started = time.perf_counter()
+        if mode == "copy":
+            # Remove existing if present
+            if os.path.exists(target_path):
+                if os.path.islink(target_path):
+                    os.unlink(target_path)
+                else:
+                    shutil.rmtree(target_path)
 
-        # Copy new plugin
-        try:
-            shutil.copytree(path, target_path)
-        except Exception as e:
-            raise Exception(f"Failed to copy plugin: {e}")
+            # Copy new plugin
+            try:
+                shutil.copytree(path, target_path)
+            except Exception as e:
+                raise Exception(f"Failed to copy plugin: {e}")
+            changes = None
+        elif mode == "sync":
+            changes = self._sync_plugin(path, target_path)
+        else:
+            changes = self._link_plugin(path, target_path, plugin_name)
+
+        result = {}
+        if changes is not None:
+            changes["elapsed"] = round(time.perf_counter() - started, 6)
+            result["sync"] = changes
+            changed_files = changes["added"] + changes["changed"] + changes["removed"]
+            if reload is None:
+                reload = any(self._requires_reload(rel_path) for rel_path in changed_files)
+        if reload is False:
+            result.update({"status": "unchanged" if changes is not None else "installed", "plugin": plugin_name})
+            return result
 
         # Try to reload/activate
-        return self.reload_plugin(plugin_name)
+        result.update(self.reload_plugin(plugin_name, mode=reload_mode))
+        return result
+
+    def _requires_reload(self, rel_path):
+        """Whether a changed file of an installed plugin affects the running plugin"""
+        parts = rel_path.replace("\\", "/").split("/")
+        if any(part in RELOAD_IGNORED_DIRS for part in parts[:-1]):
+            return False
+        return not (parts[-1].startswith("test_") or parts[-1].endswith(RELOAD_IGNORED_EXTENSIONS))
+
+    def _plugin_files(self, root):
+        """Relative paths of the files of a plugin directory, without caches and VCS folders"""
+        files = set()
+        for directory, dirnames, filenames in os.walk(root):
+            dirnames[:] = [name for name in dirnames if name not in SYNC_IGNORED]
+            for name in filenames:
+                if not name.endswith((".pyc", ".pyo")):
+                    files.add(os.path.relpath(os.path.join(directory, name), root))
+        return files
+
+    def _file_hash(self, path):
+        """SHA-256 of a file, cached by mtime and size"""
+        stat = os.stat(path)
+        signature = (stat.st_mtime_ns, stat.st_size)
+        cached = self.file_hashes.get(path)
+        if cached is None or cached[0] != signature:
+            digest = hashlib.sha256()
+            with open(path, "rb") as f:
+                for block in iter(lambda: f.read(1024 * 1024), b""):
+                    digest.update(block)
+            cached = self.file_hashes[path] = (signature, digest.hexdigest())
+        return cached[1]
+
+    def _sync_plugin(self, source, target):
+        """Make target a copy of source, touching only files that differ"""
+        if os.path.islink(target):
+            os.unlink(target)  # Previously installed as a symlink
+        os.makedirs(target, exist_ok=True)
+        source_files = self._plugin_files(source)
+        target_files = self._plugin_files(target)
+        changes = {"mode": "sync", "added": [], "changed": [], "removed": [], "unchanged": 0}
+
+        for rel_path in sorted(source_files):
+            source_file = os.path.join(source, rel_path)
+            target_file = os.path.join(target, rel_path)
+            if rel_path in target_files:
+                source_stat = os.stat(source_file)
+                target_stat = os.stat(target_file)
+                if source_stat.st_size == target_stat.st_size and (
+                        source_stat.st_mtime_ns == target_stat.st_mtime_ns
+                        or self._file_hash(source_file) == self._file_hash(target_file)):
+                    changes["unchanged"] += 1
+                    continue
+                changes["changed"].append(rel_path)
+            else:
+                changes["added"].append(rel_path)
+                os.makedirs(os.path.dirname(target_file), exist_ok=True)
+            # copy2 keeps the mtime, so the next sync can skip hashing unchanged files
+            shutil.copy2(source_file, target_file)
+
+        for rel_path in sorted(target_files - source_files):
+            os.remove(os.path.join(target, rel_path))
+            changes["removed"].append(rel_path)
+        # Drop folders left empty by removed files
+        for directory, dirnames, filenames in os.walk(target, topdown=False):
+            if directory != target and not os.listdir(directory):
+                os.rmdir(directory)
+        return changes
+
+    def _link_plugin(self, source, target, plugin_name):
+        """Install a plugin as a symlink to its source directory"""
+        if os.path.islink(target) and os.path.realpath(target) == os.path.realpath(source):
+            pass
+        elif os.path.exists(target) or os.path.islink(target):
+            if os.path.islink(target):
+                os.unlink(target)
+            else:
+                shutil.rmtree(target)
+        if not os.path.islink(target):
+            try:
+                os.symlink(source, target, target_is_directory=True)
+            except OSError as e:
+                raise Exception(f"Failed to link plugin (on Windows this needs developer mode or admin rights): {e}")
+
+        # Files are not copied, so compare with the state at the previous install
+        snapshot = {rel_path: self._file_hash(os.path.join(source, rel_path)) for rel_path in self._plugin_files(source)}
+        previous = self.plugin_snapshots.get(plugin_name)
+        self.plugin_snapshots[plugin_name] = snapshot
+        if previous is None:
+            return {"mode": "symlink", "added": sorted(snapshot), "changed": [], "removed": [], "unchanged": 0}
+        return {
+            "mode": "symlink",
+            "added": sorted(set(snapshot) - set(previous)),
+            "changed": sorted(rel_path for rel_path in snapshot if rel_path in previous and snapshot[rel_path] != previous[rel_path]),
+            "removed": sorted(set(previous) - set(snapshot)),
+            "unchanged": sum(1 for rel_path in snapshot if previous.get(rel_path) == snapshot[rel_path])
+        }
 
     def install_processing_script(self, path, **kwargs):
         """Install a processing script from a file path"""
@@ -442,6 +2674,7 @@ class QgisMCPServer(QObject):
             provider = registry.providerById("script")
             if provider:
                 provider.refreshAlgorithms()
+                self.algorithm_index.invalidate("script")
                 return {"status": "installed", "script": script_name, "message": "Script installed and provider refreshed"}
             else:
                  return {"status": "installed_no_provider", "script": script_name, "message": "Script copied but 'script' provider not found to refresh"}
@@ -502,29 +2735,124 @@ class QgisMCPServer(QObject):
             "height": layer.height()
         }
     
-    def get_layers(self, **kwargs):
-        """Get all layers in the project"""
-        project = QgsProject.instance()
+    def add_layers(self, layers, workers=None, **kwargs):
+        """
+        Add many vector and raster layers to the project at once.
+
+        Each entry of `layers` is a path or a dict with `path` and optional
+        `name`, `type` ("vector" or "raster", guessed from the extension by
+        default) and `provider`. Data sources of thread-safe providers are
+        opened and validated in worker threads; all valid layers are then
+        registered with one addMapLayers call. Malformed entries, invalid
+        sources and errors while opening them are reported per entry instead
+        of failing the whole command.
+        """
+        specs = []
+        for entry in layers:
+            if isinstance(entry, str):
+                entry = {"path": entry}
+            path = entry.get("path") if isinstance(entry, dict) else None
+            if not isinstance(path, str) or not path:
+                specs.append({"path": path, "error": f"Layer entry without a path: {entry!r}"})
+                continue
+            layer_type = entry.get("type")
+            if layer_type is None:
+                layer_type = "raster" if os.path.splitext(path)[1].lower() in RASTER_EXTENSIONS else "vector"
+            if layer_type not in ("vector", "raster"):
+                specs.append({"path": path, "error": f"Unknown layer type for {path}: {layer_type}"})
+                continue
+            specs.append({
+                "path": path,
+                "name": entry.get("name") or os.path.basename(path),
+                "type": layer_type,
+                "provider": entry.get("provider") or ("gdal" if layer_type == "raster" else "ogr")
+            })
+
+        main_thread = QCoreApplication.instance().thread()
+
+        def open_layer(spec):
+            try:
+                if spec["type"] == "raster":
+                    layer = QgsRasterLayer(spec["path"], spec["name"], spec["provider"])
+                else:
+                    layer = QgsVectorLayer(spec["path"], spec["name"], spec["provider"])
+                    if layer.isValid():
+                        # Counting may scan the source, so do it while still on the worker
+                        spec["feature_count"] = layer.featureCount()
+                # Layers are QObjects; hand them over to the main thread before the project owns them
+                layer.moveToThread(main_thread)
+                spec["layer"] = layer
+            except Exception as e:
+                spec["error"] = f"Failed to open {spec['path']}: {str(e)}"
+
+        to_open = [spec for spec in specs if "error" not in spec]
+        threaded = [spec for spec in to_open if spec["provider"] in THREADED_PROVIDERS]
+        if threaded:
+            workers = max(1, min(workers or MAX_LOAD_WORKERS, len(threaded)))
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                list(pool.map(open_layer, threaded))
+        for spec in to_open:
+            if "layer" not in spec and "error" not in spec:
+                open_layer(spec)
+
+        valid = [spec["layer"] for spec in specs if "layer" in spec and spec["layer"].isValid()]
+        if valid:
+            QgsProject.instance().addMapLayers(valid)
+
+        results = []
+        for spec in specs:
+            if "error" in spec:
+                results.append({"path": spec["path"], "status": "error", "message": spec["error"]})
+                continue
+            layer = spec["layer"]
+            if not layer.isValid():
+                results.append({"path": spec["path"], "status": "error", "message": f"Layer is not valid: {spec['path']}"})
+                continue
+            result = {
+                "path": spec["path"],
+                "status": "success",
+                "id": layer.id(),
+                "name": layer.name(),
+                "type": self._get_layer_type(layer)
+            }
+            if spec["type"] == "vector":
+                result["feature_count"] = spec["feature_count"]
+            else:
+                result.update({"width": layer.width(), "height": layer.height()})
+            results.append(result)
+
+        return {
+            "added": len(valid),
+            "failed": len(results) - len(valid),
+            "results": results
+        }
+    
+    def get_layers(self, feature_counts=True, **kwargs):
+        """
+        Get all layers in the project.
+
+        Feature counts are cached per layer until its data changes; pass
+        `feature_counts=False` to skip them entirely.
+        """
         layers = []
         
-        for layer_id, layer in project.mapLayers().items():
+        for layer_id, (layer, metadata) in self.layer_index:
             layer_info = {
                 "id": layer_id,
-                "name": layer.name(),
-                "type": self._get_layer_type(layer),
-                "visible": project.layerTreeRoot().findLayer(layer_id).isVisible()
+                "name": metadata["name"],
+                "type": metadata["type"],
+                "visible": self.layer_index.is_visible(layer_id)
             }
             
             # Add type-specific information
-            if layer.type() == QgsMapLayer.VectorLayer:
+            if "geometry_type" in metadata:
+                if feature_counts:
+                    layer_info["feature_count"] = self.layer_index.feature_count(layer_id)
+                layer_info["geometry_type"] = metadata["geometry_type"]
+            elif "width" in metadata:
                 layer_info.update({
-                    "feature_count": layer.featureCount(),
-                    "geometry_type": layer.geometryType()
-                })
-            elif layer.type() == QgsMapLayer.RasterLayer:
-                layer_info.update({
-                    "width": layer.width(),
-                    "height": layer.height()
+                    "width": metadata["width"],
+                    "height": metadata["height"]
                 })
                 
             layers.append(layer_info)
@@ -556,51 +2884,225 @@ class QgisMCPServer(QObject):
         else:
             raise Exception(f"Layer not found: {layer_id}")
     
-    def get_layer_features(self, layer_id, limit=10, **kwargs):
-        """Get features from a vector layer"""
-        project = QgsProject.instance()
+    def get_layer_features(self, layer_id, limit=10, offset=0, cursor=None, fields=None, with_geometry=True,
+                           expression=None, stream=False, chunk_size=1000, format="rows", **kwargs):
+        """
+        Get features from a vector layer.
+
+        Pages are requested with `limit` and either `offset` or the `cursor`
+        returned as `next_cursor` by the previous page. `fields` restricts the
+        attributes, `with_geometry=False` skips geometry and `expression` is a
+        QGIS filter expression evaluated by the provider where possible.
+        With `stream=True` the page is sent in chunks of `chunk_size` features
+        and a negative or null `limit` streams every matching feature.
+
+        `format="columnar"` returns the field list once with one array per
+        column and geometries as base64 WKB instead of one object per feature.
+        """
+        if format not in ("rows", "columnar"):
+            raise Exception(f"Unknown format: {format}. Use 'rows' or 'columnar'")
+        layer = self._get_vector_layer(layer_id)
+        layer_fields = layer.fields()
         
-        if layer_id in project.mapLayers():
-            layer = project.mapLayer(layer_id)
-            
-            if layer.type() != QgsMapLayer.VectorLayer:
-                raise Exception(f"Layer is not a vector layer: {layer_id}")
-            
-            features = []
-            for i, feature in enumerate(layer.getFeatures()):
-                if i >= limit:
-                    break
-                    
-                # Extract attributes
-                attrs = {}
-                for field in layer.fields():
-                    attrs[field.name()] = feature.attribute(field.name())
-                
-                # Extract geometry if available
-                geom = None
-                if feature.hasGeometry():
-                    geom = {
-                        "type": feature.geometry().type(),
-                        "wkt": feature.geometry().asWkt(precision=4)
-                    }
-                
-                features.append({
-                    "id": feature.id(),
-                    "attributes": attrs,
-                    "geometry": geom
-                })
-            
-            return {
-                "layer_id": layer_id,
-                "feature_count": layer.featureCount(),
-                "features": features,
-                "fields": [field.name() for field in layer.fields()]
-            }
+        if fields is None:
+            field_names = [field.name() for field in layer_fields]
+        else:
+            missing = [name for name in fields if layer_fields.indexOf(name) < 0]
+            if missing:
+                raise Exception(f"Unknown fields: {', '.join(missing)}")
+            field_names = list(fields)
+        field_indices = [layer_fields.indexOf(name) for name in field_names]
+        
+        if limit is not None and limit < 0:
+            limit = None
+        
+        request = QgsFeatureRequest()
+        filters = []
+        if expression:
+            filters.append(f"({expression})")
+        if cursor:
+            # Keyset pagination: resume after the last feature id of the previous page
+            after = self._decode_cursor(cursor)
+            filters.append(f"$id > {int(after)}")
+            offset = 0
+        if filters:
+            request.setFilterExpression(" AND ".join(filters))
+            if request.filterExpression().hasParserError():
+                raise Exception(f"Invalid expression: {request.filterExpression().parserErrorString()}")
+        if limit is not None and layer.providerType() not in FID_ORDERED_PROVIDERS:
+            # The next page's cursor resumes after the last id of this one, so pages must be in id order
+            request.addOrderBy("$id")
+        request.setSubsetOfAttributes(field_indices)
+        if not with_geometry:
+            request.setFlags(QgsFeatureRequest.NoGeometry)
+        if limit is not None:
+            # Fetch one extra feature to know whether another page exists
+            request.setLimit(offset + limit + 1)
+        
+        summary = {
+            "layer_id": layer_id,
+            "feature_count": layer.featureCount(),
+            "fields": field_names,
+            "format": format
+        }
+        records = self._iter_features(layer, request, field_indices, with_geometry, offset, limit, summary)
+        if format == "columnar":
+            encode = lambda page: self._encode_columns(page, field_names, with_geometry)
         else:
+            encode = lambda page: self._encode_rows(page, field_names)
+        
+        if stream:
+            return StreamingResult(self._chunk_features(records, chunk_size, encode, summary))
+        
+        summary.update(encode(list(records)))
+        return summary
+    
+    def _get_vector_layer(self, layer_id):
+        """Return a vector layer of the current project by id"""
+        layer = QgsProject.instance().mapLayer(layer_id)
+        if layer is None:
             raise Exception(f"Layer not found: {layer_id}")
+        if layer.type() != QgsMapLayer.VectorLayer:
+            raise Exception(f"Layer is not a vector layer: {layer_id}")
+        return layer
+    
+    def _iter_features(self, layer, request, field_indices, with_geometry, offset, limit, summary):
+        """Yield (id, attribute values, geometry) per feature; sets summary["next_cursor"]"""
+        summary["next_cursor"] = None
+        if limit == 0:
+            return
+        returned = 0
+        for position, feature in enumerate(layer.getFeatures(request)):
+            if position < offset:
+                continue
+            if limit is not None and returned >= limit:
+                # There is at least one more feature after this page
+                summary["next_cursor"] = self._encode_cursor(last_id)
+                break
+            
+            values = feature.attributes()
+            geometry = feature.geometry() if with_geometry and feature.hasGeometry() else None
+            last_id = feature.id()
+            returned += 1
+            yield last_id, [self._json_value(values[index]) for index in field_indices], geometry
+    
+    def _encode_rows(self, records, field_names):
+        """Encode feature records as one object per feature with WKT geometry"""
+        features = []
+        for feature_id, values, geometry in records:
+            geom = None
+            if geometry is not None:
+                geom = {
+                    "type": geometry.type(),
+                    "wkt": geometry.asWkt(precision=4)
+                }
+            features.append({
+                "id": feature_id,
+                "attributes": dict(zip(field_names, values)),
+                "geometry": geom
+            })
+        return {"features": features}
+    
+    def _encode_columns(self, records, field_names, with_geometry):
+        """Encode feature records as per-column arrays with base64 WKB geometry"""
+        ids = []
+        columns = [[] for _ in field_names]
+        geometries = []
+        for feature_id, values, geometry in records:
+            ids.append(feature_id)
+            for column, value in zip(columns, values):
+                column.append(value)
+            if with_geometry:
+                wkb = None if geometry is None else base64.b64encode(bytes(geometry.asWkb())).decode('ascii')
+                geometries.append(wkb)
+        
+        page = {"ids": ids, "columns": dict(zip(field_names, columns))}
+        if with_geometry:
+            page["geometry"] = {"encoding": "wkb_base64", "values": geometries}
+        return page
+    
+    def _chunk_features(self, records, chunk_size, encode, summary):
+        """Group feature records into encoded chunks for a streamed response"""
+        chunk = []
+        returned = 0
+        for record in records:
+            chunk.append(record)
+            if len(chunk) >= chunk_size:
+                returned += len(chunk)
+                yield encode(chunk)
+                chunk = []
+        if chunk:
+            returned += len(chunk)
+            yield encode(chunk)
+        summary["returned"] = returned
+        return summary
+    
+    def _encode_cursor(self, feature_id):
+        """Encode a continuation token pointing after the given feature id"""
+        token = json.dumps({"after": feature_id}).encode('utf-8')
+        return base64.urlsafe_b64encode(token).decode('ascii')
     
-    def execute_processing(self, algorithm, parameters, **kwargs):
-        """Execute a processing algorithm"""
+    def _decode_cursor(self, cursor):
+        """Decode a continuation token produced by _encode_cursor"""
+        try:
+            return json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))["after"]
+        except Exception:
+            raise Exception(f"Invalid cursor: {cursor}")
+    
+    def _json_value(self, value):
+        """Convert an attribute value to something json.dumps accepts"""
+        if value is None or isinstance(value, (bool, int, float, str)):
+            return value
+        if hasattr(value, "isNull") and value.isNull():
+            return None  # NULL QVariant and null date/time values
+        if isinstance(value, (QDate, QDateTime, QTime)):
+            return value.toString(Qt.ISODate)
+        if isinstance(value, (bytes, bytearray, QByteArray)):
+            return base64.b64encode(bytes(value)).decode('ascii')
+        if isinstance(value, (list, tuple)):
+            return [self._json_value(item) for item in value]
+        if isinstance(value, dict):
+            return {str(key): self._json_value(item) for key, item in value.items()}
+        return str(value)
+    
+    def list_algorithms(self, query=None, provider=None, limit=50, offset=0, **kwargs):
+        """
+        Search the Processing algorithms.
+
+        Every word of `query` must appear in the algorithm's id, name, group
+        or tags; `provider` restricts the search to one provider id.
+        """
+        matches = list(self.algorithm_index.search(query, provider))
+        page = matches[offset:offset + limit]
+        return {
+            "total": len(matches),
+            "algorithms": page,
+            "next_offset": offset + limit if offset + limit < len(matches) else None
+        }
+
+    def describe_algorithm(self, algorithm, **kwargs):
+        """Describe an algorithm's parameters and outputs"""
+        return self.algorithm_index.describe(algorithm)
+
+    def _validate_processing(self, algorithm, parameters):
+        """Reject unknown algorithms and parameter names and missing required parameters"""
+        problems = self.algorithm_index.validate(algorithm, parameters)
+        if problems:
+            raise Exception(f"Processing error: Invalid parameters for {algorithm}: " + "; ".join(problems))
+
+    def execute_processing(self, algorithm, parameters, background=False, validate=True, **kwargs):
+        """
+        Execute a processing algorithm.
+
+        With `background=True` the algorithm runs as a QgsTask on the QGIS task
+        manager and a job id is returned immediately; poll it with job_status
+        and fetch the outcome with job_result. Parameters are checked against
+        the algorithm's definitions first unless `validate=False`.
+        """
+        if validate:
+            self._validate_processing(algorithm, parameters)
+        if background:
+            return self._start_processing_job(algorithm, parameters)
         try:
             import processing
             result = processing.run(algorithm, parameters)
@@ -611,6 +3113,99 @@ class QgisMCPServer(QObject):
         except Exception as e:
             raise Exception(f"Processing error: {str(e)}")
     
+    def _start_processing_job(self, algorithm, parameters):
+        """Submit a processing algorithm to the task manager as a background job"""
+        alg = QgsApplication.processingRegistry().createAlgorithmById(algorithm)
+        if alg is None:
+            raise Exception(f"Processing error: Algorithm not found: {algorithm}")
+        if alg.flags() & QgsProcessingAlgorithm.FlagNoThreading:
+            raise Exception(f"Processing error: {algorithm} cannot run in a background thread; run it without 'background'")
+        
+        context = QgsProcessingContext()
+        context.setProject(QgsProject.instance())
+        feedback = QgsProcessingFeedback()
+        task = QgsProcessingAlgRunnerTask(alg, parameters, context, feedback)
+        
+        job = self._add_job("processing", algorithm)
+        job.handles = {"algorithm": alg, "context": context, "feedback": feedback, "task": task}
+        job.cancel = task.cancel
+        
+        def on_progress(progress, job=job):
+            job.progress = progress
+        
+        def on_executed(successful, results, job=job):
+            if feedback.isCanceled():
+                job.finish(Job.CANCELLED, error="Cancelled")
+            elif successful:
+                job.finish(Job.SUCCEEDED, result={
+                    "algorithm": algorithm,
+                    "result": {k: str(v) for k, v in results.items()}
+                })
+            else:
+                job.finish(Job.FAILED, error=f"Processing error: {algorithm} failed")
+        
+        feedback.progressChanged.connect(on_progress)
+        task.executed.connect(on_executed)
+        QgsApplication.taskManager().addTask(task)
+        return job.to_dict()
+    
+    def _start_worker_job(self, command, params, session=None, timeout=None, on_finish=None):
+        """Run a command in the worker pool as a background job"""
+        job = self._add_job("worker", command if session is None else f"{command} ({session})")
+        self.worker_pool.submit(job, command, params, session=session, timeout=timeout, on_finish=on_finish)
+        return job.to_dict()
+    
+    def start_workers(self, **kwargs):
+        """Start the worker processes ahead of the first isolated request"""
+        self.worker_pool.start()
+        return self.worker_pool.stats()
+    
+    def worker_status(self, **kwargs):
+        """Describe the worker pool"""
+        return self.worker_pool.stats()
+    
+    def _add_job(self, kind, description):
+        """Register a new running job, dropping the oldest finished ones beyond the limit"""
+        finished = [job for job in self.jobs.values() if job.status != Job.RUNNING]
+        for job in sorted(finished, key=lambda job: job.finished)[:max(0, len(finished) - MAX_FINISHED_JOBS + 1)]:
+            del self.jobs[job.id]
+        
+        job = Job(kind, description)
+        self.jobs[job.id] = job
+        return job
+    
+    def _get_job(self, job_id):
+        """Return a job by id"""
+        job = self.jobs.get(job_id)
+        if job is None:
+            raise Exception(f"Job not found: {job_id}")
+        return job
+    
+    def job_status(self, job_id, **kwargs):
+        """Get the status and progress of a background job"""
+        return self._get_job(job_id).to_dict()
+    
+    def job_result(self, job_id, **kwargs):
+        """Get the outcome of a finished background job"""
+        job = self._get_job(job_id)
+        if job.status == Job.RUNNING:
+            raise Exception(f"Job is still running: {job_id}")
+        info = job.to_dict()
+        info["result"] = job.result
+        info["error"] = job.error
+        return info
+    
+    def cancel_job(self, job_id, **kwargs):
+        """Request cancellation of a running background job"""
+        job = self._get_job(job_id)
+        if job.status == Job.RUNNING and job.cancel:
+            job.cancel()
+        return job.to_dict()
+    
+    def list_jobs(self, **kwargs):
+        """List all known background jobs"""
+        return {"jobs": [job.to_dict() for job in self.jobs.values()]}
+    
     def save_project(self, path=None, **kwargs):
         """Save the current project"""
         project = QgsProject.instance()
@@ -664,62 +3259,346 @@ class QgisMCPServer(QObject):
         else:
             raise Exception(f"Failed to save project to {path}")
     
-    def render_map(self, path, width=800, height=600, **kwargs):
-        """Render the current map view to an image"""
+    def render_map(self, path=None, width=800, height=600, background=False, dpi=96, use_cache=True, format=None,
+                   quality=-1, **kwargs):
+        """
+        Render the current map view to an image.
+
+        The image is written to `path`, or returned base64-encoded in the
+        result's "data" if no path is given, without touching the disk.
+        `format` (PNG, JPEG, WEBP, ...) defaults to the path's extension, or
+        PNG; `quality` (0-100, -1 for the format default) applies to lossy
+        formats. With `background=True` the render runs without blocking the
+        event loop and a job id is returned immediately (see job_status /
+        job_result). Renders of an unchanged view are served from the render
+        cache unless `use_cache=False`.
+        """
         try:
-            # Create map settings
-            ms = QgsMapSettings()
+            ms = self._build_map_settings(width, height, dpi)
+            image_format = format.upper() if format else self._image_format(path or "")
+            cache_key = self._render_cache_key(ms, image_format, quality)
             
-            # Set layers to render
-            layers = list(QgsProject.instance().mapLayers().values())
-            ms.setLayers(layers)
-            
-            # Set map canvas properties or fallback to project extent
-            rect = None
-            if self.iface:
-                rect = self.iface.mapCanvas().extent()
-            else:
-                # Calculate combined extent of all layers
-                rect = QgsRectangle()
-                rect.setMinimal()
-                first = True
-                for layer in layers:
-                    if first:
-                        rect = layer.extent()
-                        first = False
-                    else:
-                        rect.combineExtentWith(layer.extent())
-
-                # If still empty (no layers), set a default
-                if rect.isEmpty():
-                     rect = QgsRectangle(-180, -90, 180, 90)
-
-            ms.setExtent(rect)
-            ms.setOutputSize(QSize(width, height))
-            ms.setBackgroundColor(QColor(255, 255, 255))
-            ms.setOutputDpi(96)
+            if use_cache:
+                data = self.render_cache.get(cache_key)
+                if data is not None:
+                    result = self._image_result(data, path, width, height, image_format)
+                    result["cached"] = True
+                    if background:
+                        job = self._add_job("render", path or "in memory")
+                        job.finish(Job.SUCCEEDED, result=result)
+                        return job.to_dict()
+                    return result
             
             # Create the render
             render = QgsMapRendererParallelJob(ms)
+            if background:
+                return self._start_render_job(render, path, width, height, image_format, quality, cache_key)
             
             # Start rendering
             render.start()
             render.waitForFinished()
-            
-            # Get the image and save
-            img = render.renderedImage()
-            if img.save(path):
-                return {
-                    "rendered": True,
-                    "path": path,
-                    "width": width,
-                    "height": height
-                }
-            else:
-                raise Exception(f"Failed to save rendered image to {path}")
+            return self._save_render(render, path, width, height, image_format, quality, cache_key)
                 
         except Exception as e:
             raise Exception(f"Render error: {str(e)}")
+    
+    def clear_render_cache(self, **kwargs):
+        """Drop all cached renders and return the cache statistics"""
+        stats = self.render_cache.stats()
+        self.render_cache.clear()
+        return stats
+    
+    def _build_map_settings(self, width, height, dpi=96):
+        """Map settings for rendering all project layers at the current view"""
+        # Create map settings
+        ms = QgsMapSettings()
+        
+        # Set layers to render
+        layers = list(QgsProject.instance().mapLayers().values())
+        ms.setLayers(layers)
+        
+        # Set map canvas properties or fallback to project extent
+        rect = None
+        if self.iface:
+            rect = self.iface.mapCanvas().extent()
+        else:
+            # Calculate combined extent of all layers
+            rect = QgsRectangle()
+            rect.setMinimal()
+            first = True
+            for layer in layers:
+                if first:
+                    rect = layer.extent()
+                    first = False
+                else:
+                    rect.combineExtentWith(layer.extent())
+
+            # If still empty (no layers), set a default
+            if rect.isEmpty():
+                 rect = QgsRectangle(-180, -90, 180, 90)
+
+        ms.setExtent(rect)
+        ms.setOutputSize(QSize(width, height))
+        ms.setBackgroundColor(QColor(255, 255, 255))
+        ms.setOutputDpi(dpi)
+        return ms
+    
+    def _render_cache_key(self, ms, image_format, quality=-1):
+        """Cache key covering everything that affects the rendered image"""
+        extent = ms.extent()
+        size = ms.outputSize()
+        return (
+            round(extent.xMinimum(), 9), round(extent.yMinimum(), 9),
+            round(extent.xMaximum(), 9), round(extent.yMaximum(), 9),
+            size.width(), size.height(), ms.outputDpi(),
+            ms.destinationCrs().authid(),
+            tuple((layer.id(), self.layer_revisions.get(layer.id(), 0)) for layer in ms.layers()),
+            image_format, quality
+        )
+    
+    def _image_format(self, path):
+        """Image format implied by a file extension"""
+        extension = os.path.splitext(path)[1].lstrip('.').upper()
+        return extension or "PNG"
+    
+    def _encode_image(self, img, image_format, quality=-1):
+        """Encode a QImage in memory"""
+        data = QByteArray()
+        buffer = QBuffer(data)
+        buffer.open(QIODevice.WriteOnly)
+        saved = img.save(buffer, image_format, quality)
+        buffer.close()
+        if not saved:
+            raise Exception(f"Failed to encode image as {image_format}")
+        return bytes(data)
+    
+    def _write_image(self, data, path, width, height):
+        """Write encoded image bytes to disk"""
+        with open(path, 'wb') as f:
+            f.write(data)
+        return {
+            "rendered": True,
+            "path": path,
+            "width": width,
+            "height": height
+        }
+    
+    def _image_result(self, data, path, width, height, image_format):
+        """Write encoded image bytes to `path`, or return them base64-encoded if there is none"""
+        if path:
+            return self._write_image(data, path, width, height)
+        return {
+            "rendered": True,
+            "format": image_format,
+            "width": width,
+            "height": height,
+            "size": len(data),
+            "data": base64.b64encode(data).decode('ascii')
+        }
+    
+    def _save_render(self, render, path, width, height, image_format, quality, cache_key):
+        """Save (or return) the image of a finished render job and cache it"""
+        settings = render.mapSettings()
+        data = self._encode_image(render.renderedImage(), image_format, quality)
+        try:
+            result = self._image_result(data, path, width, height, image_format)
+        except OSError as e:
+            raise Exception(f"Failed to save rendered image to {path}: {e}")
+        self.render_cache.put(cache_key, data, [layer.id() for layer in settings.layers()])
+        result["cached"] = False
+        return result
+    
+    def _start_render_job(self, render, path, width, height, image_format, quality, cache_key):
+        """Start a render without waiting for it; completion arrives through the finished signal"""
+        job = self._add_job("render", path or "in memory")
+        job.handles = {"render": render}
+        cancelled = []
+        
+        def cancel():
+            cancelled.append(True)
+            render.cancelWithoutBlocking()
+        
+        def on_layers_finished(job=job):
+            job.progress = 90.0  # Only labeling is left
+        
+        def on_finished(job=job):
+            # The connections hold these closures, which hold render and its image, until render is deleted
+            render.deleteLater()
+            if cancelled:
+                job.finish(Job.CANCELLED, error="Cancelled")
+                return
+            try:
+                job.finish(Job.SUCCEEDED, result=self._save_render(render, path, width, height, image_format, quality,
+                                                                   cache_key))
+            except Exception as e:
+                job.finish(Job.FAILED, error=f"Render error: {str(e)}")
+        
+        job.cancel = cancel
+        render.renderingLayersFinished.connect(on_layers_finished)
+        render.finished.connect(on_finished)
+        render.start()
+        return job.to_dict()
+    
+    def render_tiles(self, zoom, x_min, x_max, y_min, y_max, output_dir=None, metatile=4, tile_size=256,
+                     buffer=64, format="PNG", transparent=True, dpi=96, background=False, **kwargs):
+        """
+        Render XYZ (Web Mercator) map tiles for a range of columns and rows at one zoom level.
+
+        Tiles are rendered in blocks of `metatile` x `metatile` tiles with one
+        map render per block, which shares render setup and label placement
+        between neighbouring tiles. `buffer` extra pixels are rendered around
+        each block so labels and symbols crossing its edge are not clipped.
+        Tiles are written to `output_dir/z/x/y.ext`, or returned as base64 if
+        no directory is given. `transparent` is ignored for formats without
+        alpha (JPEG, ...), where transparent pixels would turn black.
+        """
+        if not 0 <= zoom <= 30:
+            raise Exception(f"Zoom level out of range: {zoom}")
+        last = 2 ** zoom - 1
+        x_min, x_max = max(0, min(x_min, x_max)), min(last, max(x_min, x_max))
+        y_min, y_max = max(0, min(y_min, y_max)), min(last, max(y_min, y_max))
+        if x_min > x_max or y_min > y_max:
+            raise Exception("Tile range is outside the tile matrix")
+        
+        tile_count = (x_max - x_min + 1) * (y_max - y_min + 1)
+        if output_dir is None and tile_count > MAX_INLINE_TILES:
+            raise Exception(f"{tile_count} tiles requested; pass output_dir to render more than {MAX_INLINE_TILES}")
+        
+        image_format = format.upper()
+        if image_format in OPAQUE_IMAGE_FORMATS:
+            transparent = False
+        blocks = list(self._metatile_blocks(zoom, x_min, x_max, y_min, y_max, metatile))
+        tiles = {
+            "zoom": zoom,
+            "tile_count": tile_count,
+            "metatiles": len(blocks),
+            "output_dir": output_dir,
+            "tiles": []
+        }
+        
+        # Layers, CRS and styling are the same for every block; only extent and size change
+        base_settings = self._tile_map_settings(dpi, transparent)
+        
+        def render_block(block):
+            ms = self._metatile_settings(base_settings, zoom, block, tile_size, buffer)
+            return QgsMapRendererParallelJob(ms)
+        
+        def store_block(block, render):
+            self._slice_metatile(render.renderedImage(), zoom, block, tile_size, buffer,
+                                 image_format, output_dir, tiles["tiles"])
+        
+        if background:
+            return self._start_tile_job(blocks, render_block, store_block, tiles)
+        
+        for block in blocks:
+            render = render_block(block)
+            render.start()
+            render.waitForFinished()
+            store_block(block, render)
+        return tiles
+    
+    def _metatile_blocks(self, zoom, x_min, x_max, y_min, y_max, metatile):
+        """Yield (first x, first y, columns, rows, wanted tiles) for every metatile touching the range"""
+        last = 2 ** zoom - 1
+        for block_y in range(y_min // metatile, y_max // metatile + 1):
+            for block_x in range(x_min // metatile, x_max // metatile + 1):
+                first_x = block_x * metatile
+                first_y = block_y * metatile
+                columns = min(metatile, last - first_x + 1)
+                rows = min(metatile, last - first_y + 1)
+                wanted = [
+                    (x, y)
+                    for y in range(max(first_y, y_min), min(first_y + rows - 1, y_max) + 1)
+                    for x in range(max(first_x, x_min), min(first_x + columns - 1, x_max) + 1)
+                ]
+                yield first_x, first_y, columns, rows, wanted
+    
+    def _tile_map_settings(self, dpi, transparent):
+        """Map settings shared by all metatiles of a render_tiles request, without extent and size"""
+        ms = QgsMapSettings()
+        ms.setLayers(list(QgsProject.instance().mapLayers().values()))
+        ms.setDestinationCrs(QgsCoordinateReferenceSystem("EPSG:3857"))
+        ms.setBackgroundColor(QColor(255, 255, 255, 0) if transparent else QColor(255, 255, 255))
+        ms.setOutputDpi(dpi)
+        return ms
+    
+    def _metatile_settings(self, base_settings, zoom, block, tile_size, buffer):
+        """Copy of the request's map settings rendering one metatile plus its buffer in Web Mercator"""
+        first_x, first_y, columns, rows, _ = block
+        span = 2 * WEB_MERCATOR_HALF_WORLD / 2 ** zoom
+        margin = buffer * span / tile_size
+        extent = QgsRectangle(
+            -WEB_MERCATOR_HALF_WORLD + first_x * span - margin,
+            WEB_MERCATOR_HALF_WORLD - (first_y + rows) * span - margin,
+            -WEB_MERCATOR_HALF_WORLD + (first_x + columns) * span + margin,
+            WEB_MERCATOR_HALF_WORLD - first_y * span + margin
+        )
+        
+        ms = QgsMapSettings(base_settings)
+        ms.setExtent(extent)
+        ms.setOutputSize(QSize(columns * tile_size + 2 * buffer, rows * tile_size + 2 * buffer))
+        return ms
+    
+    def _slice_metatile(self, img, zoom, block, tile_size, buffer, image_format, output_dir, tiles):
+        """Cut a rendered metatile into tiles and write or collect them"""
+        first_x, first_y, _, _, wanted = block
+        extension = image_format.lower()
+        for x, y in wanted:
+            tile = img.copy(QRect(buffer + (x - first_x) * tile_size, buffer + (y - first_y) * tile_size,
+                                  tile_size, tile_size))
+            data = self._encode_image(tile, image_format)
+            if output_dir:
+                tile_dir = os.path.join(output_dir, str(zoom), str(x))
+                os.makedirs(tile_dir, exist_ok=True)
+                path = os.path.join(tile_dir, f"{y}.{extension}")
+                with open(path, 'wb') as f:
+                    f.write(data)
+                tiles.append({"x": x, "y": y, "path": path})
+            else:
+                tiles.append({"x": x, "y": y, "data": base64.b64encode(data).decode('ascii')})
+    
+    def _start_tile_job(self, blocks, render_block, store_block, tiles):
+        """Render metatiles one after another in the background"""
+        job = self._add_job("render_tiles", f"z{tiles['zoom']}: {tiles['tile_count']} tiles")
+        state = {"index": 0, "cancelled": False}
+        
+        def cancel():
+            state["cancelled"] = True
+            render = job.handles.get("render")
+            if render:
+                render.cancelWithoutBlocking()
+        
+        def start_next():
+            if state["cancelled"]:
+                job.finish(Job.CANCELLED, error="Cancelled")
+                return
+            if state["index"] >= len(blocks):
+                job.finish(Job.SUCCEEDED, result=tiles)
+                return
+            block = blocks[state["index"]]
+            render = render_block(block)
+            job.handles["render"] = render
+            render.finished.connect(lambda block=block, render=render: on_finished(block, render))
+            render.start()
+        
+        def on_finished(block, render):
+            # The connection holds the lambda, which holds render and its image, until render is deleted
+            job.handles.pop("render", None)
+            render.deleteLater()
+            if not state["cancelled"]:
+                try:
+                    store_block(block, render)
+                except Exception as e:
+                    job.finish(Job.FAILED, error=f"Render error: {str(e)}")
+                    return
+                state["index"] += 1
+                job.progress = 100.0 * state["index"] / len(blocks)
+            # Start the next render outside the finished signal of this one
+            QTimer.singleShot(0, start_next)
+        
+        job.cancel = cancel
+        start_next()
+        return job.to_dict()
 
 
 class QgisMCPDockWidget(QDockWidget):
@@ -778,7 +3657,19 @@ class QgisMCPDockWidget(QDockWidget):
         """Start the server"""
         if not self.server:
             port = self.port_spin.value()
-            self.server = QgisMCPServer(port=port, iface=self.iface)
+            settings = QSettings()
+            self.server = QgisMCPServer(
+                port=port,
+                iface=self.iface,
+                max_connections=settings.value("QGIS_MCP/max_connections", 16, type=int),
+                max_queue_depth=settings.value("QGIS_MCP/max_queue_depth", 32, type=int),
+                render_cache_bytes=settings.value("QGIS_MCP/render_cache_mb", 64, type=int) * 1024 * 1024,
+                worker_count=settings.value("QGIS_MCP/worker_count", 2, type=int),
+                worker_timeout=settings.value("QGIS_MCP/worker_timeout", WORKER_TIMEOUT, type=int),
+                worker_memory_mb=settings.value("QGIS_MCP/worker_memory_mb", 0, type=int),
+                prewarm_workers=settings.value("QGIS_MCP/prewarm_workers", False, type=bool),
+                unix_socket=settings.value("QGIS_MCP/unix_socket", "", type=str) or None
+            )
             
         if self.server.start():
             self.status_label.setText(f"Server: Running on port {self.server.port}")
@@ -873,3 +3764,60 @@ class QgisMCPPlugin:
 # Plugin entry point
 def classFactory(iface):
     return QgisMCPPlugin(iface)
+
+
+def run_worker(argv):
+    """
+    Worker process main loop (see WorkerPool).
+
+    Reads length-prefixed JSON requests from stdin and writes one response
+    per request to stdout. Anything the executed code prints goes to stderr
+    so it cannot corrupt the message channel.
+    """
+    if "--memory-mb" in argv:
+        limit = int(argv[argv.index("--memory-mb") + 1]) * 1024 * 1024
+        try:
+            import resource
+            resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+        except (ImportError, ValueError, OSError):
+            pass  # Not supported on this platform
+    
+    channel_in = sys.stdin.buffer
+    channel_out = os.fdopen(os.dup(sys.stdout.fileno()), "wb")
+    os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+    sys.stdout = sys.stderr
+    
+    def send(message):
+        channel_out.write(encode_message(message, FRAMING_LENGTH))
+        channel_out.flush()
+    
+    app = QgsApplication([], False)
+    app.initQgis()
+    server = QgisMCPServer(iface=None, worker_count=0)
+    handlers = {
+        "execute_code": server.execute_code,
+        "list_tests": server.list_tests,
+        # Durations are recorded by the QGIS process that requested the run
+        "run_test": lambda **params: server.run_test(record_durations=False, **params)
+    }
+    send({"status": "ready", "pid": os.getpid()})
+    
+    while True:
+        header = channel_in.read(FRAME_HEADER.size)
+        if len(header) < FRAME_HEADER.size:
+            break
+        (size,) = FRAME_HEADER.unpack(header)
+        request = json.loads(channel_in.read(size).decode('utf-8'))
+        try:
+            handler = handlers.get(request.get("type"))
+            if handler is None:
+                raise Exception(f"Unknown worker command: {request.get('type')}")
+            send({"status": "success", "result": handler(**request.get("params", {}))})
+        except Exception as e:
+            send({"status": "error", "message": str(e)})
+    
+    app.exitQgis()
+
+
+if __name__ == "__main__" and "--worker" in sys.argv:
+    run_worker(sys.argv[1:])
@@ -0,0 +1,105 @@
+"""
+Wire protocol shared by the QGIS MCP clients: framing, compression and hand-off of large responses
+"""
+
+import os
+import json
+import zlib
+import struct
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Framing modes understood by the QGIS plugin. "length" prefixes each message
+# with a 4-byte big-endian size; "json" is the legacy unframed mode.
+FRAMING_JSON = "json"
+FRAMING_LENGTH = "length"
+FRAME_HEADER = struct.Struct(">I")
+
+# Compression of length-prefixed frames, negotiated in the handshake. The top
+# bit of a frame's size marks a payload compressed with the negotiated codec.
+COMPRESSED_FRAME = 0x80000000
+COMPRESS_THRESHOLD = 16 * 1024
+COMPRESSORS = {
+    "zlib": (lambda data: zlib.compress(data, 1), zlib.decompress),
+}
+if zstandard is not None:
+    COMPRESSORS["zstd"] = (zstandard.ZstdCompressor(level=3).compress, zstandard.ZstdDecompressor().decompress)
+SUPPORTED_COMPRESSIONS = tuple(name for name in ("zstd", "zlib") if name in COMPRESSORS)
+
+def read_handoff(message):
+    """Replace a {"handoff": {"path": ...}} message by the response stored in that file.
+
+    The plugin writes large responses to a temporary file for local clients
+    that asked for it; the file is deleted once read.
+    """
+    if isinstance(message, dict) and set(message) == {"handoff"}:
+        path = message["handoff"]["path"]
+        with open(path, "rb") as f:
+            payload = f.read()
+        os.remove(path)
+        return json.loads(payload.decode('utf-8'))
+    return message
+
+class FramedConnection:
+    """Framing, compression and hand-off state of a client connection.
+
+    Subclasses do the actual (blocking or asyncio) I/O; this class builds
+    the handshake, applies the plugin's answer and encodes/decodes frames.
+    """
+
+    def __init__(self, framing=FRAMING_LENGTH, compression=SUPPORTED_COMPRESSIONS, unix_socket=None, handoff=None):
+        self.unix_socket = unix_socket  # Path of the plugin's Unix domain socket, used instead of host/port
+        self.requested_framing = framing
+        self.requested_compression = compression  # codecs to offer, in order of preference; () to disable
+        # Ask for large responses as temporary files; by default only over a Unix socket
+        self.requested_handoff = unix_socket is not None if handoff is None else handoff
+        self._reset_framing()
+
+    def _reset_framing(self):
+        """Back to the legacy mode every new connection starts in"""
+        self.framing = FRAMING_JSON
+        self.compression = None
+        self.compress_threshold = COMPRESS_THRESHOLD
+        self.handoff = False
+
+    def _handshake_command(self):
+        """The handshake asking for the requested framing, compression and hand-off"""
+        params = {"framing": self.requested_framing}
+        if self.requested_compression:
+            params["compression"] = list(self.requested_compression)
+        if self.requested_handoff:
+            params["handoff"] = True
+        return {"type": "handshake", "params": params}
+
+    def _apply_handshake(self, response):
+        """Switch to what the plugin accepted.
+
+        Plugins that predate the handshake answer with an unknown command
+        error, in which case the connection stays in legacy JSON mode.
+        """
+        if response and response.get("status") == "success":
+            self.framing = response["result"]["framing"]
+            # Plugins without compression support leave it out
+            self.compression = response["result"].get("compression")
+            self.compress_threshold = response["result"].get("compress_threshold", COMPRESS_THRESHOLD)
+            self.handoff = response["result"].get("handoff", False)
+
+    def _encode_message(self, message):
+        """Serialize one message in the current framing and compression"""
+        payload = json.dumps(message, separators=(',', ':')).encode('utf-8')
+        if self.framing == FRAMING_LENGTH:
+            if self.compression and len(payload) >= self.compress_threshold:
+                compressed = COMPRESSORS[self.compression][0](payload)
+                if len(compressed) < len(payload):
+                    return FRAME_HEADER.pack(len(compressed) | COMPRESSED_FRAME) + compressed
+            return FRAME_HEADER.pack(len(payload)) + payload
+        return payload
+
+    def _decode_frame(self, size, payload):
+        """Decode a length-prefixed payload, decompressing it if flagged"""
+        if size & COMPRESSED_FRAME:
+            payload = COMPRESSORS[self.compression][1](bytes(payload))
+        return json.loads(payload.decode('utf-8'))
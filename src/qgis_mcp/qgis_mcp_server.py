@@ -3,109 +3,258 @@
 QGIS MCP Client - Simple client to connect to the QGIS MCP server
 """
 
+import asyncio
 import logging
+import os
 from contextlib import asynccontextmanager
-import socket
 import json
+import base64
+import itertools
 from typing import AsyncIterator, Dict, Any
-from mcp.server.fastmcp import FastMCP, Context
+from mcp.server.fastmcp import FastMCP, Context, Image
+
+from qgis_mcp_protocol import (FRAMING_JSON, FRAMING_LENGTH, FRAME_HEADER, COMPRESSED_FRAME, SUPPORTED_COMPRESSIONS,
+                               FramedConnection, read_handoff)
 
 logging.basicConfig(level=logging.INFO, 
                     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger("QgisMCPServer")
 
-class QgisMCPServer:
-    def __init__(self, host='localhost', port=9876):
+# Tool results are returned as compact JSON unless this environment variable is set (e.g. to 1)
+PRETTY_JSON_ENV = "QGIS_MCP_PRETTY_JSON"
+
+# Path of the plugin's Unix domain socket (QGIS_MCP/unix_socket setting); TCP is used when unset
+UNIX_SOCKET_ENV = "QGIS_MCP_UNIX_SOCKET"
+
+# Connections opened to the plugin at most, i.e. tool calls in flight at once
+DEFAULT_POOL_SIZE = 4
+
+# Reconnect attempts after a failed connection, waiting RETRY_DELAY, 2 * RETRY_DELAY, ... (at most MAX_RETRY_DELAY)
+CONNECT_ATTEMPTS = 4
+RETRY_DELAY = 0.1
+MAX_RETRY_DELAY = 2.0
+
+# Commands that only read state, so they are sent again on a new connection if the connection fails mid-request
+IDEMPOTENT_COMMANDS = frozenset({
+    "ping", "get_qgis_info", "get_project_info", "get_layers", "get_layer_features", "job_status", "job_result",
+    "list_jobs", "list_algorithms", "describe_algorithm", "list_sessions", "list_tests", "worker_status",
+    "list_processing_scripts",
+})
+
+class QgisConnection(FramedConnection):
+    """One asyncio connection to the QGIS plugin, serving one request at a time"""
+
+    def __init__(self, host='localhost', port=9876, framing=FRAMING_LENGTH, compression=SUPPORTED_COMPRESSIONS,
+                 unix_socket=None, handoff=None):
+        super().__init__(framing, compression, unix_socket, handoff)
         self.host = host
         self.port = port
-        self.socket = None
+        self.reader = None
+        self.writer = None
+        self._request_ids = itertools.count(1)
     
-    def connect(self):
+    async def connect(self):
         """Connect to the QGIS MCP server"""
-        try:
-            self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            self.socket.connect((self.host, self.port))
-            return True
-        except Exception as e:
-            print(f"Error connecting to server: {str(e)}")
-            return False
+        if self.unix_socket:
+            self.reader, self.writer = await asyncio.open_unix_connection(self.unix_socket)
+        else:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        self._reset_framing()
+        if self.requested_framing != FRAMING_JSON:
+            await self._negotiate_framing()
+    
+    def is_alive(self):
+        """Whether the connection is open and the plugin has not closed its end"""
+        return self.writer is not None and not self.writer.is_closing() and not self.reader.at_eof()
     
-    def disconnect(self):
+    async def disconnect(self):
         """Disconnect from the server"""
-        if self.socket:
-            self.socket.close()
-            self.socket = None
+        if self.writer:
+            self.writer.close()
+            try:
+                await self.writer.wait_closed()
+            except (ConnectionError, OSError):
+                pass
+            self.reader = self.writer = None
     
-    def send_command(self, command_type, params=None):
-        """Send a command to the server and get the response"""
-        if not self.socket:
-            print("Not connected to server")
-            return None
+    async def _negotiate_framing(self):
+        """Ask the plugin to switch this connection to the requested framing"""
+        await self._send_message(self._handshake_command())
+        self._apply_handshake(await self._receive_message())
+    
+    async def _send_message(self, message):
+        """Serialize and send one message in the current framing"""
+        self.writer.write(self._encode_message(message))
+        await self.writer.drain()
+    
+    async def _receive_message(self):
+        """Receive one message in the current framing"""
+        try:
+            if self.framing == FRAMING_LENGTH:
+                (size,) = FRAME_HEADER.unpack(await self.reader.readexactly(FRAME_HEADER.size))
+                message = self._decode_frame(size, await self.reader.readexactly(size & ~COMPRESSED_FRAME))
+                if self.handoff:
+                    # Reading a large file would block the event loop
+                    message = await asyncio.to_thread(read_handoff, message)
+                return message
+        except asyncio.IncompleteReadError:
+            raise ConnectionError("Connection closed by server")
         
-        # Create command
-        command = {
+        # Legacy mode: try to decode after every chunk
+        response_data = b''
+        while True:
+            chunk = await self.reader.read(4096)
+            if not chunk:
+                break
+            response_data += chunk
+            try:
+                return json.loads(response_data.decode('utf-8'))
+            except (json.JSONDecodeError, UnicodeDecodeError):
+                continue  # Keep receiving
+        raise ConnectionError("Connection closed by server")
+    
+    async def send_command(self, command_type, params=None):
+        """Send a command to the server and wait for its response"""
+        await self._send_message({
+            "id": next(self._request_ids),
             "type": command_type,
             "params": params or {}
-        }
+        })
+        return await self._receive_message()
+    
+    async def send_commands(self, commands):
+        """Send several (command_type, params) commands before reading any response.
+
+        Responses are returned in the same order as the commands.
+        """
+        if self.framing != FRAMING_LENGTH:
+            # Unframed responses cannot be split reliably, so send them one at a time
+            return [await self.send_command(command_type, params) for command_type, params in commands]
         
-        try:
-            # Send the command
-            self.socket.sendall(json.dumps(command).encode('utf-8'))
-            
-            # Receive the response
-            response_data = b''
-            while True:
-                chunk = self.socket.recv(4096)
-                if not chunk:
-                    break
-                response_data += chunk
-                
-                # Try to decode as JSON to see if it's complete
-                try:
-                    json.loads(response_data.decode('utf-8'))
-                    break  # Valid JSON, we have the full message
-                except json.JSONDecodeError:
-                    continue  # Keep receiving
-            
-            # Parse and return the response
-            return json.loads(response_data.decode('utf-8'))
-            
-        except Exception as e:
-            print(f"Error sending command: {str(e)}")
-            return None
-
-_qgis_connection = None
-
-def get_qgis_connection():
-    """Get or create a persistent Qgis connection"""
-    global _qgis_connection
+        requests = [
+            {"id": next(self._request_ids), "type": command_type, "params": params or {}}
+            for command_type, params in commands
+        ]
+        self.writer.write(b''.join(self._encode_message(request) for request in requests))
+        await self.writer.drain()
+        
+        # Match responses by id; plugins without request ids answer in order
+        responses = {}
+        for request in requests:
+            response = await self._receive_message()
+            responses[response.get("id", request["id"])] = response
+        return [responses.get(request["id"]) for request in requests]
+
+class QgisConnectionPool:
+    """A bounded pool of connections to the QGIS plugin.
+
+    Each tool call borrows a connection for the duration of its request, so
+    concurrent calls use separate sockets instead of waiting on one. The
+    plugin still executes their commands one at a time on the QGIS main
+    thread; only background and worker jobs run alongside other commands. Idle
+    connections are kept open for reuse (the most recently used first, so
+    sequential calls stay on one warm connection); a connection whose request
+    failed or was cancelled mid-way is closed, since its stream may hold a
+    stale response, and idle connections closed by the plugin are dropped.
+    Connecting is retried with exponential backoff, and read-only commands
+    are retried on a new connection when their connection fails.
+    """
+
+    def __init__(self, host='localhost', port=9876, size=DEFAULT_POOL_SIZE, framing=FRAMING_LENGTH, unix_socket=None):
+        self.host = host
+        self.port = port
+        self.unix_socket = unix_socket
+        self.size = size
+        self.framing = framing
+        self.idle = []
+        self.slots = asyncio.Semaphore(size)
     
-    # If we have an existing connection, check if it's still valid
-    if _qgis_connection is not None:
-        # Test if the connection is still alive with a simple ping
-        try:
-            # Just try to send a small message to check if the socket is still connected
-            _qgis_connection.sock.sendall(b'')
-            return _qgis_connection
-        except Exception as e:
-            # Connection is dead, close it and create a new one
-            logger.warning(f"Existing connection is no longer valid: {str(e)}")
+    async def _open(self):
+        delay = RETRY_DELAY
+        for attempt in range(1, CONNECT_ATTEMPTS + 1):
+            connection = QgisConnection(self.host, self.port, self.framing, unix_socket=self.unix_socket)
             try:
-                _qgis_connection.disconnect()
-            except Exception:
-                pass
-            _qgis_connection = None
+                await connection.connect()
+                logger.info("Created new connection to Qgis")
+                return connection
+            except OSError as e:
+                await connection.disconnect()
+                if attempt == CONNECT_ATTEMPTS:
+                    logger.error(f"Failed to connect to Qgis: {str(e)}")
+                    raise Exception("Could not connect to Qgis. Make sure the Qgis plugin is running.")
+                logger.warning(f"Failed to connect to Qgis ({str(e)}), retrying in {delay:.1f}s")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, MAX_RETRY_DELAY)
     
-    # Create a new connection if needed
-    if _qgis_connection is None:
-        _qgis_connection = QgisMCPServer(host="localhost", port=9876)
-        if not _qgis_connection.connect():
-            logger.error("Failed to connect to Qgis")
-            _qgis_connection = None
-            raise Exception("Could not connect to Qgis. Make sure the Qgis plugin is running.")
-        logger.info("Created new persistent connection to Qgis")
+    @asynccontextmanager
+    async def connection(self):
+        """Borrow a connection, opening a new one if no idle one is alive"""
+        async with self.slots:
+            connection = None
+            while self.idle and connection is None:
+                connection = self.idle.pop()
+                if not connection.is_alive():
+                    logger.info("Dropping connection closed by Qgis")
+                    await connection.disconnect()
+                    connection = None
+            if connection is None:
+                connection = await self._open()
+            try:
+                yield connection
+            except BaseException:
+                await connection.disconnect()
+                raise
+            self.idle.append(connection)
     
-    return _qgis_connection
+    async def send_command(self, command_type, params=None):
+        """Send a command on a pooled connection and return the response.
+
+        If the connection fails, read-only commands are sent again on a new
+        connection; other commands raise, as the plugin may have run them.
+        """
+        attempts = CONNECT_ATTEMPTS if command_type in IDEMPOTENT_COMMANDS else 1
+        delay = RETRY_DELAY
+        for attempt in range(1, attempts + 1):
+            try:
+                async with self.connection() as connection:
+                    return await connection.send_command(command_type, params)
+            except OSError as e:
+                if attempt == attempts:
+                    raise ConnectionError(f"Connection to Qgis lost during {command_type}: {str(e)}")
+                logger.warning(f"Connection to Qgis lost during {command_type} ({str(e)}), retrying in {delay:.1f}s")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, MAX_RETRY_DELAY)
+    
+    async def send_commands(self, commands):
+        """Pipeline several commands on one pooled connection"""
+        async with self.connection() as connection:
+            return await connection.send_commands(commands)
+    
+    async def batch(self, commands, stop_on_error=False):
+        """Execute a list of {"type", "params"} commands in a single request"""
+        return await self.send_command("batch", {"commands": commands, "stop_on_error": stop_on_error})
+    
+    async def close(self):
+        """Close the idle connections"""
+        while self.idle:
+            await self.idle.pop().disconnect()
+
+def format_result(result):
+    """Serialize a tool result, indented only when pretty output is requested"""
+    if os.environ.get(PRETTY_JSON_ENV, "").lower() not in ("", "0", "false", "no"):
+        return json.dumps(result, indent=2)
+    return json.dumps(result, separators=(',', ':'))
+
+_qgis_pool = None
+
+def get_qgis_pool():
+    """Get the shared pool of connections to Qgis"""
+    global _qgis_pool
+    if _qgis_pool is None:
+        _qgis_pool = QgisConnectionPool(host="localhost", port=9876,
+                                        size=int(os.environ.get("QGIS_MCP_POOL_SIZE", DEFAULT_POOL_SIZE)),
+                                        unix_socket=os.environ.get(UNIX_SOCKET_ENV) or None)
+    return _qgis_pool
 
 @asynccontextmanager
 async def server_lifespan(server: FastMCP) -> AsyncIterator[Dict[str, Any]]:
@@ -113,18 +262,20 @@ async def server_lifespan(server: FastMCP) -> AsyncIterator[Dict[str, Any]]:
     try:
         logger.info("QgisMCPServer server starting up")
         try:
-            get_qgis_connection()
+            # Open the first connection now so the first tool call does not pay for it
+            async with get_qgis_pool().connection():
+                pass
             logger.info("Successfully connected to Qgis on startup")
         except Exception as e:
             logger.warning(f"Could not connect to Qgis on startup: {str(e)}")
             logger.warning("Make sure the Qgis addon is running before using Qgis resources or tools")
         yield {}
     finally:
-        global _qgis_connection
-        if _qgis_connection:
+        global _qgis_pool
+        if _qgis_pool:
             logger.info("Disconnecting from Qgis on shutdown")
-            _qgis_connection.disconnect()
-            _qgis_connection = None
+            await _qgis_pool.close()
+            _qgis_pool = None
         logger.info("QgisMCPServer server shut down")
 
 mcp = FastMCP(
@@ -134,27 +285,27 @@ mcp = FastMCP(
 )
 
 @mcp.tool()
-def check_server_connection(ctx: Context) -> str:
+async def check_server_connection(ctx: Context) -> str:
     """
     Check if the MCP server is successfully connected to the QGIS plugin.
     Returns a simple 'pong' response if connected.
     """
-    qgis = get_qgis_connection()
-    result = qgis.send_command("ping")
-    return json.dumps(result, indent=2)
+    qgis = get_qgis_pool()
+    result = await qgis.send_command("ping")
+    return format_result(result)
 
 @mcp.tool()
-def get_qgis_installation_info(ctx: Context) -> str:
+async def get_qgis_installation_info(ctx: Context) -> str:
     """
     Retrieve information about the QGIS installation, including version and profile paths.
     Use this to verify the QGIS environment details.
     """
-    qgis = get_qgis_connection()
-    result = qgis.send_command("get_qgis_info")
-    return json.dumps(result, indent=2)
+    qgis = get_qgis_pool()
+    result = await qgis.send_command("get_qgis_info")
+    return format_result(result)
 
 @mcp.tool()
-def open_qgis_project(ctx: Context, path: str) -> str:
+async def open_qgis_project(ctx: Context, path: str) -> str:
     """
     Load a QGIS project file (.qgz or .qgs) from the specified disk path.
     This will replace the currently open project.
@@ -162,12 +313,12 @@ def open_qgis_project(ctx: Context, path: str) -> str:
     Args:
         path: Absolute path to the project file.
     """
-    qgis = get_qgis_connection()
-    result = qgis.send_command("load_project", {"path": path})
-    return json.dumps(result, indent=2)
+    qgis = get_qgis_pool()
+    result = await qgis.send_command("load_project", {"path": path})
+    return format_result(result)
 
 @mcp.tool()
-def create_new_qgis_project(ctx: Context, path: str) -> str:
+async def create_new_qgis_project(ctx: Context, path: str) -> str:
     """
     Create a new, empty QGIS project and save it to the specified path.
     This clears the current project state.
@@ -175,21 +326,21 @@ def create_new_qgis_project(ctx: Context, path: str) -> str:
     Args:
         path: Absolute path where the new project file will be saved.
     """
-    qgis = get_qgis_connection()
-    result = qgis.send_command("create_new_project", {"path": path})
-    return json.dumps(result, indent=2)
+    qgis = get_qgis_pool()
+    result = await qgis.send_command("create_new_project", {"path": path})
+    return format_result(result)
 
 @mcp.tool()
-def get_current_project_metadata(ctx: Context) -> str:
+async def get_current_project_metadata(ctx: Context) -> str:
     """
     Get metadata about the currently open QGIS project, including title, file path, CRS, and a list of layers.
     """
-    qgis = get_qgis_connection()
-    result = qgis.send_command("get_project_info")
-    return json.dumps(result, indent=2)
+    qgis = get_qgis_pool()
+    result = await qgis.send_command("get_project_info")
+    return format_result(result)
 
 @mcp.tool()
-def add_vector_layer(ctx: Context, path: str, provider: str = "ogr", name: str = None) -> str:
+async def add_vector_layer(ctx: Context, path: str, provider: str = "ogr", name: str = None) -> str:
     """
     Add a vector layer (Shapefile, GeoJSON, etc.) to the current project.
 
@@ -198,15 +349,15 @@ def add_vector_layer(ctx: Context, path: str, provider: str = "ogr", name: str =
         provider: Data provider (default: 'ogr').
         name: Display name for the layer (optional).
     """
-    qgis = get_qgis_connection()
+    qgis = get_qgis_pool()
     params = {"path": path, "provider": provider}
     if name:
         params["name"] = name
-    result = qgis.send_command("add_vector_layer", params)
-    return json.dumps(result, indent=2)
+    result = await qgis.send_command("add_vector_layer", params)
+    return format_result(result)
 
 @mcp.tool()
-def add_raster_layer(ctx: Context, path: str, provider: str = "gdal", name: str = None) -> str:
+async def add_raster_layer(ctx: Context, path: str, provider: str = "gdal", name: str = None) -> str:
     """
     Add a raster layer (GeoTIFF, etc.) to the current project.
 
@@ -215,36 +366,59 @@ def add_raster_layer(ctx: Context, path: str, provider: str = "gdal", name: str
         provider: Data provider (default: 'gdal').
         name: Display name for the layer (optional).
     """
-    qgis = get_qgis_connection()
+    qgis = get_qgis_pool()
     params = {"path": path, "provider": provider}
     if name:
         params["name"] = name
-    result = qgis.send_command("add_raster_layer", params)
-    return json.dumps(result, indent=2)
+    result = await qgis.send_command("add_raster_layer", params)
+    return format_result(result)
 
 @mcp.tool()
-def list_project_layers(ctx: Context) -> str:
+async def add_layers_in_bulk(ctx: Context, layers: list, workers: int = None) -> str:
+    """
+    Add many vector and raster layers to the current project in one call.
+    Much faster than repeated add_vector_layer/add_raster_layer calls for large sets of files:
+    sources are opened in parallel and registered with the project at once.
+
+    Args:
+        layers: List of file paths, or objects like {"path": ..., "name": ..., "type": "vector"|"raster", "provider": ...}.
+            The type is guessed from the file extension when omitted.
+        workers: Number of threads used to open the sources (optional).
+    """
+    qgis = get_qgis_pool()
+    params = {"layers": layers}
+    if workers:
+        params["workers"] = workers
+    result = await qgis.send_command("add_layers", params)
+    return format_result(result)
+
+@mcp.tool()
+async def list_project_layers(ctx: Context, feature_counts: bool = True) -> str:
     """
     List all layers currently loaded in the QGIS project with their IDs, names, and types.
+
+    Args:
+        feature_counts: Include the feature count of vector layers. Counts are cached by the plugin
+            until the layer's data changes; set to False to skip them on very large layers.
     """
-    qgis = get_qgis_connection()
-    result = qgis.send_command("get_layers")
-    return json.dumps(result, indent=2)
+    qgis = get_qgis_pool()
+    result = await qgis.send_command("get_layers", {"feature_counts": feature_counts})
+    return format_result(result)
 
 @mcp.tool()
-def remove_layer_from_project(ctx: Context, layer_id: str) -> str:
+async def remove_layer_from_project(ctx: Context, layer_id: str) -> str:
     """
     Remove a specific layer from the project.
 
     Args:
         layer_id: The unique ID of the layer to remove (obtained from list_project_layers).
     """
-    qgis = get_qgis_connection()
-    result = qgis.send_command("remove_layer", {"layer_id": layer_id})
-    return json.dumps(result, indent=2)
+    qgis = get_qgis_pool()
+    result = await qgis.send_command("remove_layer", {"layer_id": layer_id})
+    return format_result(result)
 
 @mcp.tool()
-def zoom_map_to_layer(ctx: Context, layer_id: str) -> str:
+async def zoom_map_to_layer(ctx: Context, layer_id: str) -> str:
     """
     Zoom the map canvas to the extent of a specific layer.
     Note: This may have no effect in headless mode if the GUI is not active.
@@ -252,53 +426,171 @@ def zoom_map_to_layer(ctx: Context, layer_id: str) -> str:
     Args:
         layer_id: The unique ID of the layer.
     """
-    qgis = get_qgis_connection()
-    result = qgis.send_command("zoom_to_layer", {"layer_id": layer_id})
-    return json.dumps(result, indent=2)
+    qgis = get_qgis_pool()
+    result = await qgis.send_command("zoom_to_layer", {"layer_id": layer_id})
+    return format_result(result)
 
 @mcp.tool()
-def read_vector_layer_features(ctx: Context, layer_id: str, limit: int = 10) -> str:
+async def read_vector_layer_features(ctx: Context, layer_id: str, limit: int = 10, offset: int = 0,
+                                     cursor: str = None, fields: list = None, with_geometry: bool = True,
+                                     expression: str = None, format: str = "rows") -> str:
     """
-    Retrieve attributes and geometry for features in a vector layer.
+    Retrieve attributes and geometry for features in a vector layer, one page at a time.
+
+    The response contains 'next_cursor' when more features are available; pass it back as
+    'cursor' to fetch the next page.
 
     Args:
         layer_id: The unique ID of the layer.
         limit: Maximum number of features to return (default: 10).
-    """
-    qgis = get_qgis_connection()
-    result = qgis.send_command("get_layer_features", {"layer_id": layer_id, "limit": limit})
-    return json.dumps(result, indent=2)
+        offset: Number of matching features to skip (ignored when 'cursor' is given).
+        cursor: Continuation token returned as 'next_cursor' by the previous page.
+        fields: Attribute names to return (default: all fields).
+        with_geometry: Include geometry as WKT (default: True).
+        expression: QGIS filter expression, e.g. "population > 10000".
+        format: 'rows' (one object per feature, WKT geometry) or 'columnar' (one array per
+            field, base64 WKB geometry; much smaller for wide tables).
+    """
+    qgis = get_qgis_pool()
+    params = {"layer_id": layer_id, "limit": limit, "offset": offset, "with_geometry": with_geometry, "format": format}
+    if cursor:
+        params["cursor"] = cursor
+    if fields is not None:
+        params["fields"] = fields
+    if expression:
+        params["expression"] = expression
+    result = await qgis.send_command("get_layer_features", params)
+    return format_result(result)
 
 @mcp.tool()
-def run_processing_algorithm(ctx: Context, algorithm: str, parameters: dict) -> str:
+async def run_processing_algorithm(ctx: Context, algorithm: str, parameters: dict, background: bool = False) -> str:
     """
     Execute a QGIS Processing algorithm.
 
+    Long-running algorithms (large buffers, dissolves, ...) should use background=True: the
+    algorithm then runs on the QGIS task manager without blocking QGIS, and a job ID is
+    returned immediately. Use get_background_job_status / get_background_job_result with it.
+
+    Use search_processing_algorithms and describe_processing_algorithm to find the algorithm ID
+    and parameter names. Unknown algorithms, unknown parameter names and missing required
+    parameters are reported before the algorithm runs.
+
     Args:
         algorithm: The algorithm ID (e.g., 'native:buffer').
         parameters: A dictionary of algorithm parameters.
+        background: Run as a background job and return its job ID (default: False).
+    """
+    qgis = get_qgis_pool()
+    params = {"algorithm": algorithm, "parameters": parameters}
+    if background:
+        params["background"] = True
+    result = await qgis.send_command("execute_processing", params)
+    return format_result(result)
+
+@mcp.tool()
+async def search_processing_algorithms(ctx: Context, query: str = None, provider: str = None, limit: int = 50,
+                                       offset: int = 0) -> str:
+    """
+    Find QGIS Processing algorithms by keyword.
+
+    Returns the ID, name, provider, group and tags of each match, plus the total number of matches
+    and the offset of the next page.
+
+    Args:
+        query: Words that must all appear in the algorithm ID, name, group or tags (e.g. 'buffer', 'raster clip').
+            Omit to list all algorithms.
+        provider: Only return algorithms of this provider (e.g. 'native', 'gdal', 'script').
+        limit: Maximum number of algorithms to return (default: 50).
+        offset: Number of matches to skip, for paging.
+    """
+    qgis = get_qgis_pool()
+    params = {"limit": limit, "offset": offset}
+    if query:
+        params["query"] = query
+    if provider:
+        params["provider"] = provider
+    result = await qgis.send_command("list_algorithms", params)
+    return format_result(result)
+
+@mcp.tool()
+async def describe_processing_algorithm(ctx: Context, algorithm: str) -> str:
+    """
+    Describe a QGIS Processing algorithm: help text, parameters and outputs.
+
+    Each parameter lists its name, type, description, whether it is optional, its default value and,
+    for enums, the available options (pass the option index as the value).
+
+    Args:
+        algorithm: The algorithm ID (e.g., 'native:buffer').
+    """
+    qgis = get_qgis_pool()
+    result = await qgis.send_command("describe_algorithm", {"algorithm": algorithm})
+    return format_result(result)
+
+@mcp.tool()
+async def get_background_job_status(ctx: Context, job_id: str) -> str:
+    """
+    Get the status ('running', 'succeeded', 'failed' or 'cancelled') and progress of a background job.
+
+    Args:
+        job_id: The job ID returned when the job was started.
+    """
+    qgis = get_qgis_pool()
+    result = await qgis.send_command("job_status", {"job_id": job_id})
+    return format_result(result)
+
+@mcp.tool()
+async def get_background_job_result(ctx: Context, job_id: str) -> str:
+    """
+    Get the result or error of a finished background job.
+    Returns an error while the job is still running.
+
+    Args:
+        job_id: The job ID returned when the job was started.
+    """
+    qgis = get_qgis_pool()
+    result = await qgis.send_command("job_result", {"job_id": job_id})
+    return format_result(result)
+
+@mcp.tool()
+async def cancel_background_job(ctx: Context, job_id: str) -> str:
+    """
+    Request cancellation of a running background job.
+
+    Args:
+        job_id: The job ID returned when the job was started.
+    """
+    qgis = get_qgis_pool()
+    result = await qgis.send_command("cancel_job", {"job_id": job_id})
+    return format_result(result)
+
+@mcp.tool()
+async def list_background_jobs(ctx: Context) -> str:
+    """
+    List background jobs known to the QGIS plugin with their status.
     """
-    qgis = get_qgis_connection()
-    result = qgis.send_command("execute_processing", {"algorithm": algorithm, "parameters": parameters})
-    return json.dumps(result, indent=2)
+    qgis = get_qgis_pool()
+    result = await qgis.send_command("list_jobs")
+    return format_result(result)
 
 @mcp.tool()
-def save_project(ctx: Context, path: str = None) -> str:
+async def save_project(ctx: Context, path: str = None) -> str:
     """
     Save the current QGIS project to disk.
 
     Args:
         path: Optional path to save to. If omitted, saves to the current project path.
     """
-    qgis = get_qgis_connection()
+    qgis = get_qgis_pool()
     params = {}
     if path:
         params["path"] = path
-    result = qgis.send_command("save_project", params)
-    return json.dumps(result, indent=2)
+    result = await qgis.send_command("save_project", params)
+    return format_result(result)
 
 @mcp.tool()
-def export_map_view_to_image(ctx: Context, path: str, width: int = 800, height: int = 600) -> str:
+async def export_map_view_to_image(ctx: Context, path: str, width: int = 800, height: int = 600,
+                                   background: bool = False, format: str = None, quality: int = -1) -> str:
     """
     Render the current map view to an image file.
     In headless mode, this uses the combined extent of all layers.
@@ -307,13 +599,73 @@ def export_map_view_to_image(ctx: Context, path: str, width: int = 800, height:
         path: Output path for the image (e.g., /tmp/map.png).
         width: Image width in pixels.
         height: Image height in pixels.
+        background: Render without blocking QGIS and return a job ID to poll with
+            get_background_job_status (default: False). A foreground render holds up every
+            other command until it finishes.
+        format: Image format ('PNG', 'JPEG', 'WEBP', ...); defaults to the path's extension.
+        quality: Compression quality 0-100 for lossy formats (-1: format default).
+    """
+    qgis = get_qgis_pool()
+    params = {"path": path, "width": width, "height": height, "quality": quality}
+    if format:
+        params["format"] = format
+    if background:
+        params["background"] = True
+    result = await qgis.send_command("render_map", params)
+    return format_result(result)
+
+@mcp.tool()
+async def view_map_image(ctx: Context, width: int = 800, height: int = 600, format: str = "PNG",
+                         quality: int = -1) -> Image:
     """
-    qgis = get_qgis_connection()
-    result = qgis.send_command("render_map", {"path": path, "width": width, "height": height})
-    return json.dumps(result, indent=2)
+    Render the current map view and return the image itself, without writing a file.
+    In headless mode, this uses the combined extent of all layers.
+
+    Args:
+        width: Image width in pixels.
+        height: Image height in pixels.
+        format: 'PNG', 'JPEG' or 'WEBP' (default: PNG).
+        quality: Compression quality 0-100 for JPEG/WEBP (-1: format default). Lower values give smaller images.
+    """
+    qgis = get_qgis_pool()
+    result = await qgis.send_command("render_map", {"width": width, "height": height, "format": format,
+                                                    "quality": quality})
+    if result.get("status") != "success":
+        raise Exception(result.get("message", "Render failed"))
+    image = result["result"]
+    image_format = image["format"].lower()
+    return Image(data=base64.b64decode(image["data"]), format="jpeg" if image_format == "jpg" else image_format)
 
 @mcp.tool()
-def execute_arbitrary_python_code(ctx: Context, code: str) -> str:
+async def render_map_tiles(ctx: Context, zoom: int, x_min: int, x_max: int, y_min: int, y_max: int, output_dir: str,
+                           metatile: int = 4, tile_size: int = 256, format: str = "PNG", background: bool = False) -> str:
+    """
+    Render XYZ map tiles (Web Mercator, EPSG:3857) for a range of tile columns and rows at one zoom level.
+    Tiles are written to output_dir/{z}/{x}/{y}.png.
+
+    Args:
+        zoom: Zoom level (0-30).
+        x_min: First tile column.
+        x_max: Last tile column.
+        y_min: First tile row (XYZ scheme, row 0 at the top).
+        y_max: Last tile row.
+        output_dir: Directory receiving the tile tree.
+        metatile: Number of tiles per side rendered in a single map render (default: 4).
+        tile_size: Tile size in pixels (default: 256).
+        format: Image format, e.g. 'PNG' or 'JPG'.
+        background: Render without blocking QGIS and return a job ID (default: False).
+    """
+    qgis = get_qgis_pool()
+    result = await qgis.send_command("render_tiles", {
+        "zoom": zoom, "x_min": x_min, "x_max": x_max, "y_min": y_min, "y_max": y_max,
+        "output_dir": output_dir, "metatile": metatile, "tile_size": tile_size,
+        "format": format, "background": background
+    })
+    return format_result(result)
+
+@mcp.tool()
+async def execute_arbitrary_python_code(ctx: Context, code: str, session: str = None, isolated: bool = False,
+                                        timeout: int = None) -> str:
     """
     DANGER: Execute arbitrary Python code within the QGIS process.
 
@@ -322,13 +674,52 @@ def execute_arbitrary_python_code(ctx: Context, code: str) -> str:
 
     Args:
         code: The Python code string to execute.
+        session: Name of a persistent session (optional). Imports, variables and functions defined in
+            earlier calls with the same session name remain available. Without it, every call starts fresh.
+        isolated: Run the code in a separate headless QGIS worker process instead of the QGIS UI process.
+            Returns a job ID; use get_background_job_result to fetch the output. Infinite loops or crashes
+            then cannot freeze QGIS. The worker does not see the open project.
+        timeout: Time limit in seconds for isolated runs (optional).
+    """
+    qgis = get_qgis_pool()
+    params = {"code": code}
+    if session:
+        params["session"] = session
+    if isolated:
+        params["isolated"] = True
+    if timeout:
+        params["timeout"] = timeout
+    result = await qgis.send_command("execute_code", params)
+    return format_result(result)
+
+@mcp.tool()
+async def list_python_sessions(ctx: Context) -> str:
+    """
+    List persistent execute_arbitrary_python_code sessions with the names defined in each,
+    plus statistics of the plugin's compiled code cache.
     """
-    qgis = get_qgis_connection()
-    result = qgis.send_command("execute_code", {"code": code})
-    return json.dumps(result, indent=2)
+    qgis = get_qgis_pool()
+    result = await qgis.send_command("list_sessions")
+    return format_result(result)
 
 @mcp.tool()
-def run_python_unit_tests(ctx: Context, code: str = None, path: str = None) -> str:
+async def reset_python_session(ctx: Context, session: str, close: bool = False) -> str:
+    """
+    Clear a persistent Python session.
+
+    Args:
+        session: The session name.
+        close: Drop the session entirely instead of only clearing its namespace.
+    """
+    qgis = get_qgis_pool()
+    result = await qgis.send_command("close_session" if close else "reset_session", {"session": session})
+    return format_result(result)
+
+@mcp.tool()
+async def run_python_unit_tests(ctx: Context, code: str = None, path: str = None, isolated: bool = False,
+                                timeout: int = None, test_ids: list = None, shards: int = None, slowest: int = 10,
+                                trace_memory: bool = False, junit_xml: str = None, json_report: str = None,
+                                changed_only: bool = False, failed_first: bool = False, source_dir: str = None) -> str:
     """
     Run Python unittest suite within the QGIS environment.
 
@@ -336,17 +727,60 @@ def run_python_unit_tests(ctx: Context, code: str = None, path: str = None) -> s
 
     Args:
         code: A string containing the full python test suite (imports, TestCase classes).
-        path: Absolute path to a python test file.
-    """
-    qgis = get_qgis_connection()
+        path: Absolute path to a python test file, or to a directory whose test*.py files are run.
+        isolated: Run the suite in a headless QGIS worker process and return a job ID
+            (see get_background_job_result). Several isolated suites run in parallel; without
+            isolated or shards the suite runs in QGIS and other commands wait for it.
+        timeout: Time limit in seconds for isolated runs (optional).
+        test_ids: Only run these test ids, e.g. ["test_module.TestClass.test_method"] (optional).
+        shards: Split the tests into this many groups and run them in parallel worker processes.
+            Groups are balanced using the durations recorded by earlier runs. Returns a job ID;
+            the job result has the usual counts and failures merged over all groups.
+        slowest: Number of slowest tests to list in the result (default 10). Every test's wall time,
+            CPU time and setUp/tearDown time is also returned under "timings".
+        trace_memory: Also measure the peak Python memory allocated by each test (slower).
+        junit_xml: Path to write a JUnit XML report to (optional).
+        json_report: Path to write the full JSON result to (optional).
+        changed_only: Only run tests whose test module, or a file of the plugin it imports, changed since the
+            previous changed_only/failed_first run of the same path, plus tests that failed last time.
+            Use this when iterating on a plugin. The first run always runs everything.
+        failed_first: Run the tests that failed last time first.
+        source_dir: Folder whose .py files are tracked for changed_only and re-imported on every run
+            (default: the plugin folder, i.e. the nearest parent of path containing metadata.txt).
+    """
+    qgis = get_qgis_pool()
     params = {}
     if code: params["code"] = code
     if path: params["path"] = path
-    result = qgis.send_command("run_test", params)
-    return json.dumps(result, indent=2)
+    if isolated: params["isolated"] = True
+    if timeout: params["timeout"] = timeout
+    if test_ids is not None: params["test_ids"] = test_ids
+    if shards: params["shards"] = shards
+    params["slowest"] = slowest
+    if trace_memory: params["trace_memory"] = True
+    if junit_xml: params["junit_xml"] = junit_xml
+    if json_report: params["json_report"] = json_report
+    if changed_only: params["changed_only"] = True
+    if failed_first: params["failed_first"] = True
+    if source_dir: params["source_dir"] = source_dir
+    result = await qgis.send_command("run_test", params)
+    return format_result(result)
 
 @mcp.tool()
-def install_qgis_plugin_from_directory(ctx: Context, path: str) -> str:
+async def get_worker_pool_status(ctx: Context, start: bool = False) -> str:
+    """
+    Show the headless QGIS worker processes used for isolated code and test runs.
+
+    Args:
+        start: Start the workers now so the first isolated run does not wait for QGIS to initialize.
+    """
+    qgis = get_qgis_pool()
+    result = await qgis.send_command("start_workers" if start else "worker_status")
+    return format_result(result)
+
+@mcp.tool()
+async def install_qgis_plugin_from_directory(ctx: Context, path: str, mode: str = "copy", reload: bool = None,
+                                            reload_mode: str = "full") -> str:
     """
     Install a QGIS plugin from a local directory.
 
@@ -355,13 +789,22 @@ def install_qgis_plugin_from_directory(ctx: Context, path: str) -> str:
 
     Args:
         path: Absolute path to the plugin directory (containing metadata.txt).
-    """
-    qgis = get_qgis_connection()
-    result = qgis.send_command("install_plugin", {"path": path})
-    return json.dumps(result, indent=2)
+        mode: "copy" replaces the installed plugin; "sync" only copies new and changed files and deletes
+            removed ones (fast for repeated installs); "symlink" links the plugins folder to the source directory.
+            sync and symlink report the added/changed/removed files.
+        reload: Force (true) or skip (false) the plugin reload. By default sync and symlink installs
+            only reload when files other than tests or docs changed.
+        reload_mode: "full" or "hot", see reload_qgis_plugin.
+    """
+    qgis = get_qgis_pool()
+    params = {"path": path, "mode": mode, "reload_mode": reload_mode}
+    if reload is not None:
+        params["reload"] = reload
+    result = await qgis.send_command("install_plugin", params)
+    return format_result(result)
 
 @mcp.tool()
-def reload_qgis_plugin(ctx: Context, plugin_name: str) -> str:
+async def reload_qgis_plugin(ctx: Context, plugin_name: str, mode: str = "full", keep_gui: bool = False) -> str:
     """
     Reload or Activate a QGIS plugin by name.
 
@@ -370,13 +813,18 @@ def reload_qgis_plugin(ctx: Context, plugin_name: str) -> str:
 
     Args:
         plugin_name: The folder name of the plugin (e.g. 'my_plugin').
+        mode: "full" unloads and reloads the whole plugin. "hot" only re-imports the modules whose files changed
+            (and the modules importing them) and reports the time taken per module.
+        keep_gui: In hot mode the plugin is unloaded and its GUI rebuilt after the modules are re-imported. If
+            true, the running instance and its GUI are kept and only switched to the reloaded class: signals
+            connected in initGui keep calling the old methods and open docks and dialogs keep their old classes.
     """
-    qgis = get_qgis_connection()
-    result = qgis.send_command("reload_plugin", {"name": plugin_name})
-    return json.dumps(result, indent=2)
+    qgis = get_qgis_pool()
+    result = await qgis.send_command("reload_plugin", {"name": plugin_name, "mode": mode, "keep_gui": keep_gui})
+    return format_result(result)
 
 @mcp.tool()
-def install_processing_script_from_file(ctx: Context, path: str) -> str:
+async def install_processing_script_from_file(ctx: Context, path: str) -> str:
     """
     Install a single Python Processing script.
 
@@ -385,19 +833,37 @@ def install_processing_script_from_file(ctx: Context, path: str) -> str:
     Args:
         path: Absolute path to the python script file.
     """
-    qgis = get_qgis_connection()
-    result = qgis.send_command("install_processing_script", {"path": path})
-    return json.dumps(result, indent=2)
+    qgis = get_qgis_pool()
+    result = await qgis.send_command("install_processing_script", {"path": path})
+    return format_result(result)
 
 @mcp.tool()
-def list_installed_processing_scripts(ctx: Context) -> str:
+async def list_installed_processing_scripts(ctx: Context) -> str:
     """
     List all user-installed Processing scripts.
     Returns a list of filenames found in the Processing scripts directory.
     """
-    qgis = get_qgis_connection()
-    result = qgis.send_command("list_processing_scripts")
-    return json.dumps(result, indent=2)
+    qgis = get_qgis_pool()
+    result = await qgis.send_command("list_processing_scripts")
+    return format_result(result)
+
+@mcp.tool()
+async def execute_command_batch(ctx: Context, commands: list, stop_on_error: bool = False) -> str:
+    """
+    Execute many plugin commands in a single round trip.
+
+    Use this for bulk operations such as adding many layers. Each command is an object with
+    the plugin command name and its parameters, e.g.
+    {"type": "add_vector_layer", "params": {"path": "/data/a.shp"}}.
+    Returns one result per command, in order.
+
+    Args:
+        commands: List of {"type": ..., "params": {...}} objects.
+        stop_on_error: Stop at the first failing command instead of running the rest.
+    """
+    qgis = get_qgis_pool()
+    result = await qgis.batch(commands, stop_on_error=stop_on_error)
+    return format_result(result)
 
 def main():
     """Run the MCP server"""
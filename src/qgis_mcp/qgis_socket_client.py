@@ -5,20 +5,60 @@ QGIS MCP Client - Simple client to connect to the QGIS MCP server
 
 import socket
 import json
+import base64
+import itertools
+import time
 import argparse
 import sys
 
-class QgisMCPClient:
-    def __init__(self, host='localhost', port=9876):
+from qgis_mcp_protocol import (FRAMING_JSON, FRAMING_LENGTH, FRAME_HEADER, COMPRESSED_FRAME, SUPPORTED_COMPRESSIONS,
+                               FramedConnection, read_handoff)
+
+def decode_columnar_features(page):
+    """Turn a columnar get_layer_features page into row dicts.
+
+    Geometry, when present, is returned as raw WKB bytes under "wkb".
+    """
+    columns = page.get("columns", {})
+    names = list(columns)
+    geometry = page.get("geometry")
+    rows = []
+    for position, feature_id in enumerate(page.get("ids", [])):
+        geom = None
+        if geometry and geometry["values"][position] is not None:
+            geom = {"wkb": base64.b64decode(geometry["values"][position])}
+        rows.append({
+            "id": feature_id,
+            "attributes": {name: columns[name][position] for name in names},
+            "geometry": geom
+        })
+    return rows
+
+def decode_image(result):
+    """Encoded image bytes of an in-memory render_map result"""
+    return base64.b64decode(result["data"])
+
+class QgisMCPClient(FramedConnection):
+    def __init__(self, host='localhost', port=9876, framing=FRAMING_LENGTH, compression=SUPPORTED_COMPRESSIONS,
+                 unix_socket=None, handoff=None):
+        super().__init__(framing, compression, unix_socket, handoff)
         self.host = host
         self.port = port
         self.socket = None
+        self._request_ids = itertools.count(1)
     
     def connect(self):
         """Connect to the QGIS MCP server"""
         try:
-            self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            self.socket.connect((self.host, self.port))
+            if self.unix_socket:
+                self.socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+                self.socket.connect(self.unix_socket)
+            else:
+                self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+                self.socket.connect((self.host, self.port))
+            self._reset_framing()
+            if self.requested_framing != FRAMING_JSON:
+                self._negotiate_framing()
             return True
         except Exception as e:
             print(f"Error connecting to server: {str(e)}")
@@ -30,6 +70,46 @@ class QgisMCPClient:
             self.socket.close()
             self.socket = None
     
+    def _negotiate_framing(self):
+        """Ask the plugin to switch this connection to the requested framing"""
+        self._send_message(self._handshake_command())
+        self._apply_handshake(self._receive_message())
+    
+    def _send_message(self, message):
+        """Serialize and send one message in the current framing"""
+        self.socket.sendall(self._encode_message(message))
+    
+    def _receive_message(self):
+        """Receive one message in the current framing"""
+        if self.framing == FRAMING_LENGTH:
+            (size,) = FRAME_HEADER.unpack(self._receive_exact(FRAME_HEADER.size))
+            return read_handoff(self._decode_frame(size, self._receive_exact(size & ~COMPRESSED_FRAME)))
+        
+        # Legacy mode: try to decode after every chunk
+        response_data = b''
+        while True:
+            chunk = self.socket.recv(4096)
+            if not chunk:
+                break
+            response_data += chunk
+            try:
+                return json.loads(response_data.decode('utf-8'))
+            except (json.JSONDecodeError, UnicodeDecodeError):
+                continue  # Keep receiving
+        raise ConnectionError("Connection closed by server")
+    
+    def _receive_exact(self, size):
+        """Read exactly size bytes into a preallocated buffer"""
+        data = bytearray(size)
+        view = memoryview(data)
+        received = 0
+        while received < size:
+            count = self.socket.recv_into(view[received:], size - received)
+            if not count:
+                raise ConnectionError("Connection closed by server")
+            received += count
+        return data
+    
     def send_command(self, command_type, params=None):
         """Send a command to the server and get the response"""
         if not self.socket:
@@ -38,31 +118,14 @@ class QgisMCPClient:
         
         # Create command
         command = {
+            "id": next(self._request_ids),
             "type": command_type,
             "params": params or {}
         }
         
         try:
-            # Send the command
-            self.socket.sendall(json.dumps(command).encode('utf-8'))
-            
-            # Receive the response
-            response_data = b''
-            while True:
-                chunk = self.socket.recv(4096)
-                if not chunk:
-                    break
-                response_data += chunk
-                
-                # Try to decode as JSON to see if it's complete
-                try:
-                    json.loads(response_data.decode('utf-8'))
-                    break  # Valid JSON, we have the full message
-                except json.JSONDecodeError:
-                    continue  # Keep receiving
-            
-            # Parse and return the response
-            return json.loads(response_data.decode('utf-8'))
+            self._send_message(command)
+            return self._receive_message()
             
         except Exception as e:
             print(f"Error sending command: {str(e)}")
@@ -80,9 +143,70 @@ class QgisMCPClient:
         """Get current project information"""
         return self.send_command("get_project_info")
     
-    def execute_code(self, code):
-        """Execute arbitrary PyQGIS code"""
-        return self.send_command("execute_code", {"code": code})
+    def execute_code(self, code, session=None, isolated=False, timeout=None):
+        """
+        Execute arbitrary PyQGIS code, optionally in a persistent named session.
+
+        With isolated=True the code runs in a plugin worker process and a job
+        is returned; use wait_for_job to get the outcome.
+        """
+        params = {"code": code}
+        if session:
+            params["session"] = session
+        if isolated:
+            params["isolated"] = True
+        if timeout:
+            params["timeout"] = timeout
+        return self.send_command("execute_code", params)
+    
+    def run_test(self, code=None, path=None, isolated=False, timeout=None, test_ids=None, shards=None, **options):
+        """
+        Run a unittest suite given as source code or a file path.
+
+        With shards=N the tests run in parallel in N worker processes and a
+        job is returned; use wait_for_job to get the merged report.
+        """
+        params = {}
+        if code:
+            params["code"] = code
+        if path:
+            params["path"] = path
+        if test_ids is not None:
+            params["test_ids"] = test_ids
+        if shards:
+            params["shards"] = shards
+        # slowest, trace_memory, junit_xml, json_report, changed_only, failed_first, source_dir
+        params.update(options)
+        if isolated:
+            params["isolated"] = True
+        if timeout:
+            params["timeout"] = timeout
+        return self.send_command("run_test", params)
+    
+    def list_tests(self, code=None, path=None):
+        """List the test ids of a unittest suite"""
+        params = {}
+        if code:
+            params["code"] = code
+        if path:
+            params["path"] = path
+        return self.send_command("list_tests", params)
+    
+    def worker_status(self):
+        """Describe the plugin's worker process pool"""
+        return self.send_command("worker_status")
+    
+    def list_sessions(self):
+        """List persistent execute_code sessions"""
+        return self.send_command("list_sessions")
+    
+    def reset_session(self, session):
+        """Clear the namespace of an execute_code session"""
+        return self.send_command("reset_session", {"session": session})
+    
+    def close_session(self, session):
+        """Drop an execute_code session"""
+        return self.send_command("close_session", {"session": session})
     
     def add_vector_layer(self, path, name=None, provider="ogr"):
         """Add a vector layer to the project"""
@@ -106,9 +230,21 @@ class QgisMCPClient:
             
         return self.send_command("add_raster_layer", params)
     
-    def get_layers(self):
+    def add_layers(self, layers, workers=None):
+        """
+        Add many layers in one command.
+
+        `layers` is a list of paths or dicts with `path` and optional
+        `name`, `type` ("vector"/"raster") and `provider`.
+        """
+        params = {"layers": layers}
+        if workers:
+            params["workers"] = workers
+        return self.send_command("add_layers", params)
+    
+    def get_layers(self, feature_counts=True):
         """Get all layers in the project"""
-        return self.send_command("get_layers")
+        return self.send_command("get_layers", {"feature_counts": feature_counts})
     
     def remove_layer(self, layer_id):
         """Remove a layer from the project"""
@@ -118,17 +254,72 @@ class QgisMCPClient:
         """Zoom to a layer's extent"""
         return self.send_command("zoom_to_layer", {"layer_id": layer_id})
     
-    def get_layer_features(self, layer_id, limit=10):
-        """Get features from a vector layer"""
-        return self.send_command("get_layer_features", {"layer_id": layer_id, "limit": limit})
+    def get_layer_features(self, layer_id, limit=10, **options):
+        """Get one page of features from a vector layer.
+
+        Options: offset, cursor, fields, with_geometry, expression, format
+        ("rows" or "columnar"; see decode_columnar_features).
+        """
+        return self.send_command("get_layer_features", dict(options, layer_id=layer_id, limit=limit))
+    
+    def iter_layer_features(self, layer_id, chunk_size=1000, **options):
+        """Yield every matching feature of a vector layer, streamed in chunks"""
+        params = dict(options, layer_id=layer_id, limit=options.get("limit", -1), chunk_size=chunk_size)
+        for response in self.stream_command("get_layer_features", params):
+            if response.get("status") == "error":
+                raise RuntimeError(response.get("message"))
+            if response.get("status") == "partial":
+                chunk = response["result"]
+                if "features" in chunk:
+                    yield from chunk["features"]
+                else:
+                    yield from decode_columnar_features(chunk)
     
-    def execute_processing(self, algorithm, parameters):
-        """Execute a processing algorithm"""
+    def execute_processing(self, algorithm, parameters, background=False):
+        """Execute a processing algorithm, optionally as a background job"""
         return self.send_command("execute_processing", {
             "algorithm": algorithm,
-            "parameters": parameters
+            "parameters": parameters,
+            "background": background
         })
     
+    def list_algorithms(self, query=None, provider=None, limit=50, offset=0):
+        """Search the Processing algorithms by keyword and/or provider"""
+        params = {"limit": limit, "offset": offset}
+        if query:
+            params["query"] = query
+        if provider:
+            params["provider"] = provider
+        return self.send_command("list_algorithms", params)
+    
+    def describe_algorithm(self, algorithm):
+        """Get the parameter and output definitions of a Processing algorithm"""
+        return self.send_command("describe_algorithm", {"algorithm": algorithm})
+    
+    def job_status(self, job_id):
+        """Get the status of a background job"""
+        return self.send_command("job_status", {"job_id": job_id})
+    
+    def job_result(self, job_id):
+        """Get the outcome of a finished background job"""
+        return self.send_command("job_result", {"job_id": job_id})
+    
+    def cancel_job(self, job_id):
+        """Cancel a running background job"""
+        return self.send_command("cancel_job", {"job_id": job_id})
+    
+    def wait_for_job(self, job_id, timeout=None, interval=0.2):
+        """Poll a background job until it finishes and return job_result"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            status = self.job_status(job_id)
+            if not status or status.get("status") != "success" or status["result"]["status"] != "running":
+                break
+            if deadline is not None and time.monotonic() > deadline:
+                return status
+            time.sleep(interval)
+        return self.job_result(job_id)
+    
     def save_project(self, path=None):
         """Save the current project"""
         params = {}
@@ -141,13 +332,83 @@ class QgisMCPClient:
         """Load a project"""
         return self.send_command("load_project", {"path": path})
     
-    def render_map(self, path, width=800, height=600):
-        """Render the current map view to an image"""
-        return self.send_command("render_map", {
-            "path": path,
-            "width": width,
-            "height": height
+    def render_map(self, path=None, width=800, height=600, background=False, **options):
+        """Render the current map view to an image, optionally as a background job.
+
+        Without a path the encoded image is returned base64-encoded in the
+        result's "data" (see decode_image). Options: format, quality, dpi, use_cache.
+        """
+        params = dict(options, width=width, height=height, background=background)
+        if path:
+            params["path"] = path
+        return self.send_command("render_map", params)
+    
+    def render_tiles(self, zoom, x_min, x_max, y_min, y_max, output_dir=None, metatile=4, background=False, **options):
+        """Render XYZ tiles for a tile range; returns base64 tiles if no output_dir is given"""
+        params = dict(options, zoom=zoom, x_min=x_min, x_max=x_max, y_min=y_min, y_max=y_max,
+                      output_dir=output_dir, metatile=metatile, background=background)
+        return self.send_command("render_tiles", params)
+    
+    def send_commands(self, commands):
+        """Send several commands without waiting for each response.
+
+        All requests are written before any response is read, so N commands
+        cost one round trip instead of N. `commands` is a list of
+        (command_type, params) tuples; responses are returned in the same order.
+        """
+        if not self.socket:
+            print("Not connected to server")
+            return None
+        
+        if self.framing != FRAMING_LENGTH:
+            # Unframed responses cannot be split reliably, so send them one at a time
+            return [self.send_command(command_type, params) for command_type, params in commands]
+        
+        requests = [
+            {"id": next(self._request_ids), "type": command_type, "params": params or {}}
+            for command_type, params in commands
+        ]
+        
+        try:
+            self.socket.sendall(b''.join(self._encode_message(request) for request in requests))
+            
+            # Match responses by id; plugins without request ids answer in order
+            responses = {}
+            for request in requests:
+                response = self._receive_message()
+                responses[response.get("id", request["id"])] = response
+            return [responses.get(request["id"]) for request in requests]
+            
+        except Exception as e:
+            print(f"Error sending commands: {str(e)}")
+            return None
+    
+    def stream_command(self, command_type, params=None):
+        """Send a command whose response is streamed and yield every response message.
+
+        The plugin answers with any number of "partial" messages followed by a
+        final "success" (or "error") message; each one is yielded as it arrives.
+        """
+        if not self.socket:
+            print("Not connected to server")
+            return
+        if self.framing != FRAMING_LENGTH:
+            raise ConnectionError("Streaming requires a framed connection")
+        
+        self._send_message({
+            "id": next(self._request_ids),
+            "type": command_type,
+            "params": dict(params or {}, stream=True)
         })
+        while True:
+            response = self._receive_message()
+            yield response
+            if response.get("status") != "partial":
+                return
+    
+    def batch(self, commands, stop_on_error=False):
+        """Execute a list of {"type", "params"} commands in a single request"""
+        return self.send_command("batch", {"commands": commands, "stop_on_error": stop_on_error})
 
 
 def print_json(data):
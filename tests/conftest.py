@@ -0,0 +1,230 @@
+"""
+Shared setup for the unit tests.
+
+The plugin imports the QGIS Python bindings at module level. When they are
+not available (i.e. outside of QGIS), minimal stand-ins are installed so the
+parts of the plugin that do not need QGIS can be tested with plain pytest.
+The fixtures at the end run the plugin's socket server on a fake event loop.
+"""
+
+import os
+import select
+import socket
+import sys
+import time
+import types
+from collections import deque
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [os.path.join(ROOT, "qgis_mcp_plugin"), os.path.join(ROOT, "src", "qgis_mcp")]
+
+
+def _stub_module(name, dummies=False):
+    module = types.ModuleType(name)
+    if dummies:
+        # Any name resolves to a distinct placeholder class, which is enough
+        # for base classes and class-level signal declarations
+        def placeholder(attribute):
+            if attribute.startswith("__"):
+                raise AttributeError(attribute)
+            return type(attribute, (), {"__init__": lambda self, *args, **kwargs: None})
+        module.__getattr__ = placeholder
+    sys.modules[name] = module
+    return module
+
+
+try:
+    import qgis.core  # noqa: F401
+except ImportError:
+    _stub_module("qgis")
+    _stub_module("qgis.core")
+    _stub_module("qgis.gui")
+    _stub_module("qgis.PyQt")
+    for _name in ("QtCore", "QtWidgets", "QtGui"):
+        _stub_module(f"qgis.PyQt.{_name}", dummies=True)
+    _stub_module("qgis.utils", dummies=True)
+
+
+class FakeSignal:
+    def __init__(self):
+        self.slots = []
+
+    def connect(self, slot):
+        self.slots.append(slot)
+
+    def emit(self, *args):
+        for slot in list(self.slots):
+            slot(*args)
+
+
+class FakeEventLoop:
+    """Runs QTimer.singleShot callbacks and QSocketNotifier slots with select(), like the QGIS event loop"""
+
+    def __init__(self):
+        self.timers = deque()
+        self.notifiers = []
+        loop = self
+
+        class SocketNotifier:
+            Read, Write = 0, 1
+
+            def __init__(self, fd, kind):
+                self.fd = fd
+                self.kind = kind
+                self.enabled = True
+                self.activated = FakeSignal()
+                loop.notifiers.append(self)
+
+            def setEnabled(self, enabled):
+                self.enabled = enabled
+
+            def isEnabled(self):
+                return self.enabled
+
+        self.SocketNotifier = SocketNotifier
+
+    def single_shot(self, msec, callback):
+        self.timers.append(callback)
+
+    def run_once(self, timeout=0.01):
+        # Timers queued by these callbacks wait for the next iteration, as in Qt
+        for _ in range(len(self.timers)):
+            self.timers.popleft()()
+        self.notifiers = [n for n in self.notifiers if n.enabled or n.activated.slots]
+        watched = [n for n in self.notifiers if n.enabled]
+        readers = {n.fd for n in watched if n.kind == self.SocketNotifier.Read}
+        writers = {n.fd for n in watched if n.kind == self.SocketNotifier.Write}
+        if not readers and not writers:
+            return
+        readable, writable, _ = select.select(readers, writers, [], 0 if self.timers else timeout)
+        for notifier in watched:
+            ready = readable if notifier.kind == self.SocketNotifier.Read else writable
+            if notifier.enabled and notifier.fd in ready:
+                notifier.activated.emit(notifier.fd)
+
+    def run_until(self, condition, timeout=5):
+        deadline = time.monotonic() + timeout
+        while not condition():
+            if time.monotonic() > deadline:
+                raise TimeoutError("Condition not met")
+            self.run_once()
+
+
+class TestClient:
+    """Non-blocking client socket whose responses are read while the fake event loop runs"""
+    __test__ = False
+
+    def __init__(self, plugin, loop, sock):
+        self.plugin = plugin
+        self.loop = loop
+        self.socket = sock
+        self.socket.setblocking(False)
+        self.decoder = plugin.MessageDecoder()
+        self.compression = None
+        self.responses = []
+        self.eof = False
+
+    def send(self, message):
+        self.send_raw(self.plugin.encode_message(message, self.decoder.framing, self.compression))
+
+    def send_raw(self, data):
+        self.socket.setblocking(True)
+        self.socket.sendall(data)
+        self.socket.setblocking(False)
+
+    def poll(self):
+        while not self.eof:
+            try:
+                data = self.socket.recv(65536)
+            except BlockingIOError:
+                break
+            if not data:
+                self.eof = True
+                break
+            self.decoder.feed(data)
+        while True:
+            message = self.decoder.next_message()
+            if message is None:
+                break
+            self.responses.append(message)
+
+    def receive(self, count=1):
+        """Run the event loop until `count` responses arrived and return them"""
+        def arrived():
+            self.poll()
+            return len(self.responses) >= count
+        self.loop.run_until(arrived)
+        received, self.responses = self.responses[:count], self.responses[count:]
+        return received[0] if count == 1 else received
+
+    def request(self, message):
+        self.send(message)
+        return self.receive()
+
+    def handshake(self, **params):
+        response = self.request({"type": "handshake", "params": params})
+        if response["status"] == "success":
+            self.decoder.set_framing(response["result"]["framing"])
+            self.decoder.compression = response["result"]["compression"]
+            self.compression = response["result"]["compression"]
+        return response
+
+    def wait_closed(self):
+        def closed():
+            self.poll()
+            return self.eof
+        self.loop.run_until(closed)
+
+    def close(self):
+        self.socket.close()
+
+
+@pytest.fixture
+def qt_loop(monkeypatch):
+    """Fake Qt event loop driving the plugin's timers and socket notifiers"""
+    import qgis_mcp_plugin as plugin
+    loop = FakeEventLoop()
+    monkeypatch.setattr(plugin, "QTimer", types.SimpleNamespace(singleShot=loop.single_shot))
+    monkeypatch.setattr(plugin, "QSocketNotifier", loop.SocketNotifier)
+    monkeypatch.setattr(plugin, "QgsMessageLog", types.SimpleNamespace(logMessage=lambda *args: None), raising=False)
+    monkeypatch.setattr(plugin, "Qgis", types.SimpleNamespace(Info=0, Warning=1, Critical=2), raising=False)
+    return loop
+
+
+@pytest.fixture
+def mcp_server(qt_loop, monkeypatch, tmp_path):
+    """A started QgisMCPServer on a free loopback port and a Unix socket, without project tracking"""
+    import qgis_mcp_plugin as plugin
+    server = plugin.QgisMCPServer(host="127.0.0.1", port=0, worker_count=0)
+    if hasattr(socket, "AF_UNIX"):
+        server.unix_socket = str(tmp_path / "qgis_mcp.sock")
+    monkeypatch.setattr(server, "watch_project", lambda: None)
+    monkeypatch.setattr(server, "unwatch_project", lambda: None)
+    assert server.start()
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def connect(mcp_server, qt_loop):
+    """Factory of clients connected to mcp_server, over TCP or (unix=True) its Unix socket"""
+    import qgis_mcp_plugin as plugin
+    clients = []
+
+    def connect(unix=False):
+        if unix:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.connect(mcp_server.unix_socket)
+        else:
+            sock = socket.create_connection(mcp_server.socket.getsockname())
+        client = TestClient(plugin, qt_loop, sock)
+        clients.append(client)
+        opened = len(mcp_server.connections) + 1
+        qt_loop.run_until(lambda: len(mcp_server.connections) >= opened)
+        return client
+
+    yield connect
+    for client in clients:
+        client.close()
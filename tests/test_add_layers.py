@@ -0,0 +1,70 @@
+import types
+
+import pytest
+
+import qgis_mcp_plugin as plugin
+
+
+class Layer:
+    def __init__(self, path, name, provider):
+        if "crash" in path:
+            raise RuntimeError("provider crashed")
+        self.path = path
+        self._name = name
+
+    def isValid(self):
+        return "missing" not in self.path
+
+    def featureCount(self):
+        return 3
+
+    def moveToThread(self, thread):
+        pass
+
+    def id(self):
+        return f"id_{self._name}"
+
+    def name(self):
+        return self._name
+
+    def width(self):
+        return 10
+
+    def height(self):
+        return 20
+
+
+@pytest.fixture
+def server(monkeypatch):
+    added = []
+    project = types.SimpleNamespace(addMapLayers=added.extend)
+    monkeypatch.setattr(plugin, "QgsProject", types.SimpleNamespace(instance=lambda: project), raising=False)
+    monkeypatch.setattr(plugin, "QgsVectorLayer", Layer, raising=False)
+    monkeypatch.setattr(plugin, "QgsRasterLayer", Layer, raising=False)
+    app = types.SimpleNamespace(thread=lambda: None)
+    monkeypatch.setattr(plugin, "QCoreApplication", types.SimpleNamespace(instance=lambda: app))
+    server = plugin.QgisMCPServer.__new__(plugin.QgisMCPServer)
+    server._get_layer_type = lambda layer: "vector"
+    server.added = added
+    return server
+
+
+def test_bad_entries_are_reported_per_entry(server):
+    result = server.add_layers([
+        "roads.shp",
+        {"path": "dem.tif", "type": "mesh"},
+        {"name": "no path"},
+        "missing.gpkg",
+        {"path": "crash.shp"},
+        {"path": "crash.csv", "provider": "delimitedtext"},
+        {"path": "dem.tif"},
+    ])
+    assert (result["added"], result["failed"]) == (2, 5)
+    statuses = [(entry["path"], entry["status"]) for entry in result["results"]]
+    assert statuses == [
+        ("roads.shp", "success"), ("dem.tif", "error"), (None, "error"), ("missing.gpkg", "error"),
+        ("crash.shp", "error"), ("crash.csv", "error"), ("dem.tif", "success"),
+    ]
+    assert "mesh" in result["results"][1]["message"]
+    assert "provider crashed" in result["results"][4]["message"]
+    assert [layer.name() for layer in server.added] == ["roads.shp", "dem.tif"]
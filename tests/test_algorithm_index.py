@@ -0,0 +1,93 @@
+import types
+
+import qgis_mcp_plugin as plugin
+
+
+class Parameter:
+    def __init__(self, name):
+        self._name = name
+
+    def name(self):
+        return self._name
+
+    def type(self):
+        return "string"
+
+    def description(self):
+        return self._name.title()
+
+    def flags(self):
+        return 0
+
+    def isDestination(self):
+        return False
+
+    def defaultValue(self):
+        return None
+
+
+class Algorithm:
+    def __init__(self, algorithm_id, provider, parameters):
+        self._id = algorithm_id
+        self._provider = provider
+        self.parameters = parameters
+
+    def id(self):
+        return self._id
+
+    def displayName(self):
+        return self._id.split(":")[-1]
+
+    def provider(self):
+        return self._provider
+
+    def group(self):
+        return "Scripts"
+
+    def tags(self):
+        return []
+
+    def shortHelpString(self):
+        return ""
+
+    def shortDescription(self):
+        return ""
+
+    def parameterDefinitions(self):
+        return [Parameter(name) for name in self.parameters]
+
+    def outputDefinitions(self):
+        return []
+
+
+class Provider:
+    def __init__(self, provider_id):
+        self._id = provider_id
+        self.algs = {}
+
+    def id(self):
+        return self._id
+
+    def name(self):
+        return self._id.title()
+
+    def algorithms(self):
+        return list(self.algs.values())
+
+
+def test_invalidate_drops_descriptions_of_unlisted_providers(monkeypatch):
+    provider = Provider("script")
+    provider.algs["script:foo"] = Algorithm("script:foo", provider, ["A"])
+    registry = types.SimpleNamespace(algorithmById=lambda algorithm_id: provider.algs.get(algorithm_id),
+                                     providers=lambda: [provider])
+    monkeypatch.setattr(plugin, "QgsApplication", types.SimpleNamespace(processingRegistry=lambda: registry),
+                        raising=False)
+    monkeypatch.setattr(plugin, "QgsProcessingParameterDefinition",
+                        types.SimpleNamespace(FlagOptional=1, FlagAdvanced=2), raising=False)
+    index = plugin.AlgorithmIndex(lambda value: value)
+
+    assert index.validate("script:foo", {"A": 1}) == []
+    # The script is edited to take a second parameter and installed again
+    provider.algs["script:foo"] = Algorithm("script:foo", provider, ["A", "B"])
+    index.invalidate("script")
+    assert index.validate("script:foo", {"A": 1}) == ["Missing required parameter B (string: B)"]
@@ -0,0 +1,55 @@
+import qgis_mcp_plugin as plugin
+
+
+def test_render_cache_evicts_least_recently_used():
+    cache = plugin.RenderCache(max_bytes=10)
+    cache.put("a", b"1234", ["layer1"])
+    cache.put("b", b"1234", ["layer2"])
+    assert cache.get("a") == b"1234"  # "b" is now the oldest
+    cache.put("c", b"1234", ["layer1"])
+    assert cache.get("b") is None
+    assert list(cache.entries) == ["a", "c"]
+    assert cache.size == 8
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+
+def test_render_cache_skips_oversized_images_and_replaces_keys():
+    cache = plugin.RenderCache(max_bytes=4)
+    cache.put("big", b"12345", [])
+    assert cache.get("big") is None
+    cache.put("a", b"12", [])
+    cache.put("a", b"123", [])
+    assert cache.size == 3 and cache.get("a") == b"123"
+
+
+def test_render_cache_invalidates_by_layer():
+    cache = plugin.RenderCache()
+    cache.put("a", b"1", ["layer1", "layer2"])
+    cache.put("b", b"2", ["layer2"])
+    cache.put("c", b"3", ["layer3"])
+    cache.invalidate_layer("layer2")
+    assert list(cache.entries) == ["c"]
+    assert cache.size == 1
+    cache.clear()
+    assert cache.size == 0 and not cache.entries
+
+
+def test_code_cache_reuses_compiled_code():
+    cache = plugin.CodeCache(max_entries=2)
+    code = cache.compile("x = 1")
+    assert cache.compile("x = 1") is code
+    namespace = {}
+    exec(code, namespace)
+    assert namespace["x"] == 1
+    assert cache.stats() == {"entries": 1, "max_entries": 2, "hits": 1, "misses": 1}
+
+
+def test_code_cache_is_bounded():
+    cache = plugin.CodeCache(max_entries=2)
+    first = cache.compile("a = 1")
+    cache.compile("b = 2")
+    cache.compile("a = 1")  # most recently used
+    cache.compile("c = 3")
+    assert len(cache.entries) == 2
+    assert cache.compile("a = 1") is first
+    assert cache.stats()["misses"] == 3
@@ -0,0 +1,138 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("mcp")
+
+import qgis_mcp_plugin as plugin
+import qgis_mcp_server as server
+
+
+class FakePlugin:
+    """Minimal stand-in for the plugin's socket server: handshake plus echo"""
+
+    def __init__(self):
+        self.connections = 0
+        self.commands = []
+        self.writers = []
+        self.fail_next = 0  # drop the connection instead of answering this many commands
+
+    async def handle(self, reader, writer):
+        self.connections += 1
+        self.writers.append(writer)
+        decoder = plugin.MessageDecoder()
+        compression = None
+        try:
+            while data := await reader.read(65536):
+                decoder.feed(data)
+                while (message := decoder.next_message()) is not None:
+                    if message["type"] == "handshake":
+                        params = message["params"]
+                        compression = params["compression"][0] if params.get("compression") else None
+                        result = {"framing": params["framing"], "compression": compression}
+                        writer.write(plugin.encode_message({"status": "success", "result": result}))
+                        decoder.set_framing(params["framing"])
+                        decoder.compression = compression
+                        continue
+                    self.commands.append(message["type"])
+                    if self.fail_next:
+                        self.fail_next -= 1
+                        writer.close()
+                        return
+                    if message["type"] == "sleep":
+                        await asyncio.sleep(message["params"]["seconds"])
+                    response = {"id": message["id"], "status": "success", "result": message["params"]}
+                    writer.write(plugin.encode_message(response, decoder.framing, compression))
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+
+@pytest.fixture
+def run():
+    def run(test):
+        async def main():
+            fake = FakePlugin()
+            listener = await asyncio.start_server(fake.handle, "127.0.0.1", 0)
+            port = listener.sockets[0].getsockname()[1]
+            pool = server.QgisConnectionPool("127.0.0.1", port, size=2)
+            try:
+                return await test(pool, fake)
+            finally:
+                await pool.close()
+                listener.close()
+                for writer in fake.writers:
+                    writer.close()
+        return asyncio.run(main())
+    return run
+
+
+def test_pool_reuses_idle_connection(run):
+    async def test(pool, fake):
+        assert (await pool.send_command("ping", {"n": 1}))["result"] == {"n": 1}
+        assert (await pool.send_command("ping", {"n": 2}))["result"] == {"n": 2}
+        assert fake.connections == 1
+        assert len(pool.idle) == 1
+    run(test)
+
+
+def test_pool_bounds_concurrent_connections(run):
+    async def test(pool, fake):
+        responses = await asyncio.gather(*(pool.send_command("sleep", {"seconds": 0.05, "n": n}) for n in range(5)))
+        assert [response["result"]["n"] for response in responses] == list(range(5))
+        assert fake.connections == 2
+    run(test)
+
+
+def test_pool_round_trips_compressed_frames(run):
+    async def test(pool, fake):
+        rows = [{"name": "feature", "value": n} for n in range(5000)]
+        response = await pool.send_command("ping", {"rows": rows})
+        assert response["result"]["rows"] == rows
+        assert pool.idle[0].compression == server.SUPPORTED_COMPRESSIONS[0]
+    run(test)
+
+
+def test_pool_retries_read_only_commands_on_a_new_connection(run, monkeypatch):
+    monkeypatch.setattr(server, "RETRY_DELAY", 0)
+    async def test(pool, fake):
+        fake.fail_next = 1
+        assert (await pool.send_command("get_layers", {"n": 1}))["result"] == {"n": 1}
+        assert fake.commands == ["get_layers", "get_layers"]
+        assert fake.connections == 2
+    run(test)
+
+
+def test_pool_does_not_retry_other_commands(run, monkeypatch):
+    monkeypatch.setattr(server, "RETRY_DELAY", 0)
+    async def test(pool, fake):
+        fake.fail_next = 1
+        with pytest.raises(ConnectionError):
+            await pool.send_command("execute_code", {"code": "x = 1"})
+        assert fake.commands == ["execute_code"]
+        assert not pool.idle
+    run(test)
+
+
+def test_pool_drops_connections_closed_by_plugin(run):
+    async def test(pool, fake):
+        await pool.send_command("ping")
+        fake.writers[0].close()
+        await asyncio.sleep(0.05)
+        await pool.send_command("ping")
+        assert fake.connections == 2
+    run(test)
+
+
+def test_pool_reports_unreachable_plugin(monkeypatch):
+    monkeypatch.setattr(server, "RETRY_DELAY", 0)
+    async def test():
+        listener = await asyncio.start_server(lambda reader, writer: None, "127.0.0.1", 0)
+        port = listener.sockets[0].getsockname()[1]
+        listener.close()
+        await listener.wait_closed()
+        with pytest.raises(Exception, match="Could not connect to Qgis"):
+            await server.QgisConnectionPool("127.0.0.1", port).send_command("ping")
+    asyncio.run(test())
@@ -0,0 +1,93 @@
+"""Tests of the plugin's command dispatcher"""
+
+import qgis_mcp_plugin as plugin
+
+
+def test_failing_command_does_not_stall_other_clients(connect, mcp_server, monkeypatch):
+    a = connect()
+    b = connect()
+    encode_response = mcp_server.encode_response
+    failures = []
+
+    def fail_once(conn, response):
+        if not failures:
+            failures.append(response)
+            raise ValueError("cannot encode")
+        return encode_response(conn, response)
+    monkeypatch.setattr(mcp_server, "encode_response", fail_once)
+    a.send({"type": "ping", "id": 1})
+    b.send({"type": "ping", "id": 2})
+    response = a.receive()
+    assert response == {"status": "error", "message": "Internal error: cannot encode", "id": 1}
+    assert b.receive() == {"status": "success", "result": {"pong": True}, "id": 2}
+    assert a.request({"type": "ping", "id": 3})["id"] == 3
+    assert not mcp_server.ready
+
+
+def test_dispatch_reschedules_after_an_exception(connect, mcp_server, qt_loop, monkeypatch):
+    a = connect()
+    b = connect()
+    calls = []
+
+    def handle_message(conn, command):
+        calls.append(command["type"])
+        if command["type"] == "explode":
+            raise RuntimeError("boom")
+        mcp_server.send_to_connection(conn, plugin.encode_message({"status": "success", "result": command["type"]}))
+    monkeypatch.setattr(mcp_server, "handle_message", handle_message)
+    monkeypatch.setattr(mcp_server, "send_dispatch_error", lambda conn, command, error: calls.append("error"))
+    a.send({"type": "explode"})
+    b.send({"type": "ping"})
+    assert b.receive()["result"] == "ping"
+    assert calls[-1] == "ping"
+    assert "error" in calls
+
+
+def test_failing_stream_is_ended_with_an_error(connect, mcp_server, monkeypatch):
+    client = connect()
+    client.handshake(framing=plugin.FRAMING_LENGTH, compression=[])
+
+    def chunks():
+        yield 1
+        yield 2
+    monkeypatch.setattr(mcp_server, "ping", lambda: plugin.StreamingResult(chunks()))
+    original = mcp_server.send_stream_chunk
+
+    def send_stream_chunk(conn):
+        if conn.stream and conn.stream[0] == 7:
+            raise OSError("disk full")
+        original(conn)
+    monkeypatch.setattr(mcp_server, "send_stream_chunk", send_stream_chunk)
+    response = client.request({"type": "ping", "id": 7})
+    assert response == {"status": "error", "message": "Internal error: disk full", "id": 7}
+    monkeypatch.setattr(mcp_server, "send_stream_chunk", original)
+    assert client.request({"type": "ping", "id": 8}) == {"status": "partial", "result": 1, "id": 8}
+
+
+def test_connections_take_turns(connect, mcp_server, monkeypatch):
+    a = connect()
+    b = connect()
+    order = []
+    handle_message = mcp_server.handle_message
+
+    def record(conn, command):
+        order.append(command["client"])
+        handle_message(conn, command)
+    monkeypatch.setattr(mcp_server, "handle_message", record)
+    a.send_raw(b"".join(plugin.encode_message({"type": "ping", "client": "a"}) for _ in range(3)))
+    b.send_raw(b"".join(plugin.encode_message({"type": "ping", "client": "b"}) for _ in range(3)))
+    a.receive(3)
+    b.receive(3)
+    assert order == ["a", "b"] * 3
+
+
+def test_queue_depth_pushes_back_on_the_client(connect, mcp_server, qt_loop):
+    mcp_server.max_queue_depth = 2
+    client = connect()
+    (conn,) = mcp_server.connections.values()
+    client.send_raw(b"".join(plugin.encode_message({"type": "ping", "id": i}) for i in range(10)))
+    qt_loop.run_until(lambda: conn.pending)
+    assert len(conn.pending) == 2
+    assert not conn.read_notifier.isEnabled()
+    assert [response["id"] for response in client.receive(10)] == list(range(10))
+    assert conn.read_notifier.isEnabled()
@@ -0,0 +1,109 @@
+import types
+
+import pytest
+
+import qgis_mcp_plugin as plugin
+
+
+class FeatureRequest:
+    NoGeometry = 1
+
+    def __init__(self):
+        self.order_by = []
+        self.limit = None
+        self.expression = None
+
+    def setFilterExpression(self, expression):
+        self.expression = expression
+
+    def filterExpression(self):
+        return types.SimpleNamespace(hasParserError=lambda: False)
+
+    def addOrderBy(self, expression):
+        self.order_by.append(expression)
+
+    def setSubsetOfAttributes(self, indices):
+        pass
+
+    def setFlags(self, flags):
+        pass
+
+    def setLimit(self, limit):
+        self.limit = limit
+
+
+class Feature:
+    def __init__(self, feature_id):
+        self._id = feature_id
+
+    def id(self):
+        return self._id
+
+    def attributes(self):
+        return [self._id * 10]
+
+    def hasGeometry(self):
+        return False
+
+
+class Layer:
+    def __init__(self, provider):
+        self.provider = provider
+        self.requests = []
+
+    def type(self):
+        return "vector"
+
+    def providerType(self):
+        return self.provider
+
+    def fields(self):
+        return Fields()
+
+    def featureCount(self):
+        return 5
+
+    def getFeatures(self, request):
+        self.requests.append(request)
+        ids = range(1, 6)
+        if request.expression:
+            ids = [i for i in ids if i > int(request.expression.rsplit(">", 1)[1])]
+        features = [Feature(i) for i in ids]
+        return iter(features[:request.limit] if request.limit is not None else features)
+
+
+class Fields:
+    def indexOf(self, name):
+        return 0 if name == "value" else -1
+
+    def __iter__(self):
+        return iter([types.SimpleNamespace(name=lambda: "value")])
+
+
+@pytest.fixture
+def server(monkeypatch):
+    monkeypatch.setattr(plugin, "QgsFeatureRequest", FeatureRequest, raising=False)
+    monkeypatch.setattr(plugin, "QgsMapLayer", types.SimpleNamespace(VectorLayer="vector"), raising=False)
+    server = plugin.QgisMCPServer.__new__(plugin.QgisMCPServer)
+    server.layers = {}
+    project = types.SimpleNamespace(mapLayer=lambda layer_id: server.layers.get(layer_id))
+    monkeypatch.setattr(plugin, "QgsProject", types.SimpleNamespace(instance=lambda: project), raising=False)
+    return server
+
+
+@pytest.mark.parametrize("provider, ordered", [("memory", False), ("ogr", True), ("postgres", True)])
+def test_pages_are_ordered_only_when_the_provider_needs_it(server, provider, ordered):
+    layer = server.layers["layer"] = Layer(provider)
+    page = server.get_layer_features("layer", limit=2)
+    assert [feature["id"] for feature in page["features"]] == [1, 2]
+    page = server.get_layer_features("layer", limit=2, cursor=page["next_cursor"])
+    assert [feature["id"] for feature in page["features"]] == [3, 4]
+    assert all(request.order_by == (["$id"] if ordered else []) for request in layer.requests)
+
+
+def test_full_stream_is_never_ordered(server):
+    layer = server.layers["layer"] = Layer("postgres")
+    result = server.get_layer_features("layer", limit=None, stream=True, chunk_size=2)
+    chunks = list(result.chunks)
+    assert chunks
+    assert layer.requests[0].order_by == []
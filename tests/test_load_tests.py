@@ -0,0 +1,57 @@
+import sys
+import types
+
+import pytest
+
+import qgis_mcp_plugin as plugin
+
+
+@pytest.fixture
+def server():
+    # _load_tests does not need the sockets, timers and workers set up by __init__
+    return plugin.QgisMCPServer.__new__(plugin.QgisMCPServer)
+
+
+@pytest.fixture
+def fake_modules(monkeypatch):
+    def add(name, path):
+        monkeypatch.setitem(sys.modules, name, types.ModuleType(name))
+        sys.modules[name].__file__ = str(path)
+    return add
+
+
+def write_test(path):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text("import unittest\n\nclass T(unittest.TestCase):\n    def test_ok(self):\n        pass\n")
+    return path
+
+
+def test_tests_outside_a_plugin_keep_loaded_modules(server, fake_modules, tmp_path):
+    test = write_test(tmp_path / "scripts" / "test_script.py")
+    fake_modules("shared_helper", tmp_path / "scripts" / "shared_helper.py")
+    suite = server._load_tests(path=str(test))
+    assert suite.countTestCases() == 1
+    assert "shared_helper" in sys.modules
+
+
+def test_plugin_and_test_modules_are_reimported(server, fake_modules, tmp_path):
+    plugin_dir = tmp_path / "my_plugin"
+    plugin_dir.mkdir()
+    (plugin_dir / "metadata.txt").write_text("[general]\nname=My plugin\n")
+    test = write_test(plugin_dir / "tests" / "test_core.py")
+    fake_modules("my_plugin_core", plugin_dir / "core.py")
+    fake_modules("stale_test_core", plugin_dir / "tests" / "test_core.py")
+    fake_modules("unrelated", tmp_path / "unrelated.py")
+    server._load_tests(path=str(test))
+    assert "my_plugin_core" not in sys.modules
+    assert "stale_test_core" not in sys.modules
+    assert "unrelated" in sys.modules
+
+
+def test_explicit_source_dir_limits_reimported_modules(server, fake_modules, tmp_path):
+    test = write_test(tmp_path / "tests" / "test_lib.py")
+    fake_modules("lib_module", tmp_path / "lib" / "module.py")
+    fake_modules("tests_helper", tmp_path / "tests" / "helper.py")
+    server._load_tests(path=str(test), source_dir=str(tmp_path / "lib"))
+    assert "lib_module" not in sys.modules
+    assert "tests_helper" in sys.modules
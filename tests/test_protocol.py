@@ -0,0 +1,130 @@
+import json
+
+import pytest
+
+import qgis_mcp_plugin as plugin
+import qgis_mcp_protocol as protocol
+
+
+def large_message():
+    return {"id": 1, "status": "success", "result": {"rows": [{"name": "feature", "value": i} for i in range(5000)]}}
+
+
+@pytest.mark.parametrize("framing", plugin.SUPPORTED_FRAMINGS)
+def test_decoder_reassembles_messages_split_across_chunks(framing):
+    messages = [{"type": "ping", "params": {}}, {"type": "get_layers", "params": {"text": "é" * 10}}]
+    data = b"".join(plugin.encode_message(message, framing) for message in messages)
+    if framing == plugin.FRAMING_JSON:
+        # Unframed documents are only told apart by parsing, so one at a time
+        data = plugin.encode_message(messages[0], framing)
+        messages = messages[:1]
+    decoder = plugin.MessageDecoder(framing)
+    received = []
+    for i in range(len(data)):
+        decoder.feed(data[i:i + 1])
+        while (message := decoder.next_message()) is not None:
+            received.append(message)
+    assert received == messages
+    assert not decoder.buffer
+
+
+def test_decoder_keeps_buffered_bytes_when_switching_framing():
+    decoder = plugin.MessageDecoder()
+    decoder.feed(plugin.encode_message({"type": "handshake"}) + plugin.encode_message({"type": "ping"}, "ndjson"))
+    assert decoder.next_message() == {"type": "handshake"}
+    decoder.set_framing(plugin.FRAMING_NDJSON)
+    assert decoder.next_message() == {"type": "ping"}
+
+
+def test_decoder_skips_blank_lines():
+    decoder = plugin.MessageDecoder(plugin.FRAMING_NDJSON)
+    decoder.feed(b'\n  \n{"a":1}\n')
+    assert decoder.next_message() == {"a": 1}
+    assert decoder.next_message() is None
+
+
+def test_decoder_rejects_oversized_frames():
+    decoder = plugin.MessageDecoder(plugin.FRAMING_LENGTH)
+    decoder.feed(plugin.FRAME_HEADER.pack(plugin.MAX_FRAME_SIZE + 1))
+    with pytest.raises(ValueError):
+        decoder.next_message()
+
+
+def test_decoder_rejects_compressed_frame_without_codec():
+    payload = plugin.encode_message(large_message(), plugin.FRAMING_LENGTH, "zlib")
+    decoder = plugin.MessageDecoder(plugin.FRAMING_LENGTH)
+    decoder.feed(payload)
+    with pytest.raises(ValueError):
+        decoder.next_message()
+
+
+@pytest.mark.parametrize("compression", plugin.SUPPORTED_COMPRESSIONS)
+def test_frame_payload_compresses_above_threshold(compression):
+    message = large_message()
+    payload = json.dumps(message, separators=(',', ':')).encode('utf-8')
+    framed = plugin.frame_payload(payload, plugin.FRAMING_LENGTH, compression)
+    (size,) = plugin.FRAME_HEADER.unpack_from(framed)
+    assert size & plugin.COMPRESSED_FRAME
+    assert len(framed) < len(payload)
+    decoder = plugin.MessageDecoder(plugin.FRAMING_LENGTH)
+    decoder.compression = compression
+    decoder.feed(framed)
+    assert decoder.next_message() == message
+
+
+def test_frame_payload_leaves_small_or_incompressible_payloads():
+    small = plugin.frame_payload(b'{"a":1}', plugin.FRAMING_LENGTH, "zlib")
+    assert small == plugin.FRAME_HEADER.pack(7) + b'{"a":1}'
+    random_bytes = json.dumps({"data": __import__("os").urandom(40000).hex()}).encode()
+    framed = plugin.frame_payload(random_bytes, plugin.FRAMING_LENGTH, "zlib", threshold=len(random_bytes) + 1)
+    assert not plugin.FRAME_HEADER.unpack_from(framed)[0] & plugin.COMPRESSED_FRAME
+    assert plugin.frame_payload(b'{}', plugin.FRAMING_NDJSON) == b'{}\n'
+
+
+@pytest.mark.parametrize("compression", protocol.SUPPORTED_COMPRESSIONS)
+def test_client_and_plugin_frames_are_interchangeable(compression):
+    message = large_message()
+    connection = protocol.FramedConnection()
+    connection._apply_handshake({"status": "success", "result": {"framing": "length", "compression": compression}})
+    framed = connection._encode_message(message)
+    decoder = plugin.MessageDecoder(plugin.FRAMING_LENGTH)
+    decoder.compression = compression
+    decoder.feed(framed)
+    assert decoder.next_message() == message
+
+    framed = plugin.encode_message(message, plugin.FRAMING_LENGTH, compression)
+    (size,) = protocol.FRAME_HEADER.unpack_from(framed)
+    assert connection._decode_frame(size, framed[protocol.FRAME_HEADER.size:]) == message
+
+
+def test_handshake_falls_back_to_legacy_framing():
+    connection = protocol.FramedConnection(compression=("zlib",), handoff=True)
+    assert connection._handshake_command() == {
+        "type": "handshake", "params": {"framing": "length", "compression": ["zlib"], "handoff": True}
+    }
+    connection._apply_handshake({"status": "error", "message": "Unknown command type: handshake"})
+    assert (connection.framing, connection.compression, connection.handoff) == (protocol.FRAMING_JSON, None, False)
+
+
+def test_read_handoff_loads_and_removes_file(tmp_path):
+    path = tmp_path / "response.json"
+    path.write_text(json.dumps({"status": "success", "result": 42}))
+    assert protocol.read_handoff({"handoff": {"path": str(path)}}) == {"status": "success", "result": 42}
+    assert not path.exists()
+    assert protocol.read_handoff({"status": "success"}) == {"status": "success"}
+
+
+@pytest.mark.parametrize("handshake, error", [
+    ({"type": "handshake", "params": {"framing": "length", "compress_threshold": "x"}}, "compress_threshold"),
+    ({"type": "handshake", "params": {"framing": "length", "compression": 5}}, "compression"),
+    ({"type": "handshake", "params": ["length"]}, "params"),
+])
+def test_invalid_handshake_is_answered_and_keeps_framing(connect, handshake, error):
+    client = connect()
+    # The command after the handshake is already sent, as by a pipelining client
+    client.send_raw(plugin.encode_message(dict(handshake, id=1)) + plugin.encode_message({"type": "ping", "id": 2}))
+    response, pong = client.receive(2)
+    assert response["status"] == "error"
+    assert error in response["message"] and "Internal error" not in response["message"]
+    assert response["id"] == 1
+    assert pong == {"status": "success", "result": {"pong": True}, "id": 2}
@@ -0,0 +1,105 @@
+import os
+import xml.etree.ElementTree as ET
+
+import qgis_mcp_plugin as plugin
+
+
+def test_balance_shards_spreads_durations():
+    durations = {"t1": 10.0, "t2": 1.0, "t3": 1.0, "t4": 8.0, "t5": 2.0}
+    shards = plugin.balance_shards(list(durations), durations, 2)
+    assert sorted(sum(durations[test_id] for test_id in shard) for shard in shards) == [11.0, 11.0]
+    # Original order is kept within each shard
+    assert all(shard == sorted(shard, key=list(durations).index) for shard in shards)
+
+
+def test_balance_shards_uses_average_for_unknown_tests():
+    # c and d count as 2.0 each, the average of the recorded durations
+    shards = plugin.balance_shards(["a", "b", "c", "d"], {"a": 3.0, "b": 1.0}, 2)
+    assert shards == [["a", "b"], ["c", "d"]]
+
+
+def test_balance_shards_never_returns_empty_shards():
+    assert plugin.balance_shards(["a", "b"], {}, 8) == [["a"], ["b"]]
+    assert plugin.balance_shards([], {}, 4) == []
+
+
+def write(path, text=""):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        f.write(text)
+
+
+def test_imported_files_resolves_absolute_and_relative_imports(tmp_path):
+    root = str(tmp_path)
+    write(os.path.join(root, "pkg", "__init__.py"))
+    write(os.path.join(root, "pkg", "core.py"), "from . import util\n")
+    write(os.path.join(root, "pkg", "util.py"))
+    write(os.path.join(root, "pkg", "sub", "__init__.py"))
+    write(os.path.join(root, "pkg", "sub", "mod.py"), "from ..core import thing\nimport json\n")
+    test = os.path.join(root, "test_pkg.py")
+    write(test, "import pkg.sub.mod\nfrom pkg import util\n")
+
+    assert plugin.imported_files(test, [root]) == {
+        os.path.join(root, "pkg", "__init__.py"),
+        os.path.join(root, "pkg", "sub", "__init__.py"),
+        os.path.join(root, "pkg", "sub", "mod.py"),
+        os.path.join(root, "pkg", "util.py"),
+    }
+    assert plugin.imported_files(os.path.join(root, "pkg", "sub", "mod.py"), [root]) == {
+        os.path.join(root, "pkg", "core.py")
+    }
+
+
+def test_imported_files_ignores_unparsable_files(tmp_path):
+    path = tmp_path / "broken.py"
+    path.write_text("def (")
+    assert plugin.imported_files(str(path), [str(tmp_path)]) == set()
+
+
+def test_source_dependencies_follows_imports_transitively(tmp_path):
+    source_dir = os.path.join(str(tmp_path), "plugin")
+    write(os.path.join(source_dir, "__init__.py"))
+    write(os.path.join(source_dir, "a.py"), "from . import b\n")
+    write(os.path.join(source_dir, "b.py"), "from .c import value\n")
+    write(os.path.join(source_dir, "c.py"))
+    write(os.path.join(source_dir, "unused.py"))
+    test = os.path.join(source_dir, "tests", "test_a.py")
+    write(test, "from plugin import a\n")
+
+    assert plugin.source_dependencies(test, source_dir) == {
+        test,
+        os.path.join(source_dir, "__init__.py"),
+        os.path.join(source_dir, "a.py"),
+        os.path.join(source_dir, "b.py"),
+        os.path.join(source_dir, "c.py"),
+    }
+
+
+def test_write_junit_xml(tmp_path):
+    result = {
+        "total": 3, "failed": 1, "errors": 1,
+        "failures": [
+            {"id": "tests.test_a.TestA.test_fail", "test": "test_fail", "type": "failure",
+             "message": "Traceback\nAssertionError: 1 != 2"},
+            {"id": "setUpClass (tests.test_b.TestB)", "test": "setUpClass", "type": "error",
+             "message": "RuntimeError: no layer"},
+        ],
+        "timings": [
+            {"id": "tests.test_a.TestA.test_ok", "status": "passed", "wall": 0.5},
+            {"id": "tests.test_a.TestA.test_fail", "status": "failed", "wall": 0.25},
+            {"id": "tests.test_a.TestA.test_skip", "status": "skipped", "wall": 0.0},
+        ],
+    }
+    path = str(tmp_path / "report.xml")
+    plugin.write_junit_xml(path, result, name="suite")
+
+    suite = ET.parse(path).getroot().find("testsuite")
+    assert suite.attrib == {"name": "suite", "tests": "3", "failures": "1", "errors": "1", "skipped": "1",
+                            "time": "0.750000"}
+    cases = {(case.get("classname"), case.get("name")): case for case in suite.findall("testcase")}
+    assert set(cases) == {("tests.test_a.TestA", "test_ok"), ("tests.test_a.TestA", "test_fail"),
+                          ("tests.test_a.TestA", "test_skip"), ("tests.test_b.TestB", "setUpClass")}
+    failure = cases[("tests.test_a.TestA", "test_fail")].find("failure")
+    assert failure.get("message") == "AssertionError: 1 != 2"
+    assert cases[("tests.test_a.TestA", "test_skip")].find("skipped") is not None
+    assert cases[("tests.test_b.TestB", "setUpClass")].find("error").text == "RuntimeError: no layer"
@@ -0,0 +1,96 @@
+"""Tests of the plugin's event-driven socket server"""
+
+import socket
+
+import qgis_mcp_plugin as plugin
+
+
+def server_side(mcp_server):
+    (conn,) = mcp_server.connections.values()
+    return conn
+
+
+def test_idle_connection_only_waits_for_reads(connect, mcp_server):
+    client = connect()
+    conn = server_side(mcp_server)
+    assert conn.local
+    assert conn.read_notifier.isEnabled()
+    assert not conn.write_notifier.isEnabled()
+    assert client.request({"type": "ping"}) == {"status": "success", "result": {"pong": True}}
+    assert not conn.write_notifier.isEnabled()
+
+
+def test_large_response_waits_for_write_readiness(connect, mcp_server, qt_loop, monkeypatch):
+    rows = ["x" * 100] * 100000
+    monkeypatch.setattr(mcp_server, "ping", lambda: rows)
+    client = connect()
+    conn = server_side(mcp_server)
+    client.send({"type": "ping"})
+    qt_loop.run_until(lambda: conn.outgoing)
+    assert conn.write_notifier.isEnabled()
+    assert client.receive()["result"] == rows
+    assert not conn.outgoing
+    assert not conn.write_notifier.isEnabled()
+
+
+def test_half_closed_client_gets_its_answers(connect, mcp_server):
+    client = connect()
+    client.send_raw(plugin.encode_message({"type": "ping", "id": 1}) + plugin.encode_message({"type": "ping", "id": 2}))
+    client.socket.shutdown(socket.SHUT_WR)
+    assert [response["id"] for response in client.receive(2)] == [1, 2]
+    client.wait_closed()
+    assert not mcp_server.connections
+
+
+def test_eof_right_after_a_handshake(connect, mcp_server):
+    client = connect()
+    client.send_raw(plugin.encode_message({"type": "handshake", "params": {"framing": "length"}})
+                    + plugin.encode_message({"type": "ping", "id": 1}, plugin.FRAMING_LENGTH))
+    client.socket.shutdown(socket.SHUT_WR)
+    assert client.receive()["result"]["framing"] == plugin.FRAMING_LENGTH
+    client.decoder.set_framing(plugin.FRAMING_LENGTH)
+    assert client.receive() == {"status": "success", "result": {"pong": True}, "id": 1}
+    client.wait_closed()
+    assert not mcp_server.connections
+
+
+def test_closed_client_is_dropped(connect, mcp_server, qt_loop):
+    client = connect()
+    client.close()
+    qt_loop.run_until(lambda: not mcp_server.connections)
+    assert connect().request({"type": "ping"})["status"] == "success"
+
+
+def test_pipelined_requests_echo_their_ids(connect):
+    client = connect()
+    client.handshake(framing=plugin.FRAMING_NDJSON)
+    requests = [{"type": "ping", "id": "first"}, {"type": "no_such_command", "id": 2}, {"type": "ping"}]
+    client.send_raw(b"".join(plugin.encode_message(request, plugin.FRAMING_NDJSON) for request in requests))
+    first, unknown, last = client.receive(3)
+    assert first == {"status": "success", "result": {"pong": True}, "id": "first"}
+    assert (unknown["status"], unknown["id"]) == ("error", 2)
+    assert "id" not in last
+
+
+def test_batch_answers_every_command(connect):
+    client = connect()
+    response = client.request({"type": "batch", "id": 9, "params": {"commands": [
+        {"type": "ping", "id": "a"},
+        {"type": "no_such_command"},
+        {"type": "batch", "params": {"commands": []}},
+        "ping",
+    ]}})
+    assert response["id"] == 9
+    result = response["result"]
+    assert (result["succeeded"], result["failed"], result["skipped"]) == (1, 3, 0)
+    assert result["results"][0] == {"status": "success", "result": {"pong": True}, "id": "a", "index": 0}
+    assert [entry["index"] for entry in result["results"]] == [0, 1, 2, 3]
+    assert all(entry["status"] == "error" for entry in result["results"][1:])
+
+
+def test_batch_stops_on_error_when_asked(connect):
+    client = connect()
+    result = client.request({"type": "batch", "params": {"stop_on_error": True, "commands": [
+        {"type": "ping"}, {"type": "no_such_command"}, {"type": "ping"},
+    ]}})["result"]
+    assert (result["succeeded"], result["failed"], result["skipped"]) == (1, 1, 1)
@@ -0,0 +1,82 @@
+"""Tests of the plugin's Unix domain socket listener and response hand-off"""
+
+import os
+import socket
+
+import pytest
+
+import qgis_mcp_plugin as plugin
+import qgis_mcp_protocol as protocol
+
+pytestmark = pytest.mark.skipif(not hasattr(socket, "AF_UNIX"), reason="Unix domain sockets not supported")
+
+
+@pytest.fixture
+def unix_server(qt_loop, tmp_path):
+    server = plugin.QgisMCPServer(unix_socket=str(tmp_path / "qgis_mcp.sock"), worker_count=0)
+    yield server
+    if server.unix_listener:
+        server.unix_listener.close()
+
+
+def test_stale_socket_is_replaced(unix_server):
+    stale = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    stale.bind(unix_server.unix_socket)
+    stale.close()  # Leaves the socket file behind, like a crashed server
+    unix_server.listen_unix()
+    assert unix_server.unix_listener is not None
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+        client.connect(unix_server.unix_socket)
+
+
+def test_regular_file_is_not_removed(unix_server):
+    with open(unix_server.unix_socket, "w") as f:
+        f.write("data")
+    unix_server.listen_unix()
+    assert unix_server.unix_listener is None
+    with open(unix_server.unix_socket) as f:
+        assert f.read() == "data"
+
+
+def test_socket_of_a_running_server_is_kept(unix_server):
+    other = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    other.bind(unix_server.unix_socket)
+    other.listen(1)
+    try:
+        unix_server.listen_unix()
+        assert unix_server.unix_listener is None
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+            client.connect(unix_server.unix_socket)
+    finally:
+        other.close()
+
+
+def test_large_responses_are_handed_off_as_files(connect, mcp_server, monkeypatch):
+    rows = ["x" * 100] * (plugin.HANDOFF_THRESHOLD // 100)
+    monkeypatch.setattr(mcp_server, "get_qgis_info", lambda: rows)
+    client = connect(unix=True)
+    assert client.handshake(framing=plugin.FRAMING_LENGTH, handoff=True)["result"]["handoff"] is True
+    assert client.request({"type": "ping", "id": 1}) == {"status": "success", "result": {"pong": True}, "id": 1}
+    message = client.request({"type": "get_qgis_info", "id": 2})
+    path = message["handoff"]["path"]
+    assert protocol.read_handoff(message) == {"status": "success", "result": rows, "id": 2}
+    assert not os.path.exists(path)
+
+
+def test_unread_handoff_files_are_removed_on_close(connect, mcp_server, monkeypatch):
+    monkeypatch.setattr(mcp_server, "get_qgis_info", lambda: "x" * plugin.HANDOFF_THRESHOLD)
+    client = connect(unix=True)
+    client.handshake(framing=plugin.FRAMING_LENGTH, handoff=True)
+    path = client.request({"type": "get_qgis_info"})["handoff"]["path"]
+    assert os.path.exists(path)
+    (conn,) = mcp_server.connections.values()
+    mcp_server.close_connection(conn)
+    assert not os.path.exists(path)
+
+
+def test_handoff_is_only_used_when_asked(connect, mcp_server, monkeypatch):
+    monkeypatch.setattr(mcp_server, "get_qgis_info", lambda: "x" * plugin.HANDOFF_THRESHOLD)
+    client = connect(unix=True)
+    assert client.handshake(framing=plugin.FRAMING_LENGTH)["result"]["handoff"] is False
+    assert client.request({"type": "get_qgis_info"})["result"] == "x" * plugin.HANDOFF_THRESHOLD
+    assert mcp_server.handoff_dir is None